@@ -1,4 +1,5 @@
 import os
+import hmac
 import logging
 from flask import Flask, request, jsonify, Response
 from dotenv import load_dotenv
@@ -7,9 +8,15 @@ load_dotenv()
 
 from twilio.twiml.messaging_response import MessagingResponse
 
-from database import db
+from database import db, _env_float
+from db_metrics import metrics as db_metrics
+from spool import spool
+from due_queue import due_queue
+from leader import leader
+from outbox import outbox
 from services import meeting_service, whatsapp_service, ai_service, parsing_service, hubspot_service
-from utils import normalize_phone
+from utils import normalize_phone, check_phone_config
+import repositories
 import scheduler
 import json
 
@@ -21,24 +28,106 @@ logging.basicConfig(
 
 app = Flask(__name__)
 
+# /health reports the outbox as stalled when a runnable job has waited longer than this
+OUTBOX_STALL_SECONDS = _env_float("OUTBOX_STALL_SECONDS", 600.0)
+
+check_phone_config()
 db.init_db()
-scheduler.start_scheduler()
+# Background jobs (scheduler and outbox drainer) run in the web process unless a separate worker
+# (python worker.py) is deployed and RUN_SCHEDULER_IN_WEB=false says so; without either, reminders
+# and every queued WhatsApp / HubSpot / Aux side effect would never be sent.
+if scheduler._is_truthy(os.getenv("RUN_SCHEDULER_IN_WEB", "true")):
+    scheduler.start_scheduler()
+    outbox.start_drainer()
+else:
+    logging.warning("[SCHEDULER] RUN_SCHEDULER_IN_WEB=false: scheduler and outbox drainer not started in the web process. "
+                    "A `python worker.py` process (Procfile `worker`) must be running, or no reminders, WhatsApp, HubSpot or Aux side effects are sent")
+# The spool lives on this instance's local disk, so its drainer stays with the web process
+spool.start_drainer()
+
+@app.before_request
+def _start_db_scope():
+    db_metrics.start_scope(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}")
+
+@app.teardown_request
+def _end_db_scope(exc=None):
+    db_metrics.end_scope()
 
 @app.route('/health', methods=['GET'])
 def health():
     db_mode = 'Postgres' if db.is_postgres else 'SQLite'
     try:
-        users = db.execute_query("SELECT count(*) as c FROM users", fetch_one=True)
+        with db.replica_reads():
+            users = db.execute_query("SELECT count(*) as c FROM users", fetch_one=True)
         count = users['c'] if users else 0
         debug_info = {
             "status": "online",
             "db_mode": db_mode,
-            "user_count": count
+            "user_count": count,
+            "db_pool": db.pool_stats()
         }
+        if spool.enabled:
+            debug_info["spool"] = spool.stats()
+        debug_info["outbox"] = outbox.stats()
+        if debug_info["outbox"]["overdue_s"] > OUTBOX_STALL_SECONDS:
+            # Jobs are being queued but nothing drains them: no worker, and not running in the web process
+            debug_info["status"] = "degraded"
+            debug_info["outbox_stalled"] = True
+            logging.error(f"[OUTBOX] Jobs overdue by {debug_info['outbox']['overdue_s']}s: no drainer seems to be running. "
+                          "Start `python worker.py` or set RUN_SCHEDULER_IN_WEB=true")
+        if leader.is_leader():
+            debug_info["scheduler_leader"] = leader.stats()
+            debug_info["due_queue"] = due_queue.stats()
         return jsonify(debug_info), 200
     except Exception as e:
         return jsonify({"status": "error", "db_mode": db_mode, "error": str(e)}), 500
 
+def _admin_auth_error():
+    """Error response unless the request carries ADMIN_API_TOKEN ('Authorization: Bearer <token>' or 'X-Admin-Token')."""
+    admin_token = os.getenv("ADMIN_API_TOKEN")
+    if not admin_token:
+        return jsonify({"error": "ADMIN_API_TOKEN not configured"}), 404
+    supplied = request.headers.get("X-Admin-Token") or request.headers.get("Authorization", "").replace("Bearer ", "", 1)
+    if not hmac.compare_digest(supplied.strip(), admin_token):
+        return jsonify({"error": "unauthorized"}), 401
+    return None
+
+@app.route('/admin/db-stats', methods=['GET'])
+def admin_db_stats():
+    """
+    Query metrics since start (or the last reset): per-statement and per-caller latency
+    histograms, call counts, rows, likely N+1 loops and the sampled slow-query log.
+    Requires ADMIN_API_TOKEN via 'Authorization: Bearer <token>' or 'X-Admin-Token'.
+    Query args: top (default 25), sort (total_ms|calls|avg_ms|max_ms|rows), reset=1.
+    """
+    auth_error = _admin_auth_error()
+    if auth_error:
+        return auth_error
+
+    top = request.args.get("top", 25, type=int)
+    sort = request.args.get("sort", "total_ms")
+    if sort not in ("total_ms", "calls", "avg_ms", "max_ms", "rows"):
+        sort = "total_ms"
+    stats = db_metrics.snapshot(top=top, sort=sort)
+    stats["db_pool"] = db.pool_stats()
+    if request.args.get("reset") == "1":
+        db_metrics.reset()
+    return jsonify(stats), 200
+
+@app.route('/admin/outbox', methods=['GET', 'POST'])
+def admin_outbox():
+    """
+    GET: outbox counts plus the most recent dead-lettered jobs (limit, default 50).
+    POST: requeues dead jobs (all, or ?kind=...) with a fresh attempt budget.
+    Requires ADMIN_API_TOKEN like /admin/db-stats.
+    """
+    auth_error = _admin_auth_error()
+    if auth_error:
+        return auth_error
+    if request.method == 'POST':
+        return jsonify({"requeued": outbox.requeue_dead(request.args.get("kind"))}), 200
+    return jsonify(dict(outbox.stats(), dead=outbox.dead_jobs(request.args.get("limit", 50, type=int)))), 200
+
 @app.route('/setup', methods=['GET'])
 def setup_page():
     return """
@@ -125,9 +214,8 @@ def register():
             user_timezone = "UTC"
 
         phone = normalize_phone(raw_phone)
-        
-        # Check if user exists
-        existing = db.execute_query("SELECT email, hubspot_contact_id FROM users WHERE email = ?", (email,), fetch_one=True)
+        if not phone:
+            return "Error: Invalid phone number. Include the country code, e.g. +1 555 123 4567", 400
         
         # Try to create or find HubSpot contact
         hubspot_contact_id = None
@@ -139,21 +227,14 @@ def register():
             logging.warning(f"HubSpot sync failed for {email}: {e}")
         
         # Save to database (including timezone)
-        if existing:
-            db.execute_query(
-                "UPDATE users SET name = ?, phone = ?, hubspot_contact_id = ?, timezone = ? WHERE email = ?",
-                (name, phone, hubspot_contact_id, user_timezone, email), commit=True)
-        else:
-            db.execute_query(
-                "INSERT INTO users (email, name, phone, hubspot_contact_id, timezone) VALUES (?, ?, ?, ?, ?)",
-                (email, name, phone, hubspot_contact_id, user_timezone), commit=True)
+        repositories.save_user(email, name, phone, timezone=user_timezone, hubspot_contact_id=hubspot_contact_id)
         
         # Get bot email address from environment
         bot_email = os.getenv("BOT_EMAIL_SECONDARY", "bhattacharyabuddhadeb@outlook.com")
         msg = ("Welcome to Coachlink 360. You are registered.\n\n"
                "To receive coaching, invite the bot account to your meetings:\n"
                f"- {bot_email}")
-        whatsapp_service.send_whatsapp_message(phone, msg)
+        whatsapp_service.queue_whatsapp_message(phone, msg)
         
         return f"<h1>Success!</h1><p>{name} registered with timezone {user_timezone}. Check WhatsApp!</p>"
     except Exception as e:
@@ -167,7 +248,9 @@ def outlook_webhook():
         return jsonify({"error": "No data"}), 400
     
     try:
-        result = meeting_service.process_outlook_webhook(data)
+        result, spooled = spool.run_or_spool("outlook_webhook", data, fn=meeting_service.process_outlook_webhook)
+        if spooled:
+            return jsonify({"status": "spooled", "message": "Database unavailable; webhook queued for replay"}), 202
         return jsonify(result), 200
     except Exception as e:
         logging.error(f"Webhook Error: {e}")
@@ -259,24 +342,14 @@ def ingest_raw_meeting():
 
     # 2. DATABASE SAVE (Critical)
     try:
-        existing = db.execute_query(
-            "SELECT id FROM meeting_coaching WHERE session_id = ?", 
-            (session_id,), 
-            fetch_one=True
-        )
-        
-        if existing:
-            db.execute_query(
-                "UPDATE meeting_coaching SET transcript = ?, summary = ? WHERE session_id = ?",
-                (transcript, summary, session_id),
-                commit=True
-            )
-        else:
-            db.execute_query(
-                "INSERT INTO meeting_coaching (session_id, transcript, summary, source) VALUES (?, ?, ?, ?)",
-                (session_id, transcript, summary, "raw_ingest"),
-                commit=True
-            )
+        _, spooled = spool.run_or_spool("upsert", {
+            "table": "meeting_coaching", "key_cols": "session_id",
+            "values": {"session_id": session_id, "transcript": transcript, "summary": summary, "source": "raw_ingest"},
+            "update_cols": ["transcript", "summary"]
+        })
+        if spooled:
+            # Transcript is safe on local disk and replayed once the DB is back; coaching needs the DB
+            return jsonify({"status": "partial_success", "error": "database_unavailable", "spooled": True, "session_id": session_id}), 200
     except Exception as e:
         logging.error(f"DB Save Failed: {e}")
         # If we can't save to DB, we really can't proceed much, but let's try to notify anyway? 
@@ -314,7 +387,7 @@ def ingest_raw_meeting():
         # A. Try Owner Email from Parse
         owner_email = parsed.get('owner_email') if 'parsed' in locals() else None
         if owner_email:
-            u = db.execute_query("SELECT phone FROM users WHERE email = ?", (owner_email,), fetch_one=True)
+            u = db.execute_query("SELECT phone FROM users WHERE email = ?", (owner_email,), fetch_one=True, prepare=True)
             if u:
                 target_phone = u['phone']
                 logging.info(f"Targeting Owner: {owner_email} -> {target_phone}")
@@ -337,7 +410,7 @@ def ingest_raw_meeting():
         if not target_phone:
             # B. Try matching with recent meeting
             recent_mtg = db.execute_query(
-                "SELECT id, salesperson_phone FROM meetings WHERE status IN ('scheduled', 'reminder_sent') ORDER BY id DESC LIMIT 1",
+                "SELECT id, salesperson_phone FROM meetings WHERE status IN ('scheduled', 'reminder_sent', 'pending') ORDER BY id DESC LIMIT 1",
                 fetch_one=True
             )
             if recent_mtg and recent_mtg['salesperson_phone']:
@@ -371,8 +444,8 @@ def ingest_raw_meeting():
                 f"*Action Plan*:\n{tips}\n\n"
                 "Reply *Done* to log this to HubSpot."
             )
-            whatsapp_service.send_whatsapp_message(target_phone, msg)
-            logging.info(f"Sent raw ingest coaching to {target_phone}")
+            whatsapp_service.queue_whatsapp_message(target_phone, msg)
+            logging.info(f"Queued raw ingest coaching for {target_phone}")
             notified = True
         else:
             logging.warning("No user found to notify.")
@@ -403,21 +476,11 @@ def post_meeting_coaching_endpoint():
         return jsonify({"error": "Missing session_id or transcript"}), 400
         
     try:
-        # Check existing
-        existing = db.execute_query("SELECT id FROM meeting_coaching WHERE session_id = ?", (session_id,), fetch_one=True)
-        
-        if existing:
-            db.execute_query(
-                "UPDATE meeting_coaching SET transcript = ?, title = ? WHERE session_id = ?",
-                (transcript, title, session_id),
-                commit=True
-            )
-        else:
-            db.execute_query(
-                "INSERT INTO meeting_coaching (session_id, title, transcript, source) VALUES (?, ?, ?, ?)",
-                (session_id, title, transcript, source),
-                commit=True
-            )
+        db.upsert(
+            "meeting_coaching", "session_id",
+            {"session_id": session_id, "title": title, "transcript": transcript, "source": source},
+            update_cols=["transcript", "title"]
+        )
             
         # 3. Generate AI Coaching
         # ai_service is already imported
@@ -491,18 +554,17 @@ def survey_completed_webhook():
             "submitted_at": data.get("submitted_at")
         }
         
-        # Sync to HubSpot (non-blocking - don't fail webhook if HubSpot fails)
-        sync_success = hubspot_service.sync_survey_response_to_contact(participant_email, survey_data)
-        
-        if sync_success:
-            logging.info(f"Survey response synced to HubSpot for {participant_email}")
-        else:
-            logging.warning(f"Survey response received but HubSpot sync failed for {participant_email}")
+        # Queue the HubSpot sync (the outbox retries it; the webhook never waits on HubSpot)
+        hubspot_service.queue_sync("sync_survey_response_to_contact", participant_email=participant_email, survey_data=survey_data)
+        logging.info(f"Survey response queued for HubSpot sync for {participant_email}")
         
         # Always return success to survey system (fire-and-forget pattern)
+        # The sync runs later from the outbox, so nothing has reached HubSpot yet: hubspot_synced stays in
+        # the survey system's contract but reports the real state; hubspot_queued says the sync is durable.
         return jsonify({
             "status": "received",
-            "hubspot_synced": sync_success,
+            "hubspot_synced": False,
+            "hubspot_queued": True,
             "participant_email": participant_email
         }), 200
         
@@ -512,9 +574,13 @@ def survey_completed_webhook():
         return jsonify({
             "status": "received",
             "hubspot_synced": False,
+            "hubspot_queued": False,
             "error": str(e)
         }), 200
 
 if __name__ == "__main__":
+    # Local development: one process serves HTTP and runs the scheduler and the outbox drainer
+    scheduler.start_scheduler()
+    outbox.start_drainer()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
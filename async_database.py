@@ -0,0 +1,301 @@
+"""
+asyncio counterpart of database.DBHandler, for code running in an event loop
+(async webhook ingestion, async scheduler jobs) that shouldn't park a thread per DB call.
+
+Same query API as the sync handler (`?` placeholders, fetch_one / fetch_all / commit flags,
+nested transactions become savepoints) and the same backend switch on DATABASE_URL:
+  - Postgres: asyncpg pool (`?` is rewritten to $1, $2, ...).
+  - SQLite:   a small pool of aiosqlite connections on SQLITE_DB_PATH (honours SQLITE_PROFILE).
+
+Rows are returned as plain dicts on both backends.
+
+    from async_database import async_db
+
+    async def handler():
+        row = await async_db.execute_query("SELECT * FROM meetings WHERE id = ?", (1,), fetch_one=True)
+        async with async_db.transaction():
+            await async_db.execute_query("UPDATE meetings SET status = ? WHERE id = ?", ("completed", 1), commit=True)
+
+Pools are bound to the event loop that created them; a different loop gets its own pool.
+Requires asyncpg (Postgres) / aiosqlite (SQLite). Nothing in the app uses this handler yet, so they
+are not in requirements.txt: install them with `pip install -r requirements-async.txt`.
+"""
+import os
+import asyncio
+import logging
+import sqlite3
+import time
+import contextvars
+from contextlib import asynccontextmanager
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+from database import _env_int, _env_float, sqlite_performance_pragmas, to_dollar_params
+from db_metrics import metrics
+
+# The open unit of work of the current asyncio task: {"conn", "depth"}
+_current_tx = contextvars.ContextVar("async_db_tx", default=None)
+
+
+class _SQLitePool:
+    """Fixed-size pool of aiosqlite connections (each one runs on its own worker thread)."""
+
+    def __init__(self, path, max_size, performance):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self.performance = performance
+        self._idle = asyncio.LifoQueue()
+        self._size = 0
+        self._checkouts = 0
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        if self.performance:
+            for pragma in sqlite_performance_pragmas():
+                await conn.execute(pragma)
+        return conn
+
+    async def acquire(self, timeout):
+        self._checkouts += 1
+        if self._idle.empty() and self._size < self.max_size:
+            self._size += 1
+            try:
+                return await self._connect()
+            except Exception:
+                self._size -= 1
+                raise
+        return await asyncio.wait_for(self._idle.get(), timeout)
+
+    async def release(self, conn):
+        try:
+            await conn.rollback()
+        except Exception:
+            self._size -= 1
+            try:
+                await conn.close()
+            except Exception:
+                pass
+            return
+        self._idle.put_nowait(conn)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+            self._size -= 1
+
+    def stats(self):
+        return {"max_size": self.max_size, "size": self._size, "idle": self._idle.qsize(), "checkouts": self._checkouts}
+
+
+class AsyncDBHandler:
+    def __init__(self):
+        self.db_url = os.getenv("DATABASE_URL")
+        self.is_postgres = bool(self.db_url)
+        self.sqlite_profile = os.getenv("SQLITE_PROFILE", "default").strip().lower()
+        self._pool = None
+        self._pool_loop = None
+        self._pool_lock = None
+        self.timeout = _env_float("DB_POOL_TIMEOUT", 30.0)
+
+    # --- pool ---
+
+    async def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._pool is not None and self._pool_loop is loop:
+            return self._pool
+        if self._pool_lock is None or self._pool_loop is not loop:
+            self._pool_lock = asyncio.Lock()
+            self._pool = None
+            self._pool_loop = loop
+        async with self._pool_lock:
+            if self._pool is None:
+                max_size = _env_int("DB_POOL_MAX_SIZE", 5)
+                if self.is_postgres:
+                    if asyncpg is None:
+                        raise RuntimeError("DATABASE_URL is set but asyncpg is not installed")
+                    self._pool = await asyncpg.create_pool(
+                        self.db_url, min_size=1, max_size=max_size, ssl="require", timeout=self.timeout
+                    )
+                else:
+                    if aiosqlite is None:
+                        raise RuntimeError("aiosqlite is not installed")
+                    self._pool = _SQLitePool(
+                        os.getenv("SQLITE_DB_PATH", "coachlink.db"), max_size, self.sqlite_profile == "performance"
+                    )
+        return self._pool
+
+    @asynccontextmanager
+    async def connection(self):
+        """Checks out a pooled connection for the block; uncommitted work is rolled back on exit (SQLite)."""
+        pool = await self._get_pool()
+        if self.is_postgres:
+            async with pool.acquire(timeout=self.timeout) as conn:
+                yield conn
+            return
+        conn = await pool.acquire(self.timeout)
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def pool_stats(self):
+        if self._pool is None:
+            return {"backend": "postgres" if self.is_postgres else "sqlite", "size": 0}
+        if self.is_postgres:
+            return {"backend": "postgres", "max_size": self._pool.get_max_size(), "size": self._pool.get_size(),
+                    "idle": self._pool.get_idle_size()}
+        stats = self._pool.stats()
+        stats["backend"] = "sqlite"
+        return stats
+
+    @asynccontextmanager
+    async def _statement_connection(self):
+        tx = _current_tx.get()
+        if tx is not None:
+            yield tx["conn"], True
+            return
+        async with self.connection() as conn:
+            yield conn, False
+
+    # --- queries ---
+
+    @asynccontextmanager
+    async def _pg_discard_unless(self, conn, commit, in_tx, query):
+        # asyncpg autocommits statements outside a transaction; the sync handler and aiosqlite roll back
+        # anything not run with commit=True, so a write without it runs in a transaction that is rolled back.
+        # Plain SELECTs skip this (nothing to discard, and it would add a BEGIN/ROLLBACK round trip each).
+        if commit or in_tx or query.lstrip()[:6].upper() == "SELECT":
+            yield
+            return
+        pg_tx = conn.transaction()
+        await pg_tx.start()
+        try:
+            yield
+        finally:
+            await pg_tx.rollback()
+
+    async def execute_query(self, query, params=(), fetch_one=False, fetch_all=False, commit=False):
+        """
+        Async DBHandler.execute_query. Returns None, a dict (fetch_one) or a list of dicts (fetch_all).
+        As with the sync handler, a write outside a transaction without commit=True is rolled back
+        on both backends.
+        """
+        params = tuple(params or ())
+        started = time.perf_counter()
+        async with self._statement_connection() as (conn, in_tx):
+            try:
+                if self.is_postgres:
+                    sql = to_dollar_params(query)
+                    async with self._pg_discard_unless(conn, commit, in_tx, query):
+                        if fetch_one:
+                            row = await conn.fetchrow(sql, *params)
+                            result = dict(row) if row is not None else None
+                            rows = 1 if row is not None else 0
+                        elif fetch_all:
+                            result = [dict(r) for r in await conn.fetch(sql, *params)]
+                            rows = len(result)
+                        else:
+                            await conn.execute(sql, *params)
+                            result, rows = None, 0
+                else:
+                    cur = await conn.execute(query, params)
+                    if fetch_one:
+                        row = await cur.fetchone()
+                        result = dict(row) if row is not None else None
+                        rows = 1 if row is not None else 0
+                    elif fetch_all:
+                        result = [dict(r) for r in await cur.fetchall()]
+                        rows = len(result)
+                    else:
+                        result, rows = None, max(cur.rowcount, 0)
+                    await cur.close()
+                    if commit and not in_tx:
+                        await conn.commit()
+                metrics.record(query, params, time.perf_counter() - started, rows)
+                return result
+            except Exception as e:
+                logging.error(f"Async DB Error: {e} | Query: {query}")
+                metrics.record(query, params, time.perf_counter() - started, 0, error=True)
+                raise
+
+    async def executemany(self, query, seq_of_params, commit=False):
+        seq_of_params = [tuple(p) for p in seq_of_params]
+        started = time.perf_counter()
+        async with self._statement_connection() as (conn, in_tx):
+            try:
+                if self.is_postgres:
+                    async with self._pg_discard_unless(conn, commit, in_tx, query):
+                        await conn.executemany(to_dollar_params(query), seq_of_params)
+                else:
+                    await conn.executemany(query, seq_of_params)
+                    if commit and not in_tx:
+                        await conn.commit()
+                metrics.record(query, None, time.perf_counter() - started, len(seq_of_params))
+            except Exception as e:
+                logging.error(f"Async DB Error: {e} | Query: {query}")
+                metrics.record(query, None, time.perf_counter() - started, 0, error=True)
+                raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Async unit of work, scoped to the current asyncio task. Statements inside share one
+        connection and commit together; nested blocks become savepoints.
+        """
+        tx = _current_tx.get()
+        if tx is not None:
+            tx["depth"] += 1
+            name = f"sp_{tx['depth']}"
+            conn = tx["conn"]
+            await conn.execute(f"SAVEPOINT {name}")
+            try:
+                yield self
+            except Exception:
+                await conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                await conn.execute(f"RELEASE SAVEPOINT {name}")
+                raise
+            else:
+                await conn.execute(f"RELEASE SAVEPOINT {name}")
+            finally:
+                tx["depth"] -= 1
+            return
+
+        async with self.connection() as conn:
+            if self.is_postgres:
+                pg_tx = conn.transaction()
+                await pg_tx.start()
+            else:
+                await conn.execute("BEGIN")
+            token = _current_tx.set({"conn": conn, "depth": 0})
+            try:
+                yield self
+                if self.is_postgres:
+                    await pg_tx.commit()
+                else:
+                    await conn.commit()
+            except BaseException:
+                if self.is_postgres:
+                    await pg_tx.rollback()
+                else:
+                    await conn.rollback()
+                raise
+            finally:
+                _current_tx.reset(token)
+
+
+# Singleton shared instance
+async_db = AsyncDBHandler()
@@ -0,0 +1,162 @@
+"""
+Online snapshots of the SQLite database (single-node installs running on coachlink.db).
+
+Uses SQLite's incremental backup API: the copy advances SQLITE_BACKUP_PAGES pages per step and
+sleeps SQLITE_BACKUP_SLEEP_MS between steps. The source is only locked while a step runs, so
+the scheduler and request threads never wait more than a few milliseconds. Copying the file
+directly could instead catch it mid-write. If another connection writes during the copy,
+SQLite restarts the backup from the first page; the report counts these restarts.
+
+Each snapshot is quick_check'ed, gzip-compressed to
+SQLITE_BACKUP_DIR/coachlink-<UTC timestamp>.db.gz, and only the newest SQLITE_BACKUP_KEEP are kept.
+
+    python backup.py                      # one snapshot now, prints pages / throughput
+    python backup.py --dest /mnt/backups --pages 512 --sleep-ms 5
+
+Restore: stop the app, then `gunzip -c coachlink-<ts>.db.gz > coachlink.db`.
+
+Scheduled: with SQLITE_BACKUP_DIR set, the scheduler takes a snapshot whenever the newest one is
+older than SQLITE_BACKUP_INTERVAL_HOURS (default 24). Postgres deployments are skipped; use the
+provider's backups / pg_dump there.
+"""
+import os
+import sys
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from database import db, _env_int, _env_float
+
+SNAPSHOT_PREFIX = "coachlink-"
+SNAPSHOT_SUFFIX = ".db.gz"
+
+
+def _snapshots(dest_dir):
+    try:
+        names = os.listdir(dest_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(n for n in names if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIX))
+
+
+def _prune(dest_dir, keep):
+    for name in _snapshots(dest_dir)[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(dest_dir, name))
+        logging.info(f"[BACKUP] Pruned old snapshot {name}")
+
+
+def snapshot_sqlite(dest_dir=None, pages=None, sleep_ms=None, keep=None):
+    """
+    Takes one compressed online snapshot. Returns a report dict (pages, pages_copied, steps, restarts,
+    max_step_ms, bytes, compressed_bytes, seconds, mb_per_s, path), or None on Postgres.
+    """
+    if db.is_postgres:
+        logging.info("[BACKUP] Postgres deployment; SQLite snapshots skipped")
+        return None
+    src_path = os.getenv("SQLITE_DB_PATH", "coachlink.db")
+    if src_path == ":memory:":
+        return None
+    dest_dir = dest_dir or os.getenv("SQLITE_BACKUP_DIR", "backups")
+    pages = pages or _env_int("SQLITE_BACKUP_PAGES", 256)
+    sleep_ms = _env_float("SQLITE_BACKUP_SLEEP_MS", 10.0) if sleep_ms is None else sleep_ms
+    keep = _env_int("SQLITE_BACKUP_KEEP", 7) if keep is None else keep
+
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    raw_path = os.path.join(dest_dir, f".{SNAPSHOT_PREFIX}{stamp}.db.partial")
+    final_path = os.path.join(dest_dir, f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}")
+
+    stats = {"pages": 0, "pages_copied": 0, "steps": 0, "restarts": 0, "max_step_ms": 0.0}
+    last = {"t": None, "remaining": None}
+    sleep_s = sleep_ms / 1000.0
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        # Time since the previous callback minus the inter-step sleep = time the step held the source
+        step_ms = max((now - last["t"] - sleep_s) * 1000, 0.0)
+        stats["max_step_ms"] = max(stats["max_step_ms"], step_ms)
+        if last["remaining"] is None or remaining > last["remaining"]:
+            if last["remaining"] is not None:
+                stats["restarts"] += 1
+            stats["pages_copied"] += total - remaining
+        else:
+            stats["pages_copied"] += last["remaining"] - remaining
+        stats["steps"] += 1
+        stats["pages"] = total
+        last["t"], last["remaining"] = time.perf_counter(), remaining
+
+    started = time.perf_counter()
+    src = sqlite3.connect(src_path, timeout=30.0)
+    dst = sqlite3.connect(raw_path)
+    try:
+        last["t"] = time.perf_counter()
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep_s)
+        check = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise RuntimeError(f"snapshot failed quick_check: {check}")
+    except Exception:
+        dst.close()
+        os.remove(raw_path)
+        raise
+    finally:
+        src.close()
+    dst.close()
+    copy_seconds = time.perf_counter() - started
+
+    with open(raw_path, "rb") as fin, gzip.open(final_path + ".partial", "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, 1024 * 1024)
+    os.replace(final_path + ".partial", final_path)
+    raw_bytes = os.path.getsize(raw_path)
+    os.remove(raw_path)
+
+    seconds = time.perf_counter() - started
+    stats.update({
+        "path": final_path,
+        "bytes": raw_bytes,
+        "compressed_bytes": os.path.getsize(final_path),
+        "copy_seconds": round(copy_seconds, 3),
+        "copy_mb_per_s": round(raw_bytes / 1e6 / copy_seconds, 2) if copy_seconds else None,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(raw_bytes / 1e6 / seconds, 2) if seconds else None,
+        "max_step_ms": round(stats["max_step_ms"], 2),
+    })
+    logging.info(
+        f"[BACKUP] Snapshot {final_path}: {stats['pages_copied']} pages copied ({stats['pages']} in db) in {stats['steps']} steps "
+        f"({stats['restarts']} restarts, max step {stats['max_step_ms']}ms), "
+        f"{raw_bytes} -> {stats['compressed_bytes']} bytes, {stats['mb_per_s']} MB/s"
+    )
+    _prune(dest_dir, keep)
+    return stats
+
+
+def run_scheduled_snapshot():
+    """Scheduler hook: snapshot when SQLITE_BACKUP_DIR is set and the newest snapshot is older than the interval."""
+    dest_dir = os.getenv("SQLITE_BACKUP_DIR")
+    if not dest_dir or db.is_postgres:
+        return None
+    existing = _snapshots(dest_dir)
+    if existing:
+        age_h = (time.time() - os.path.getmtime(os.path.join(dest_dir, existing[-1]))) / 3600
+        if age_h < _env_float("SQLITE_BACKUP_INTERVAL_HOURS", 24.0):
+            return None
+    return snapshot_sqlite(dest_dir)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Online SQLite snapshot")
+    parser.add_argument("--dest", help="snapshot directory (default SQLITE_BACKUP_DIR or ./backups)")
+    parser.add_argument("--pages", type=int, help="pages copied per step (default SQLITE_BACKUP_PAGES or 256)")
+    parser.add_argument("--sleep-ms", type=float, help="pause between steps (default SQLITE_BACKUP_SLEEP_MS or 10)")
+    parser.add_argument("--keep", type=int, help="snapshots to keep (default SQLITE_BACKUP_KEEP or 7)")
+    args = parser.parse_args()
+    report = snapshot_sqlite(args.dest, pages=args.pages, sleep_ms=args.sleep_ms, keep=args.keep)
+    if report is None:
+        print("Nothing to snapshot (Postgres or in-memory database).")
+        sys.exit(1)
+    for k, v in report.items():
+        print(f"{k:>17}: {v}")
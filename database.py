@@ -1,15 +1,318 @@
 import os
 import sqlite3
 import logging
+import threading
+import time
+import hashlib
+import weakref
+import functools
+import contextlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 
 # Optional import for Postgres (only needed in Prod)
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_batch
 except ImportError:
     psycopg2 = None
 
+from db_metrics import metrics
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Statuses of meetings that are still being worked on (scheduler polling, WhatsApp chat, ingest matching).
+# Keep this exact IN list in queries that should use idx_meetings_open: partial indexes only apply
+# when the query repeats the index predicate.
+OPEN_MEETING_STATUSES_SQL = "status IN ('scheduled', 'reminder_sent', 'pending')"
+
+# Secondary indexes. Each one is created by the migration that introduced it (explicit DDL in
+# migrations.py); init_db() only re-checks this list to rebuild missing or INVALID ones.
+# Each entry: (name, table, columns, query it serves[, partial index predicate]).
+# meeting_coaching.session_id and users.email are already indexed by their UNIQUE / PRIMARY KEY constraints.
+INDEXES = [
+    ("idx_meetings_outlook_event_id", "meetings", ("outlook_event_id",),
+     "meeting_service.process_outlook_webhook dedupe: SELECT ... FROM meetings WHERE outlook_event_id = ?; "
+     "UPDATE meetings ... WHERE outlook_event_id = ?"),
+    ("idx_meetings_status_survey", "meetings", ("status", "survey_status"),
+     "survey-pending filter (repositories.SURVEY_PENDING_SQL): WHERE status IN ('scheduled', 'reminder_sent', 'completed') "
+     "AND COALESCE(survey_status, 'pending') NOT IN ('sent', 'queued', 'failed', 'skipped')"),
+    ("idx_meetings_status_end_at", "meetings", ("status", "end_at"),
+     "due_queue full resync: WHERE status IN (...) AND COALESCE(survey_status, 'pending') NOT IN (...) AND end_at IS NOT NULL"),
+    ("idx_meetings_start_at", "meetings", ("start_at",),
+     "meeting_service.process_read_ai_webhook / process_transcript_webhook: WHERE start_at BETWEEN ? AND ?"),
+    ("idx_meetings_salesperson_title", "meetings", ("salesperson_phone", "title"),
+     "meeting_service.process_outlook_webhook secondary dedupe: WHERE salesperson_phone = ? AND title = ? ORDER BY id DESC"),
+    ("idx_meetings_aux_meeting_token", "meetings", ("aux_meeting_token",),
+     "scheduler.check_pending_meetings Aux polling: WHERE aux_meeting_token IS NOT NULL AND status IN (...)"),
+    ("idx_meetings_sp_phone_e164_status", "meetings", ("salesperson_phone_e164", "status"),
+     "meeting_service.handle_incoming_message: WHERE salesperson_phone_e164 = ? AND status IN (...) ORDER BY id DESC"),
+    ("idx_users_phone_e164", "users", ("phone_e164",),
+     "find_due_candidates salesperson email subquery / meeting_service timezone lookup: users.phone_e164 = ?"),
+    ("idx_meeting_transcripts_meeting_id", "meeting_transcripts", ("meeting_id",),
+     "meeting_service.handle_incoming_message chat context: WHERE meeting_id = ? ORDER BY id ASC"),
+    ("idx_messages_client_direction_ts", "messages", ("client_id", "direction", "timestamp"),
+     "scripts/check_inactivity.py reply/nudge checks: WHERE client_id = ? AND direction = ? AND timestamp > ?"),
+    ("idx_meeting_transcripts_created_at", "meeting_transcripts", ("created_at",),
+     "retention.archive_transcripts cold scan: WHERE created_at < ?"),
+    ("idx_messages_timestamp", "messages", ("timestamp",),
+     "retention.archive_messages cold scan: WHERE timestamp < ?"),
+    ("idx_meetings_due_changed_at", "meetings", ("due_changed_at",),
+     "due_queue.refresh cross-process pickup: WHERE due_changed_at > ? AND <survey pending> AND end_at IS NOT NULL"),
+    ("idx_meetings_open", "meetings", ("id",),
+     "open-meeting lookups that take the newest match (scheduler Aux poll, WhatsApp active meeting, ingest fallback): "
+     f"WHERE {OPEN_MEETING_STATUSES_SQL} ... ORDER BY id DESC LIMIT n",
+     OPEN_MEETING_STATUSES_SQL),
+    ("idx_meetings_open_salesperson", "meetings", ("salesperson_phone_e164",),
+     "meeting_service.handle_incoming_message active meeting: WHERE salesperson_phone_e164 = ? "
+     f"AND {OPEN_MEETING_STATUSES_SQL} ORDER BY id DESC LIMIT 1 (no sort: entries are in id order per phone)",
+     OPEN_MEETING_STATUSES_SQL),
+]
+
+
+def sqlite_performance_pragmas():
+    """
+    PRAGMAs for SQLITE_PROFILE=performance (shared with async_database.py).
+    WAL lets readers run alongside the writer instead of blocking on it ("database is locked").
+    synchronous=NORMAL is durable across app crashes in WAL mode; only an OS crash/power loss
+    can drop the last few commits.
+    """
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        # Negative cache_size is in KiB
+        f"PRAGMA cache_size=-{_env_int('SQLITE_CACHE_KB', 64 * 1024)}",
+    ]
+
+
+@functools.lru_cache(maxsize=_env_int("DB_QUERY_CACHE_SIZE", 512))
+def _to_pyformat(query):
+    # Call sites pass a small, fixed set of literal SQL strings, so the ?->%s rewrite is cached.
+    return query.replace('?', '%s')
+
+
+def to_dollar_params(query):
+    """Rewrites ? placeholders to Postgres' $1, $2, ... (PREPARE bodies, asyncpg)."""
+    parts = query.split("?")
+    if len(parts) == 1:
+        return query
+    out = [parts[0]]
+    for i, part in enumerate(parts[1:], start=1):
+        out.append(f"${i}")
+        out.append(part)
+    return "".join(out)
+
+
+@functools.lru_cache(maxsize=256)
+def _prepared_statement(query):
+    """(name, PREPARE body, EXECUTE template) for a ?-placeholder query; the name is stable across connections."""
+    name = "ps_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    n_params = query.count("?")
+    execute = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * n_params)})" if n_params else "")
+    return name, to_dollar_params(query), execute
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of Postgres connections shared by request threads and the scheduler.
+    - Connections are opened lazily, up to max_size.
+    - Idle connections are pinged on checkout before being handed out.
+    - New connections are retried with exponential backoff.
+    """
+
+    def __init__(self, connect_fn, max_size=5, timeout=30.0, ping_after=30.0, connect_retries=3, connect_backoff=0.5):
+        self._connect_fn = connect_fn
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.connect_retries = max(1, connect_retries)
+        self.connect_backoff = connect_backoff
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, last_used_monotonic)]
+        self._size = 0
+        self._in_use = 0
+
+        # Stats
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._connects = 0
+        self._reconnects = 0
+        self._health_check_failures = 0
+        self._timeouts = 0
+
+    def _connect(self):
+        """Opens a new connection, retrying with exponential backoff."""
+        delay = self.connect_backoff
+        last_error = None
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                conn = self._connect_fn()
+                self._connects += 1
+                return conn
+            except Exception as e:
+                last_error = e
+                logging.warning(f"[DB POOL] Connect attempt {attempt}/{self.connect_retries} failed: {e}")
+                if attempt < self.connect_retries:
+                    time.sleep(delay)
+                    delay *= 2
+        raise last_error
+
+    def _is_healthy(self, conn, last_used):
+        if getattr(conn, "closed", 0):
+            return False
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logging.warning(f"[DB POOL] Health check failed, discarding connection: {e}")
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._size < self.max_size:
+                    conn, last_used = None, None
+                    self._size += 1
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No DB connection available after {self.timeout}s (max_size={self.max_size})")
+                if not waited:
+                    waited = True
+                    self._waits += 1
+                self._cond.wait(remaining)
+
+        # Health checks and connects happen outside the lock so other threads aren't blocked.
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._health_check_failures += 1
+                self._close_quietly(conn)
+                conn = None
+                self._reconnects += 1
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+            if waited:
+                self._wait_time_total += elapsed
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                # End any implicit transaction so the connection goes back clean.
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or getattr(conn, "closed", 0):
+            self._close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            if discard or getattr(conn, "closed", 0):
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._wait_time_total / self._waits * 1000, 2) if self._waits else 0.0,
+                "avg_checkout_ms": round(self._checkout_time_total / self._checkouts * 1000, 2) if self._checkouts else 0.0,
+                "max_checkout_ms": round(self._checkout_time_max * 1000, 2),
+                "connects": self._connects,
+                "reconnects": self._reconnects,
+                "health_check_failures": self._health_check_failures,
+            }
+
+
+class Transaction:
+    """Handle returned by `db.transaction()`; statements run on the unit of work's connection."""
+
+    def __init__(self, handler):
+        self._handler = handler
+
+    def execute(self, query, params=(), fetch_one=False, fetch_all=False, prepare=False):
+        return self._handler.execute_query(query, params, fetch_one=fetch_one, fetch_all=fetch_all, prepare=prepare)
+
+    def executemany(self, query, seq_of_params, prepare=False):
+        return self._handler.executemany(query, seq_of_params, prepare=prepare)
+
+    def savepoint(self):
+        """Nested unit of work; rolls back to its savepoint on error without aborting the outer one."""
+        return self._handler.transaction()
+
+
 class DBHandler:
     def __init__(self):
         self.db_url = os.getenv("DATABASE_URL")
@@ -17,363 +320,725 @@ class DBHandler:
         if self.is_postgres and not psycopg2:
             logging.error("DATABASE_URL is set but psycopg2 is not installed!")
 
+        self._pool = None
+        self._pool_pid = None
+        # Optional Postgres read replica for explicitly marked read paths (see replica_reads())
+        self.replica_url = os.getenv("DATABASE_REPLICA_URL") if self.is_postgres else None
+        self._replica_pool = None
+        self._replica_pool_pid = None
+        self._replica_max_lag_s = _env_float("DB_REPLICA_MAX_LAG", 30.0)
+        self._replica_lag = None
+        self._replica_lag_checked = 0.0
+        self._replica_stats = {"replica_reads": 0, "pinned_after_write": 0, "lag_primary_reads": 0, "fallbacks": 0}
+        self._replica_stats_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        # SQLite: one persistent connection per thread (sqlite3 connections are not shareable by default)
+        self._local = threading.local()
+        self._sqlite_connects = 0
+        # SQLITE_PROFILE=performance: WAL + tuned pragmas, all writes funnelled through one connection
+        self.sqlite_profile = os.getenv("SQLITE_PROFILE", "default").strip().lower()
+        self._sqlite_writer = None
+        self._sqlite_writer_pid = None
+        self._sqlite_writer_path = None
+        self._sqlite_write_lock = threading.RLock()
+        self._sqlite_writes = 0
+        self._sqlite_write_wait_s = 0.0
+        # Postgres server-side prepared statements for hot queries (execute_query(..., prepare=True)),
+        # tracked per pooled connection: {conn: {statement names}}
+        self.prepared_statements = self.is_postgres and os.getenv("DB_PREPARED_STATEMENTS", "true").strip().lower() in {"1", "true", "yes", "on"}
+        self._prepared = weakref.WeakKeyDictionary()
+        self._prepared_lock = threading.Lock()
+        self._prepared_stats = {"prepares": 0, "executions": 0, "invalidations": 0}
+
+    def _connect_postgres(self):
+        return psycopg2.connect(self.db_url, sslmode='require')
+
+    def _connect_replica(self):
+        conn = psycopg2.connect(self.replica_url, sslmode='require')
+        conn.set_session(readonly=True)
+        return conn
+
+    def _connect_sqlite(self, shared=False):
+        db_path = os.getenv("SQLITE_DB_PATH", "coachlink.db")
+        # shared=True: the single writer, used from many threads but only ever under _sqlite_write_lock
+        conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=not shared)
+        conn.row_factory = sqlite3.Row
+        if self.sqlite_performance:
+            self._apply_sqlite_pragmas(conn)
+        return conn
+
+    @property
+    def sqlite_performance(self):
+        return not self.is_postgres and self.sqlite_profile == "performance"
+
+    def _apply_sqlite_pragmas(self, conn):
+        for pragma in sqlite_performance_pragmas():
+            conn.execute(pragma)
+
     def get_connection(self):
-        """Returns a raw connection object and a cursor functionality wrapper."""
+        """
+        Returns a new, unpooled raw connection. The caller owns it and must close it.
+        Prefer `with db.connection() as conn:` which reuses pooled connections.
+        """
         if self.is_postgres:
-            conn = psycopg2.connect(self.db_url, sslmode='require')
             # auto-commit is often easier for simple scripts, but Flask usually manages transactions.
             # We'll stick to manual commit to match SQLite behavior in app.py
-            return conn
+            return self._connect_postgres()
         else:
-            db_path = os.getenv("SQLITE_DB_PATH", "coachlink.db")
-            conn = sqlite3.connect(db_path, timeout=30.0)
-            conn.row_factory = sqlite3.Row
+            return self._connect_sqlite()
+
+    def _new_pool(self, connect_fn):
+        return ConnectionPool(
+            connect_fn,
+            max_size=_env_int("DB_POOL_MAX_SIZE", 5),
+            timeout=_env_float("DB_POOL_TIMEOUT", 30.0),
+            ping_after=_env_float("DB_POOL_PING_AFTER", 30.0),
+            connect_retries=_env_int("DB_CONNECT_RETRIES", 3),
+            connect_backoff=_env_float("DB_CONNECT_BACKOFF", 0.5),
+        )
+
+    def _get_pool(self, replica=False):
+        # gunicorn forks workers after import; never share sockets across processes.
+        pid = os.getpid()
+        if replica:
+            if self._replica_pool is None or self._replica_pool_pid != pid:
+                with self._pool_lock:
+                    if self._replica_pool is None or self._replica_pool_pid != pid:
+                        self._replica_pool = self._new_pool(self._connect_replica)
+                        self._replica_pool_pid = pid
+            return self._replica_pool
+        if self._pool is None or self._pool_pid != pid:
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != pid:
+                    self._pool = self._new_pool(self._connect_postgres)
+                    self._pool_pid = pid
+        return self._pool
+
+    def _get_sqlite_connection(self):
+        db_path = os.getenv("SQLITE_DB_PATH", "coachlink.db")
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "path", None) == db_path:
             return conn
+        if conn is not None:
+            ConnectionPool._close_quietly(conn)
+        conn = self._connect_sqlite()
+        self._local.conn = conn
+        self._local.path = db_path
+        self._sqlite_connects += 1
+        return conn
+
+    @contextmanager
+    def _sqlite_write_connection(self):
+        """
+        Performance profile only: the process-wide writer connection, held under a lock for the
+        whole block. SQLite allows one writer at a time anyway; queueing on a Python lock is cheaper
+        and fairer than N connections spinning on the busy timeout.
+        """
+        started = time.monotonic()
+        with self._sqlite_write_lock:
+            self._sqlite_write_wait_s += time.monotonic() - started
+            self._sqlite_writes += 1
+            db_path = os.getenv("SQLITE_DB_PATH", "coachlink.db")
+            if (self._sqlite_writer is None or self._sqlite_writer_pid != os.getpid()
+                    or self._sqlite_writer_path != db_path):
+                self._sqlite_writer = self._connect_sqlite(shared=True)
+                self._sqlite_writer_pid = os.getpid()
+                self._sqlite_writer_path = db_path
+                self._sqlite_connects += 1
+            conn = self._sqlite_writer
+            try:
+                yield conn
+            finally:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._sqlite_writer = None
+                    ConnectionPool._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, replica=False):
+        """
+        Checks out a reusable connection for the duration of the block.
+        Postgres: borrowed from the bounded pool (replica=True: the read-replica pool).
+        SQLite: the calling thread's persistent connection.
+        Uncommitted work is rolled back when the block exits.
+        """
+        if not self.is_postgres:
+            conn = self._get_sqlite_connection()
+            try:
+                yield conn
+            finally:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._local.conn = None
+                    ConnectionPool._close_quietly(conn)
+            return
+
+        pool = self._get_pool(replica=replica and bool(self.replica_url))
+        conn = pool.acquire()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Broken socket / server restart: don't hand this connection out again.
+            discard = True
+            raise
+        finally:
+            pool.release(conn, discard=discard)
+
+    def pool_stats(self):
+        """Connection reuse stats, used to size DB_POOL_MAX_SIZE against gunicorn workers + scheduler."""
+        if self.is_postgres:
+            stats = self._get_pool().stats()
+            stats["backend"] = "postgres"
+            if self.replica_url:
+                replica = self._get_pool(replica=True).stats()
+                with self._replica_stats_lock:
+                    replica.update(self._replica_stats)
+                replica["lag_seconds"] = self.replica_lag(max_age=0)
+                stats["replica"] = replica
+            stats["statement_cache"] = self.statement_cache_stats()
+            return stats
+        stats = {"backend": "sqlite", "profile": self.sqlite_profile, "connects": self._sqlite_connects}
+        if self.sqlite_performance:
+            stats["writes"] = self._sqlite_writes
+            stats["avg_write_wait_ms"] = round(self._sqlite_write_wait_s * 1000 / self._sqlite_writes, 2) if self._sqlite_writes else 0.0
+        stats["statement_cache"] = self.statement_cache_stats()
+        return stats
+
+    def statement_cache_stats(self):
+        """
+        Normalized-SQL cache and (Postgres) prepared-statement plan cache hit rates.
+        plan_cache_hit_rate = share of prepared executions that reused a plan already PREPAREd on that connection.
+        """
+        info = _to_pyformat.cache_info()
+        lookups = info.hits + info.misses
+        stats = {
+            "normalize_cache_size": info.currsize,
+            "normalize_hit_rate": round(info.hits / lookups, 4) if lookups else None,
+        }
+        if self.is_postgres:
+            with self._prepared_lock:
+                executions = self._prepared_stats["executions"]
+                stats.update(self._prepared_stats)
+                stats["enabled"] = self.prepared_statements
+                stats["connections"] = len(self._prepared)
+                stats["plan_cache_hit_rate"] = round(1 - self._prepared_stats["prepares"] / executions, 4) if executions else None
+        return stats
 
     def normalize_query(self, query):
         """Converts ? placeholders to %s if using Postgres."""
         if self.is_postgres:
-            return query.replace('?', '%s')
+            return _to_pyformat(query)
         return query
 
-    def execute_query(self, query, params=(), fetch_one=False, fetch_all=False, commit=False):
+    def _prepare(self, conn, cur, query):
+        """
+        Returns the EXECUTE form of `query`, PREPAREing it on this connection the first time,
+        so Postgres plans each hot statement once per pooled connection instead of on every call.
+        """
+        name, body, execute = _prepared_statement(query)
+        with self._prepared_lock:
+            names = self._prepared.setdefault(conn, set())
+            self._prepared_stats["executions"] += 1
+            fresh = name not in names
+        if fresh:
+            cur.execute(f"PREPARE {name} AS {body}")
+            with self._prepared_lock:
+                names.add(name)
+                self._prepared_stats["prepares"] += 1
+        return execute
+
+    def _forget_prepared(self, conn, error):
+        # 26000 invalid_sql_statement_name: the server no longer has our statements (e.g. DISCARD ALL)
+        if getattr(error, "pgcode", None) == "26000":
+            with self._prepared_lock:
+                self._prepared.pop(conn, None)
+                self._prepared_stats["invalidations"] += 1
+
+    def _current_tx(self):
+        return getattr(self._local, "tx", None)
+
+    @contextmanager
+    def replica_reads(self):
+        """
+        Marks a block of pure reads as safe to serve from DATABASE_REPLICA_URL:
+
+            with db.replica_reads():
+                rows = db.execute_query("SELECT ...", fetch_all=True)
+
+        Statements still go to the primary when they write, run inside db.transaction(), or when
+        replica lag exceeds DB_REPLICA_MAX_LAG. After the first write inside the block, the rest of
+        the block is pinned to the primary so it reads its own writes.
+        No-op without a replica (and always on SQLite).
+        """
+        previous = getattr(self._local, "replica_ok", False)
+        self._local.replica_ok = bool(self.replica_url)
+        try:
+            yield
+        finally:
+            self._local.replica_ok = previous
+
+    def _count_replica(self, key):
+        # Bumped from every request thread and the scheduler; += on a dict entry is not atomic.
+        with self._replica_stats_lock:
+            self._replica_stats[key] += 1
+
+    def _mark_write(self):
+        if getattr(self._local, "replica_ok", False):
+            self._local.replica_ok = False
+            self._count_replica("pinned_after_write")
+
+    def replica_lag(self, max_age=10.0):
+        """Seconds the replica is behind (cached for max_age seconds); None if unknown or no replica."""
+        if not self.replica_url:
+            return None
+        now = time.monotonic()
+        if max_age and now - self._replica_lag_checked < max_age:
+            return self._replica_lag
+        self._replica_lag_checked = now
+        try:
+            with self.connection(replica=True) as conn:
+                cur = conn.cursor()
+                # NULL replay timestamp = nothing replayed yet / not a standby; treat as caught up
+                cur.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                row = cur.fetchone()
+                self._replica_lag = float(row[0]) if row and row[0] is not None else 0.0
+        except Exception as e:
+            logging.warning(f"[DB REPLICA] Lag check failed: {e}")
+            self._replica_lag = None
+        return self._replica_lag
+
+    def _route_to_replica(self):
+        if not getattr(self._local, "replica_ok", False):
+            return False
+        lag = self.replica_lag()
+        if lag is None or lag > self._replica_max_lag_s:
+            self._count_replica("lag_primary_reads")
+            return False
+        return True
+
+    @contextmanager
+    def _statement_connection(self, write=False):
+        """Yields (conn, in_transaction): the open unit of work's connection if any, else a pooled one."""
+        tx = self._current_tx()
+        if tx is not None:
+            yield tx["conn"], True
+            return
+        if write:
+            self._mark_write()
+            if self.sqlite_performance:
+                with self._sqlite_write_connection() as conn:
+                    yield conn, False
+                return
+        with contextlib.ExitStack() as stack:
+            conn = None
+            if not write and self._route_to_replica():
+                try:
+                    conn = stack.enter_context(self.connection(replica=True))
+                    self._count_replica("replica_reads")
+                except Exception as e:
+                    logging.warning(f"[DB REPLICA] Replica unavailable, reading from primary: {e}")
+                    self._count_replica("fallbacks")
+            if conn is None:
+                conn = stack.enter_context(self.connection())
+            yield conn, False
+
+    def execute_query(self, query, params=(), fetch_one=False, fetch_all=False, commit=False, prepare=False):
         """
         Executes a query safely handling DB differences.
+        Inside `db.transaction()` the statement joins the open unit of work and
+        commit=True is deferred to the end of the block.
+        prepare=True marks a hot statement: on Postgres it runs as a server-side prepared
+        statement (see _prepare). SQLite ignores it; sqlite3 already caches statements per connection.
         Returns:
             - None (for inserts/updates)
             - Row/Dict (if fetch_one=True)
             - List[Row/Dict] (if fetch_all=True)
         """
-        conn = self.get_connection()
-        try:
-            query = self.normalize_query(query)
-            
-            if self.is_postgres:
-                # Use RealDictCursor for dict-like access
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-            else:
+        started = None
+        with self._statement_connection(write=commit) as (conn, in_tx):
+            try:
+                sql = query
+                query = self.normalize_query(query)
+
+                if self.is_postgres:
+                    # Use RealDictCursor for dict-like access
+                    cur = conn.cursor(cursor_factory=RealDictCursor)
+                else:
+                    cur = conn.cursor()
+
+                started = time.perf_counter()
+                if prepare and self.prepared_statements:
+                    cur.execute(self._prepare(conn, cur, sql), params)
+                else:
+                    cur.execute(query, params)
+
+                result = None
+                if fetch_one:
+                    result = cur.fetchone()
+                    rows = 1 if result is not None else 0
+                elif fetch_all:
+                    result = cur.fetchall()
+                    rows = len(result)
+                else:
+                    rows = max(cur.rowcount, 0)
+
+                if commit and not in_tx:
+                    conn.commit()
+
+                metrics.record(query, params, time.perf_counter() - started, rows)
+                return result
+            except Exception as e:
+                logging.error(f"DB Error: {e} | Query: {query}")
+                if prepare and self.prepared_statements:
+                    self._forget_prepared(conn, e)
+                if started is not None:
+                    metrics.record(query, params, time.perf_counter() - started, 0, error=True)
+                raise e
+
+    def executemany(self, query, seq_of_params, commit=False, prepare=False):
+        """
+        Bulk variant of execute_query for inserts/updates. Joins an open transaction like execute_query.
+        prepare=True (Postgres): one PREPARE, then the rows are sent as EXECUTE batches.
+        """
+        started = None
+        with self._statement_connection(write=commit) as (conn, in_tx):
+            try:
+                sql = query
+                query = self.normalize_query(query)
+                cur = conn.cursor()
+                started = time.perf_counter()
+                if prepare and self.prepared_statements:
+                    seq_of_params = list(seq_of_params)
+                    execute_batch(cur, self._prepare(conn, cur, sql), seq_of_params, page_size=100)
+                    rows = len(seq_of_params)
+                else:
+                    cur.executemany(query, seq_of_params)
+                    rows = max(cur.rowcount, 0)
+                if commit and not in_tx:
+                    conn.commit()
+                metrics.record(query, None, time.perf_counter() - started, rows)
+            except Exception as e:
+                logging.error(f"DB Error: {e} | Query: {query}")
+                if prepare and self.prepared_statements:
+                    self._forget_prepared(conn, e)
+                if started is not None:
+                    metrics.record(query, None, time.perf_counter() - started, 0, error=True)
+                raise e
+
+    def iter_query(self, query, params=(), batch_size=500, key="id"):
+        """
+        Streams the rows of a SELECT without materializing the result set:
+
+            for row in db.iter_query("SELECT id, title FROM meetings WHERE aux_meeting_id IS NULL"):
+                ...
+
+        Rows come back ordered by `key`, which must be a unique column of the result
+        (don't put ORDER BY / LIMIT in `query`).
+        Postgres: one server-side (named) cursor, fetched batch_size rows at a time; the pooled
+        connection is held until the generator is exhausted or closed.
+        SQLite: keyset pagination (WHERE key > last ORDER BY key LIMIT batch_size), so no
+        read transaction is held open between batches.
+        key=None streams in the query's own order (Postgres named cursor / SQLite fetchmany).
+        """
+        wrapped = f"SELECT * FROM ({query}) AS _iter"
+        if self.is_postgres:
+            if key:
+                wrapped += f" ORDER BY {key}"
+            started = time.perf_counter()
+            rows = 0
+            with self._statement_connection() as (conn, _in_tx):
+                cur = conn.cursor(name=f"iter_{threading.get_ident()}_{int(started * 1e6)}", cursor_factory=RealDictCursor)
+                cur.itersize = batch_size
+                try:
+                    cur.execute(self.normalize_query(wrapped), params)
+                    while True:
+                        batch = cur.fetchmany(batch_size)
+                        if not batch:
+                            break
+                        rows += len(batch)
+                        yield from batch
+                finally:
+                    cur.close()
+                    metrics.record(wrapped, params, time.perf_counter() - started, rows)
+            return
+
+        if not key:
+            with self._statement_connection() as (conn, _in_tx):
                 cur = conn.cursor()
+                cur.execute(query, params)
+                while True:
+                    batch = cur.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield from batch
+            return
+
+        last = None
+        while True:
+            if last is None:
+                batch = self.execute_query(f"{wrapped} ORDER BY {key} LIMIT ?", (*params, batch_size), fetch_all=True)
+            else:
+                batch = self.execute_query(f"{wrapped} WHERE {key} > ? ORDER BY {key} LIMIT ?", (*params, last, batch_size), fetch_all=True)
+            if not batch:
+                return
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            last = batch[-1][key]
+
+    def upsert(self, table, key_cols, values, update_cols=None, coalesce_cols=(), returning=None, commit=True):
+        """
+        Single-statement insert-or-update: INSERT ... ON CONFLICT (key_cols) DO UPDATE ... [RETURNING].
+        Requires a UNIQUE/PRIMARY KEY constraint on key_cols (SQLite >= 3.35 for RETURNING).
+
+        values:        {column: value} for the row to insert.
+        update_cols:   columns overwritten on conflict (default: every non-key column in values).
+        coalesce_cols: subset of update_cols whose current value is kept when the new value is NULL.
+        returning:     column name or list of names; the resulting row is returned (fetch_one).
+        """
+        if isinstance(key_cols, str):
+            key_cols = [key_cols]
+        cols = list(values.keys())
+        if update_cols is None:
+            update_cols = [c for c in cols if c not in key_cols]
 
-            cur.execute(query, params)
-            
-            result = None
-            if fetch_one:
-                result = cur.fetchone()
-            elif fetch_all:
-                result = cur.fetchall()
+        assignments = []
+        for c in update_cols:
+            if c in coalesce_cols:
+                assignments.append(f"{c} = COALESCE(excluded.{c}, {table}.{c})")
+            else:
+                assignments.append(f"{c} = excluded.{c}")
+        if not assignments:
+            # DO NOTHING would make RETURNING empty on conflict; a no-op update keeps the row visible.
+            assignments = [f"{key_cols[0]} = excluded.{key_cols[0]}"]
+
+        query = (
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+            f"ON CONFLICT ({', '.join(key_cols)}) DO UPDATE SET {', '.join(assignments)}"
+        )
+        if returning:
+            if isinstance(returning, str):
+                returning = [returning]
+            query += f" RETURNING {', '.join(returning)}"
+        return self.execute_query(query, tuple(values[c] for c in cols), fetch_one=bool(returning), commit=commit)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work for multi-statement handlers:
+
+            with db.transaction() as tx:
+                tx.execute("UPDATE ...", (...))
+                db.execute_query("INSERT ...", (...), commit=True)  # joins, commit is deferred
+
+        Every statement issued on this thread inside the block shares one connection and is
+        committed once on exit, or rolled back if the block raises.
+        Nested transaction() blocks become SAVEPOINTs, so an inner failure only undoes the inner block.
+        Callbacks registered with on_commit() run once the outermost block has committed.
+        """
+        tx = self._current_tx()
+        if tx is not None:
+            tx["depth"] += 1
+            name = f"sp_{tx['depth']}"
+            conn = tx["conn"]
+            pending = len(tx["on_commit"])
+            conn.cursor().execute(f"SAVEPOINT {name}")
+            try:
+                yield Transaction(self)
+            except Exception:
+                cur = conn.cursor()
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                cur.execute(f"RELEASE SAVEPOINT {name}")
+                # Whatever the rolled-back block asked for never happened
+                del tx["on_commit"][pending:]
+                raise
+            else:
+                conn.cursor().execute(f"RELEASE SAVEPOINT {name}")
+            finally:
+                tx["depth"] -= 1
+            return
 
-            if commit:
+        # Performance profile: units of work always run on the single SQLite writer.
+        conn_cm = self._sqlite_write_connection() if self.sqlite_performance else self.connection()
+        with conn_cm as conn:
+            if not self.is_postgres and not conn.in_transaction:
+                # Open the transaction explicitly; otherwise the first SAVEPOINT would become
+                # the outer transaction and its RELEASE would commit early.
+                conn.execute("BEGIN")
+            tx = self._local.tx = {"conn": conn, "depth": 0, "on_commit": []}
+            self._mark_write()
+            try:
+                yield Transaction(self)
                 conn.commit()
-            
-            return result
-        except Exception as e:
-            logging.error(f"DB Error: {e} | Query: {query}")
-            if commit:
+            except Exception:
                 conn.rollback()
-            raise e
-        finally:
-            conn.close()
+                raise
+            finally:
+                self._local.tx = None
+        for fn in tx["on_commit"]:
+            try:
+                fn()
+            except Exception as e:
+                logging.error(f"on_commit callback {fn!r} failed: {e}")
+
+    def on_commit(self, fn):
+        """Runs fn() after the open db.transaction() commits (dropped if it rolls back), or now without one."""
+        tx = self._current_tx()
+        if tx is None:
+            fn()
+        else:
+            tx["on_commit"].append(fn)
 
     def init_db(self):
-        """Creates tables using syntax compatible with both DBs where possible."""
-        # Note: We need separate Create Table statements because of types like AUTOINCREMENT vs SERIAL
-        
-        create_client_sql = ""
-        create_msg_sql = ""
-        create_mtg_sql = ""
-        create_usr_sql = ""
+        """Brings the schema up to date (see migrations.py), then reconciles INDEXES (apply_indexes)."""
+        from migrations import migrate
+        try:
+            migrate(self)
+            self.apply_indexes()
+        except Exception as e:
+            logging.error(f"Init DB Error: {e}")
 
+    def _backfill(self, table, pk, src_cols, null_col, set_cols, convert, batch_size=500):
+        """
+        Generic bounded-batch backfill: walks rows where `null_col` IS NULL in primary-key order,
+        computes new values in Python with convert(row) -> tuple(set_cols) and writes them back.
+        Keyset paging means rows that can't be converted (left NULL) are not re-read forever.
+        """
+        select_cols = ", ".join(src_cols)
+        assignments = ", ".join(f"{c} = ?" for c in set_cols)
+        last_pk = "" if pk == "email" else 0
+        total = 0
+        try:
+            while True:
+                rows = self.execute_query(
+                    f"SELECT {pk} AS pk, {select_cols} FROM {table} "
+                    f"WHERE {null_col} IS NULL AND {pk} > ? ORDER BY {pk} LIMIT {int(batch_size)}",
+                    (last_pk,),
+                    fetch_all=True
+                )
+                if not rows:
+                    break
+                updates = [(*convert(r), r['pk']) for r in rows]
+                self.executemany(f"UPDATE {table} SET {assignments} WHERE {pk} = ?", updates, commit=True)
+                total += len(rows)
+                last_pk = rows[-1]['pk']
+        except Exception as e:
+            # Re-raise so the calling migration isn't recorded as applied and runs again on next boot;
+            # batches already committed are skipped then (they are no longer NULL).
+            logging.error(f"Backfill of {table}.{null_col} failed after {total} rows: {e}")
+            raise
+        if total:
+            logging.info(f"Backfilled {table}.{null_col} for {total} rows")
+        return total
+
+    def backfill_phone_e164(self):
+        """Fills users.phone_e164 / meetings.salesperson_phone_e164 for rows written before those columns existed."""
+        from utils import to_e164
+
+        self._backfill("users", "email", ["phone"], "phone_e164", ["phone_e164"],
+                       lambda r: (to_e164(r['phone']),))
+        self._backfill("meetings", "id", ["salesperson_phone"], "salesperson_phone_e164", ["salesperson_phone_e164"],
+                       lambda r: (to_e164(r['salesperson_phone']),))
+
+    def backfill_meeting_timestamps(self):
+        """Fills meetings.start_at / end_at from the legacy TEXT start_time / end_time columns."""
+        from utils import try_parse_iso_datetime
+
+        def convert(r):
+            start_dt = try_parse_iso_datetime(r['start_time'])
+            end_dt = try_parse_iso_datetime(r['end_time'])
+            if end_dt is None and start_dt is not None:
+                # Same fallback the scheduler has always applied to meetings without an end time
+                end_dt = start_dt + timedelta(minutes=30)
+            return (self.to_db_timestamp(start_dt), self.to_db_timestamp(end_dt))
+
+        self._backfill("meetings", "id", ["start_time", "end_time"], "end_at", ["start_at", "end_at"], convert)
+
+    def to_db_timestamp(self, dt):
+        """Bind value for the typed *_at columns: aware datetime (TIMESTAMPTZ) on Postgres, epoch seconds on SQLite."""
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
         if self.is_postgres:
-            # Postgres Syntax
-            create_client_sql = """
-                CREATE TABLE IF NOT EXISTS clients (
-                    id SERIAL PRIMARY KEY,
-                    hubspot_contact_id TEXT,
-                    name TEXT,
-                    email TEXT UNIQUE,
-                    phone TEXT UNIQUE,
-                    company TEXT
-                );
-            """
-            create_msg_sql = """
-                CREATE TABLE IF NOT EXISTS messages (
-                    id SERIAL PRIMARY KEY,
-                    client_id INTEGER REFERENCES clients(id),
-                    direction TEXT,
-                    message TEXT,
-                    timestamp TEXT
-                );
-            """
-            create_mtg_sql = """
-                CREATE TABLE IF NOT EXISTS meetings (
-                    id SERIAL PRIMARY KEY,
-                    outlook_event_id TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    client_id INTEGER REFERENCES clients(id),
-                    status TEXT,
-                    last_client_reply TEXT,
-                    salesperson_phone TEXT,
-                    summary TEXT,
-                    read_ai_url TEXT,
-                    location TEXT,
-                    attendees TEXT,
-                    aux_meeting_id INTEGER,
-                    aux_meeting_token TEXT,
-                    title TEXT,
-                    survey_status TEXT DEFAULT 'pending'
-                );
-            """
-            create_usr_sql = """
-                CREATE TABLE IF NOT EXISTS users (
-                    email TEXT PRIMARY KEY,
-                    name TEXT,
-                    phone TEXT,
-                    hubspot_contact_id TEXT,
-                    timezone TEXT DEFAULT 'UTC'
-                );
-            """
-
-            create_transcripts_sql = """
-                CREATE TABLE IF NOT EXISTS meeting_transcripts (
-                    id SERIAL PRIMARY KEY,
-                    meeting_id INTEGER REFERENCES meetings(id),
-                    speaker TEXT,
-                    timestamp TEXT,
-                    text TEXT,
-                    source TEXT DEFAULT 'read_ai',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """
-
-            create_coaching_sql = """
-                CREATE TABLE IF NOT EXISTS meeting_coaching (
-                  id SERIAL PRIMARY KEY,
-                  session_id TEXT UNIQUE NOT NULL,
-                  title TEXT,
-                  transcript TEXT NOT NULL,
-                  source TEXT,
-                  coaching JSONB,
-                  summary TEXT,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """
-            
-            create_synced_surveys_sql = """
-                CREATE TABLE IF NOT EXISTS synced_surveys (
-                  id SERIAL PRIMARY KEY,
-                  survey_id INTEGER UNIQUE NOT NULL,
-                  participant_email TEXT,
-                  synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """
-        else:
-            # SQLite Syntax
-            create_client_sql = """
-                CREATE TABLE IF NOT EXISTS clients (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    hubspot_contact_id TEXT,
-                    name TEXT,
-                    email TEXT UNIQUE,
-                    phone TEXT UNIQUE,
-                    company TEXT
-                );
-            """
-            create_msg_sql = """
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    client_id INTEGER,
-                    direction TEXT,
-                    message TEXT,
-                    timestamp TEXT,
-                    FOREIGN KEY(client_id) REFERENCES clients(id)
-                );
-            """
-            create_mtg_sql = """
-                CREATE TABLE IF NOT EXISTS meetings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    outlook_event_id TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    client_id INTEGER,
-                    status TEXT,
-                    last_client_reply TEXT,
-                    salesperson_phone TEXT,
-                    summary TEXT,
-                    read_ai_url TEXT,
-                    location TEXT,
-                    attendees TEXT,
-                    aux_meeting_id INTEGER,
-                    aux_meeting_token TEXT,
-                    title TEXT,
-                    survey_status TEXT DEFAULT 'pending',
-                    FOREIGN KEY(client_id) REFERENCES clients(id)
-                );
-            """
-            create_usr_sql = """
-                CREATE TABLE IF NOT EXISTS users (
-                    email TEXT PRIMARY KEY,
-                    name TEXT,
-                    phone TEXT,
-                    hubspot_contact_id TEXT,
-                    timezone TEXT DEFAULT 'UTC'
-                );
-            """
-
-            create_transcripts_sql = """
-                CREATE TABLE IF NOT EXISTS meeting_transcripts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    meeting_id INTEGER,
-                    speaker TEXT,
-                    timestamp TEXT,
-                    text TEXT,
-                    source TEXT DEFAULT 'read_ai',
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(meeting_id) REFERENCES meetings(id)
-                );
-            """
-
-            create_coaching_sql = """
-                CREATE TABLE IF NOT EXISTS meeting_coaching (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT UNIQUE NOT NULL,
-                    title TEXT,
-                    transcript TEXT NOT NULL,
-                    source TEXT,
-                    coaching TEXT,
-                    summary TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                );
-            """
-            
-            create_synced_surveys_sql = """
-                CREATE TABLE IF NOT EXISTS synced_surveys (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    survey_id INTEGER UNIQUE NOT NULL,
-                    participant_email TEXT,
-                    synced_at TEXT DEFAULT CURRENT_TIMESTAMP
-                );
-            """
-
-        # Execute
-        # We can't use the execute_query helper easily for DDL scripts with multiple statements or specific logic
-        # so we do a raw connection here.
+            return dt
+        return int(dt.timestamp())
+
+    def from_db_timestamp(self, value):
+        """Inverse of to_db_timestamp: returns an aware UTC datetime (or None)."""
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return datetime.fromtimestamp(int(value), tz=timezone.utc)
+
+    def create_indexes(self, specs):
+        """
+        Idempotently creates each (name, table, columns[, partial predicate]) index in `specs`.
+        Postgres builds them CONCURRENTLY (no write lock on live tables), which must run outside a
+        transaction, so this uses its own autocommit connection.
+        """
         conn = self.get_connection()
-        cur = conn.cursor()
         try:
-            cur.execute(create_client_sql)
-            cur.execute(create_msg_sql)
-            cur.execute(create_mtg_sql)
-            cur.execute(create_usr_sql)
-            if 'create_transcripts_sql' in locals():
-                cur.execute(create_transcripts_sql)
-            if 'create_coaching_sql' in locals():
-                cur.execute(create_coaching_sql)
-            if 'create_synced_surveys_sql' in locals():
-                cur.execute(create_synced_surveys_sql)
-            conn.commit()
-            
-            # Migration check (Add columns if missing) - Simplified for robustness
-            # In a real production app, we would use Alembic. 
-            # Here we just blindly try to add columns and ignore "exists" errors for backward comp.
-            try:
-                # Add columns that might be missing from older schema versions
-                alter_cmds = []
-                if self.is_postgres:
-                    alter_cmds = [
-                        "ALTER TABLE clients ADD COLUMN IF NOT EXISTS hubspot_contact_id TEXT",
-                        "ALTER TABLE users ADD COLUMN IF NOT EXISTS hubspot_contact_id TEXT",
-                        "ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone TEXT DEFAULT 'UTC'",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS last_client_reply TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS salesperson_phone TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS summary TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS read_ai_url TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS location TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS attendees TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS aux_meeting_id INTEGER",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS aux_meeting_token TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS title TEXT",
-                        "ALTER TABLE meetings ADD COLUMN IF NOT EXISTS survey_status TEXT DEFAULT 'pending'"
-                    ]
-                else:
-                    # SQLite doesn't support IF NOT EXISTS in ALTER COLUMN easily, 
-                    # relying on exception handling in app.py's original logic was smart.
-                    # We will replicate strict checks.
-                    
-                    # Clients
-                    cur.execute("PRAGMA table_info(clients)")
-                    cols = [row['name'] for row in cur.fetchall()]
-                    if 'hubspot_contact_id' not in cols:
-                        cur.execute("ALTER TABLE clients ADD COLUMN hubspot_contact_id TEXT")
-                    
-                    # Meetings
-                    cur.execute("PRAGMA table_info(meetings)")
-                    cols = [row['name'] for row in cur.fetchall()]
-                    if 'last_client_reply' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN last_client_reply TEXT")
-                    if 'salesperson_phone' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN salesperson_phone TEXT")
-                    if 'summary' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN summary TEXT")
-                    if 'read_ai_url' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN read_ai_url TEXT")
-                    if 'location' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN location TEXT")
-                    if 'attendees' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN attendees TEXT")
-                    if 'aux_meeting_id' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN aux_meeting_id INTEGER")
-                    if 'aux_meeting_token' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN aux_meeting_token TEXT")
-                    if 'title' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN title TEXT")
-                    if 'survey_status' not in cols:
-                        cur.execute("ALTER TABLE meetings ADD COLUMN survey_status TEXT DEFAULT 'pending'")
-
-                    # Users
-                    cur.execute("PRAGMA table_info(users)")
-                    cols = [row['name'] for row in cur.fetchall()]
-                    if 'hubspot_contact_id' not in cols:
-                        cur.execute("ALTER TABLE users ADD COLUMN hubspot_contact_id TEXT")
-                    if 'timezone' not in cols:
-                        cur.execute("ALTER TABLE users ADD COLUMN timezone TEXT DEFAULT 'UTC'")
-
-                    # Transcripts
-                    cur.execute("PRAGMA table_info(meeting_transcripts)")
-                    cols = [row['name'] for row in cur.fetchall()]
-                    if 'source' not in cols:
-                         cur.execute("ALTER TABLE meeting_transcripts ADD COLUMN source TEXT DEFAULT 'read_ai'")
-                    if 'created_at' not in cols:
-                         cur.execute("ALTER TABLE meeting_transcripts ADD COLUMN created_at TEXT DEFAULT CURRENT_TIMESTAMP")
-                        
-                for cmd in alter_cmds:
-                    cur.execute(cmd)
-                
-                # Add summary column to meeting_coaching
-                self._add_summary_column_to_coaching(cur)
-                
+            if self.is_postgres:
+                conn.autocommit = True
+            cur = conn.cursor()
+            for name, table, columns, *predicate in specs:
+                cols = ", ".join(columns)
+                target = f"{table} ({cols})" + (f" WHERE {predicate[0]}" if predicate else "")
+                try:
+                    if self.is_postgres:
+                        # A failed CONCURRENTLY build leaves an INVALID index behind that IF NOT EXISTS would skip.
+                        cur.execute(
+                            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s",
+                            (name,)
+                        )
+                        row = cur.fetchone()
+                        if row and not row[0]:
+                            logging.warning(f"Dropping invalid index {name} before rebuilding it")
+                            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                        cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}")
+                    else:
+                        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+                except Exception as e:
+                    logging.warning(f"Could not create index {name} on {table}({cols}): {e}")
+            if not self.is_postgres:
                 conn.commit()
-                
-            except Exception as e:
-                logging.warning(f"Schema migration warning: {e}")
-                
-        except Exception as e:
-            logging.error(f"Init DB Error: {e}")
         finally:
             conn.close()
 
-    def _add_summary_column_to_coaching(self, cur):
-        """Helper to safely add summary column to meeting_coaching if missing."""
+    def apply_indexes(self):
+        """
+        Startup reconciliation against INDEXES: one catalogue read, then builds only the entries that
+        are missing or INVALID (e.g. a CONCURRENTLY build that died mid-way). Indexes themselves are
+        introduced by migrations with explicit DDL; this only repairs drift.
+        """
+        names = [entry[0] for entry in INDEXES]
         try:
             if self.is_postgres:
-                cur.execute("ALTER TABLE meeting_coaching ADD COLUMN IF NOT EXISTS summary TEXT")
+                rows = self.execute_query(
+                    "SELECT c.relname AS name FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE i.indisvalid AND c.relname = ANY(?)",
+                    (names,),
+                    fetch_all=True
+                )
             else:
-                cur.execute("PRAGMA table_info(meeting_coaching)")
-                cols = [row['name'] for row in cur.fetchall()]
-                if 'summary' not in cols:
-                     cur.execute("ALTER TABLE meeting_coaching ADD COLUMN summary TEXT")
+                rows = self.execute_query("SELECT name FROM sqlite_master WHERE type = 'index'", fetch_all=True)
         except Exception as e:
-            logging.warning(f"Could not add summary column to meeting_coaching: {e}")
+            logging.warning(f"Index reconciliation skipped: {e}")
+            return []
+        present = {row['name'] for row in rows or []}
+        missing = [entry for entry in INDEXES if entry[0] not in present]
+        if missing:
+            logging.warning(f"Rebuilding missing/invalid indexes: {', '.join(entry[0] for entry in missing)}")
+            self.create_indexes([(name, table, columns, *predicate) for name, table, columns, _reason, *predicate in missing])
+        return [entry[0] for entry in missing]
 
 # Singleton shared instance
 db = DBHandler()
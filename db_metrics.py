@@ -0,0 +1,243 @@
+"""
+Per-statement query metrics recorded by DBHandler.execute_query / executemany.
+
+Keyed by normalized SQL (literals -> ?, whitespace collapsed, IN lists folded) and by the calling
+function (first stack frame outside the DB layer). Exposed via GET /admin/db-stats.
+
+Env:
+  DB_METRICS             "0" disables recording entirely (default on).
+  DB_SLOW_QUERY_MS       statements at or above this go to the slow-query log (default 200).
+  DB_SLOW_QUERY_SAMPLE   fraction of slow statements that are logged (default 1.0).
+  DB_N_PLUS_ONE          same statement repeated this many times in one request / scheduler tick
+                         is flagged as a likely N+1 (default 10).
+"""
+import os
+import re
+import sys
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Histogram bucket upper bounds in ms; the last bucket is open-ended.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Frames from these files are skipped when attributing a statement to its caller.
+_DB_LAYER_FILES = (
+    "database.py", "async_database.py", "db_metrics.py", "contextlib.py", "migrations.py", "repositories.py",
+)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_sql(sql):
+    """Canonical form used as the metrics key: literals and placeholders become ?, IN lists fold."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def redact_params(params):
+    """Keeps the shape of the parameters (type, length) but never their values."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: _redact(v) for k, v in params.items()}
+    return [_redact(v) for v in params]
+
+
+def _redact(value):
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def caller_name():
+    """'module.function' of the first frame outside the DB layer."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _DB_LAYER_FILES:
+            module = frame.f_globals.get("__name__", filename)
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class _Stat:
+    __slots__ = ("calls", "total_s", "max_s", "rows", "errors", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed, rows, error):
+        self.calls += 1
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+        self.rows += rows or 0
+        if error:
+            self.errors += 1
+        ms = elapsed * 1000
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile_ms(self, p):
+        """Upper bound of the bucket holding the p-th percentile (histogram resolution)."""
+        target = self.calls * p
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else round(self.max_s * 1000, 2)
+        return 0
+
+    def to_dict(self):
+        labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total_s * 1000, 2),
+            "avg_ms": round(self.total_s * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_s * 1000, 2),
+            "p50_ms": self.percentile_ms(0.50),
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "rows": self.rows,
+            "avg_rows": round(self.rows / self.calls, 2) if self.calls else 0.0,
+            "errors": self.errors,
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class QueryMetrics:
+    def __init__(self):
+        self.enabled = os.getenv("DB_METRICS", "1").strip().lower() not in ("0", "false", "no")
+        self.slow_ms = _env_float("DB_SLOW_QUERY_MS", 200.0)
+        self.slow_sample = _env_float("DB_SLOW_QUERY_SAMPLE", 1.0)
+        self.n_plus_one_threshold = int(_env_float("DB_N_PLUS_ONE", 10))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._norm_cache = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._queries = {}       # normalized sql -> _Stat
+            self._by_caller = {}     # (caller, normalized sql) -> _Stat
+            self._slow = deque(maxlen=100)
+            self._n_plus_one = {}    # (scope, normalized sql) -> {"scopes", "max_repeats"}
+
+    def _normalize(self, sql):
+        key = self._norm_cache.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if len(self._norm_cache) < 2000:
+                self._norm_cache[sql] = key
+        return key
+
+    def start_scope(self, name):
+        """Groups statements of one request / scheduler tick to spot N+1 loops. Pair with end_scope()."""
+        self._local.scope = (name, {})
+
+    def end_scope(self):
+        scope = getattr(self._local, "scope", None)
+        self._local.scope = None
+        if scope is not None and self.enabled:
+            self._flag_repeats(*scope)
+
+    @contextmanager
+    def scope(self, name):
+        self.start_scope(name)
+        try:
+            yield
+        finally:
+            self.end_scope()
+
+    def _flag_repeats(self, name, counts):
+        for sql, n in counts.items():
+            if n < self.n_plus_one_threshold:
+                continue
+            with self._lock:
+                entry = self._n_plus_one.setdefault((name, sql), {"scopes": 0, "max_repeats": 0})
+                entry["scopes"] += 1
+                entry["max_repeats"] = max(entry["max_repeats"], n)
+
+    def record(self, sql, params, elapsed, rows, error=False):
+        if not self.enabled:
+            return
+        key = self._normalize(sql)
+        caller = caller_name()
+        with self._lock:
+            self._queries.setdefault(key, _Stat()).add(elapsed, rows, error)
+            self._by_caller.setdefault((caller, key), _Stat()).add(elapsed, rows, error)
+
+        scope = getattr(self._local, "scope", None)
+        if scope is not None:
+            scope[1][key] = scope[1].get(key, 0) + 1
+
+        ms = elapsed * 1000
+        if ms >= self.slow_ms and random.random() < self.slow_sample:
+            entry = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "ms": round(ms, 2),
+                "caller": caller,
+                "query": key,
+                "params": redact_params(params),
+                "rows": rows,
+            }
+            with self._lock:
+                self._slow.append(entry)
+            logging.warning(f"[DB SLOW] {ms:.1f}ms {caller}: {key} params={entry['params']}")
+
+    def snapshot(self, top=25, sort="total_ms"):
+        with self._lock:
+            queries = [dict(query=k, **s.to_dict()) for k, s in self._queries.items()]
+            callers = [dict(caller=c, query=k, **s.to_dict()) for (c, k), s in self._by_caller.items()]
+            slow = list(self._slow)
+            n_plus_one = [dict(scope=sc, query=k, **v) for (sc, k), v in self._n_plus_one.items()]
+            started_at = self.started_at
+
+        def order(rows):
+            return sorted(rows, key=lambda r: r.get(sort, 0), reverse=True)[:top]
+
+        return {
+            "enabled": self.enabled,
+            "since": started_at.isoformat(),
+            "slow_query_ms": self.slow_ms,
+            "distinct_queries": len(queries),
+            "total_calls": sum(q["calls"] for q in queries),
+            "total_ms": round(sum(q["total_ms"] for q in queries), 2),
+            "queries": order(queries),
+            "callers": order(callers),
+            "n_plus_one": sorted(n_plus_one, key=lambda r: r["max_repeats"], reverse=True)[:top],
+            "slow_queries": slow[-top:][::-1],
+        }
+
+
+metrics = QueryMetrics()
@@ -0,0 +1,159 @@
+"""
+In-process due-time index for the post-meeting reminder / survey trigger.
+
+Instead of scanning every survey-pending meeting once a minute, the scheduler keeps a min-heap of
+(due time, meeting id), where due time = end_at + DUE_BUFFER_SECONDS (1 minute). The due-check job
+runs every few seconds and only reads meetings that changed recently, or the heap top once it is due:
+    due_queue.sync()               # cheap: a `due_changed_at > last refresh` read, or a periodic full resync
+    ids = due_queue.pop_due(now)   # meeting ids whose due time has passed
+
+Keeping it current:
+- The database stamps meetings.due_changed_at (trigger, see migrations.py) on every insert and on any
+  change to end_at / status / survey_status, whichever process makes it. Every sync() reads the
+  survey-pending rows stamped since the previous refresh, so a webhook handled by a web process
+  reaches the scheduler in the leader / worker process on its next tick.
+- The window reaches DUE_QUEUE_REFRESH_OVERLAP_SECONDS further back than the last refresh: a
+  transaction stamps its rows when it writes them but they only become visible when it commits, so a
+  plain high-water mark would skip rows committed out of order. Re-reading a row is harmless.
+- process_outlook_webhook also calls notify(meeting_id, end_dt) after updating a meeting, so the
+  same process sees it without waiting for the refresh.
+- A full resync every DUE_QUEUE_RESYNC_SECONDS re-reads every survey-pending meeting as a safety net
+  (e.g. rows written before due_changed_at existed). It merges into the heap rather than replacing
+  it, so a notify() that races the resync query is never lost.
+
+The heap is only a hint: popped ids are re-read from the database and re-checked before anything is
+sent, so a stale entry costs one lookup, never a duplicate reminder.
+
+Env: DUE_QUEUE_REFRESH_SECONDS (0: every tick), DUE_QUEUE_REFRESH_OVERLAP_SECONDS (120),
+DUE_QUEUE_RESYNC_SECONDS (900).
+"""
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from database import db, _env_float
+import repositories
+
+DUE_BUFFER_SECONDS = 60
+
+
+class DueQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []         # (due_ts, meeting_id); superseded entries are skipped on pop
+        self._due = {}          # meeting_id -> due_ts of its live heap entry
+        self._loaded = {}       # meeting_id -> (due_changed_at, due_ts) last read from the database (rebuilt by resync)
+        self._changed_since = None  # wall-clock start of the last refresh / resync (UTC)
+        self._resynced_at = None
+        self._refreshed_at = 0.0
+        self._refresh_requested = False
+        self.refresh_seconds = _env_float("DUE_QUEUE_REFRESH_SECONDS", 0.0)
+        self.refresh_overlap_seconds = _env_float("DUE_QUEUE_REFRESH_OVERLAP_SECONDS", 120.0)
+        self.resync_seconds = _env_float("DUE_QUEUE_RESYNC_SECONDS", 900.0)
+
+    @staticmethod
+    def due_ts_for(end_dt):
+        return end_dt.timestamp() + DUE_BUFFER_SECONDS
+
+    def schedule(self, meeting_id, due_ts):
+        """Sets (or moves) a meeting's due time."""
+        with self._lock:
+            self._schedule_locked(meeting_id, due_ts)
+
+    def _schedule_locked(self, meeting_id, due_ts):
+        if self._due.get(meeting_id) == due_ts:
+            return False
+        self._due[meeting_id] = due_ts
+        heapq.heappush(self._heap, (due_ts, meeting_id))
+        return True
+
+    def notify(self, meeting_id=None, end_dt=None):
+        """Webhook hook: a meeting was inserted / rescheduled. Without an id, the next sync() refreshes changed rows."""
+        if meeting_id is not None and end_dt is not None:
+            self.schedule(meeting_id, self.due_ts_for(end_dt))
+        else:
+            self._refresh_requested = True
+
+    def _load(self, rows, only_changed=False):
+        """
+        Merges (id, end_at, due_changed_at) rows into the heap; returns how many were new or moved.
+        only_changed skips rows read before with the same stamp and end_at: re-reading them in the refresh
+        overlap must not undo the retry delay the scheduler gave a meeting it already popped.
+        """
+        changed = 0
+        for row in rows:
+            end_dt = db.from_db_timestamp(row.end_at)
+            if end_dt is None:
+                continue
+            due_ts = self.due_ts_for(end_dt)
+            version = (row.due_changed_at, due_ts)
+            if only_changed and self._loaded.get(row.id) == version:
+                continue
+            self._loaded[row.id] = version
+            if self._schedule_locked(row.id, due_ts):
+                changed += 1
+        return changed
+
+    def resync(self):
+        """Re-reads every survey-pending meeting (full scan) and merges their due times into the heap."""
+        self._refresh_requested = False
+        started = datetime.now(timezone.utc)
+        rows = repositories.find_survey_pending_meetings()
+        with self._lock:
+            self._loaded = {}
+            self._load(rows)
+            self._changed_since = started
+            self._resynced_at = self._refreshed_at = time.monotonic()
+        logging.info(f"[DUE QUEUE] Resynced: {len(rows)} survey-pending meetings")
+
+    def refresh(self):
+        """Merges survey-pending meetings inserted or changed (by any process) since the last refresh."""
+        self._refresh_requested = False
+        started = datetime.now(timezone.utc)
+        since = self._changed_since - timedelta(seconds=self.refresh_overlap_seconds)
+        rows = repositories.find_survey_pending_meetings(changed_since=since)
+        with self._lock:
+            changed = self._load(rows, only_changed=True)
+            self._changed_since = started
+            self._refreshed_at = time.monotonic()
+        if changed:
+            logging.info(f"[DUE QUEUE] Picked up {changed} new / rescheduled meetings")
+
+    def sync(self, force_resync=False):
+        """Called once per due-check tick; hits the database only when a refresh / resync is due."""
+        now = time.monotonic()
+        if force_resync or self._resynced_at is None or now - self._resynced_at >= self.resync_seconds:
+            self.resync()
+        elif self._refresh_requested or now - self._refreshed_at >= self.refresh_seconds:
+            self.refresh()
+
+    def pop_due(self, now_ts):
+        """Removes and returns the ids of meetings whose due time is <= now_ts."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now_ts:
+                due_ts, meeting_id = heapq.heappop(self._heap)
+                if self._due.get(meeting_id) == due_ts:
+                    del self._due[meeting_id]
+                    due.append(meeting_id)
+            # Superseded entries pile up when meetings are rescheduled; compact once they dominate
+            if len(self._heap) > 2 * len(self._due) + 64:
+                self._heap = [(ts, mid) for mid, ts in self._due.items()]
+                heapq.heapify(self._heap)
+        return due
+
+    def stats(self):
+        with self._lock:
+            next_due = min(self._due.values()) if self._due else None
+            return {
+                "pending": len(self._due),
+                "heap_entries": len(self._heap),
+                "changed_since": self._changed_since.isoformat() if self._changed_since else None,
+                "next_due_in_s": round(next_due - time.time(), 1) if next_due is not None else None,
+                "last_resync_s_ago": round(time.monotonic() - self._resynced_at, 1) if self._resynced_at else None,
+            }
+
+
+due_queue = DueQueue()
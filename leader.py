@@ -0,0 +1,197 @@
+"""
+Scheduler leader election, so exactly one process runs the scheduler jobs.
+
+Every process that starts the scheduler (each gunicorn worker, each instance) runs an elector thread.
+The scheduler jobs return immediately unless leader.is_leader() is true.
+
+- Postgres: a session-level advisory lock (pg_try_advisory_lock) held on a dedicated connection,
+  outside the pool. If the leader dies, its connection drops and Postgres releases the lock. The
+  leader checks the connection every LEADER_HEARTBEAT_SECONDS and steps down if it is broken.
+  Followers retry at the same interval, so failover takes a few seconds. The connection must be
+  a session-mode connection (direct or session pooling): set LEADER_DATABASE_URL if DATABASE_URL
+  points at a transaction-mode pooler such as PgBouncer.
+- SQLite: an exclusive flock on SCHEDULER_LOCK_FILE (default <SQLITE_DB_PATH>.scheduler.lock).
+  The OS releases it when the process exits.
+
+SCHEDULER_LEADER=false keeps an instance out of the election entirely.
+"""
+import os
+import time
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, always leader
+    fcntl = None
+
+from database import db, psycopg2, _env_float
+
+# pg_advisory_lock key (any bigint shared by all instances of this app)
+ADVISORY_LOCK_KEY = 7_360_210_451_973_360_001
+
+
+class LeaderElector:
+    def __init__(self):
+        self.heartbeat_s = _env_float("LEADER_HEARTBEAT_SECONDS", 5.0)
+        self._leader = False
+        self._term = 0            # incremented on every acquisition
+        self._conn = None         # Postgres: connection holding the advisory lock
+        self._lock_fh = None      # SQLite: flock'd lock file
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._since = None
+        self._pid = None          # process that holds the lock (a forked child inherits the state, not the role)
+
+    # --- Postgres ---
+
+    def _pg_acquire(self):
+        url = os.getenv("LEADER_DATABASE_URL") or db.db_url
+        # TCP keepalives so a half-open connection is noticed by both ends within seconds
+        conn = psycopg2.connect(url, sslmode='require', application_name="coachlink-scheduler-leader", connect_timeout=5,
+                                keepalives=1, keepalives_idle=5, keepalives_interval=2, keepalives_count=3)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+                acquired = cur.fetchone()[0]
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def _pg_heartbeat(self):
+        with self._conn.cursor() as cur:
+            cur.execute("SELECT 1")
+
+    def _pg_release(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if not conn.closed:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+        except Exception:
+            pass
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # --- SQLite ---
+
+    @staticmethod
+    def lock_path():
+        return os.getenv("SCHEDULER_LOCK_FILE") or f"{os.getenv('SQLITE_DB_PATH', 'coachlink.db')}.scheduler.lock"
+
+    def _file_acquire(self):
+        if fcntl is None or os.getenv("SQLITE_DB_PATH") == ":memory:":
+            return True
+        fh = open(self.lock_path(), "a+")
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(f"{os.getpid()}\n")
+        fh.flush()
+        self._lock_fh = fh
+        return True
+
+    def _file_release(self):
+        fh, self._lock_fh = self._lock_fh, None
+        if fh is not None:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            finally:
+                fh.close()
+
+    # --- election loop ---
+
+    def try_acquire(self):
+        """One election round: acquire if free, or check the held lock. Returns is_leader()."""
+        with self._lock:
+            if self._leader and self._pid != os.getpid():
+                # Forked after the parent was elected: the lock belongs to the parent, leave it alone
+                self._leader, self._conn, self._lock_fh, self._since = False, None, None, None
+            if self._leader:
+                if db.is_postgres:
+                    try:
+                        self._pg_heartbeat()
+                    except Exception as e:
+                        logging.error(f"[LEADER] Lost the lock connection, stepping down: {e}")
+                        self._step_down()
+                return self._leader
+            try:
+                acquired = self._pg_acquire() if db.is_postgres else self._file_acquire()
+            except Exception as e:
+                logging.warning(f"[LEADER] Election attempt failed: {e}")
+                acquired = False
+            if acquired:
+                self._leader = True
+                self._pid = os.getpid()
+                self._term += 1
+                self._since = time.time()
+                logging.info(f"[LEADER] This process (pid {os.getpid()}) is now the scheduler leader (term {self._term})")
+            return self._leader
+
+    def _step_down(self):
+        self._leader = False
+        self._since = None
+        if db.is_postgres:
+            self._pg_release()
+        else:
+            self._file_release()
+
+    def resign(self):
+        with self._lock:
+            if self._leader:
+                logging.info(f"[LEADER] Resigning scheduler leadership (pid {os.getpid()})")
+                self._step_down()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.try_acquire()
+            self._stop.wait(self.heartbeat_s)
+
+    def start(self):
+        """Starts the elector thread (one election round runs synchronously first)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.try_acquire()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.resign()
+
+    def is_leader(self):
+        return self._leader and self._pid == os.getpid()
+
+    @property
+    def term(self):
+        return self._term
+
+    def stats(self):
+        return {
+            "is_leader": self.is_leader(),
+            "pid": os.getpid(),
+            "term": self._term,
+            "leader_for_s": round(time.time() - self._since, 1) if self._since else None,
+            "backend": "advisory_lock" if db.is_postgres else ("flock" if fcntl else "none"),
+        }
+
+
+# Singleton shared instance
+leader = LeaderElector()
@@ -0,0 +1,476 @@
+"""
+Versioned schema migrations.
+
+`db.init_db()` calls `migrate(db)`. When the schema is current this is a single read of
+MAX(version) from schema_version (primary-key lookup). Otherwise pending migrations run once,
+in order, while holding a cross-process lock so that N gunicorn workers booting at the same
+time don't race DDL against each other:
+  - Postgres: session-level advisory lock on a dedicated connection.
+  - SQLite: exclusive flock on '<db file>.migrate.lock'.
+
+To change the schema, append a new (version, name, fn, transactional) entry to MIGRATIONS.
+Never edit or reorder an entry that has already shipped. A new index gets its own migration with
+explicit DDL (db.create_indexes) plus an entry in database.INDEXES, which init_db only uses to
+rebuild indexes that went missing or INVALID.
+"""
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process lock, migrations still run in order
+    fcntl = None
+
+# Arbitrary constant shared by every process of this app
+MIGRATION_LOCK_KEY = 74_120_031
+
+# outbox_jobs_table re-queues failed survey triggers only for meetings that ended this recently
+SURVEY_RETRY_WINDOW_DAYS = 2
+
+
+# ---------------------------------------------------------------------------
+# Baseline schema (what init_db created before versioning existed)
+# ---------------------------------------------------------------------------
+
+POSTGRES_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS clients (
+        id SERIAL PRIMARY KEY,
+        hubspot_contact_id TEXT,
+        name TEXT,
+        email TEXT UNIQUE,
+        phone TEXT UNIQUE,
+        company TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id SERIAL PRIMARY KEY,
+        client_id INTEGER REFERENCES clients(id),
+        direction TEXT,
+        message TEXT,
+        timestamp TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meetings (
+        id SERIAL PRIMARY KEY,
+        outlook_event_id TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        client_id INTEGER REFERENCES clients(id),
+        status TEXT,
+        last_client_reply TEXT,
+        salesperson_phone TEXT,
+        summary TEXT,
+        read_ai_url TEXT,
+        location TEXT,
+        attendees TEXT,
+        aux_meeting_id INTEGER,
+        aux_meeting_token TEXT,
+        title TEXT,
+        survey_status TEXT DEFAULT 'pending'
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        email TEXT PRIMARY KEY,
+        name TEXT,
+        phone TEXT,
+        hubspot_contact_id TEXT,
+        timezone TEXT DEFAULT 'UTC'
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meeting_transcripts (
+        id SERIAL PRIMARY KEY,
+        meeting_id INTEGER REFERENCES meetings(id),
+        speaker TEXT,
+        timestamp TEXT,
+        text TEXT,
+        source TEXT DEFAULT 'read_ai',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meeting_coaching (
+        id SERIAL PRIMARY KEY,
+        session_id TEXT UNIQUE NOT NULL,
+        title TEXT,
+        transcript TEXT NOT NULL,
+        source TEXT,
+        coaching JSONB,
+        summary TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS synced_surveys (
+        id SERIAL PRIMARY KEY,
+        survey_id INTEGER UNIQUE NOT NULL,
+        participant_email TEXT,
+        synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+]
+
+SQLITE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hubspot_contact_id TEXT,
+        name TEXT,
+        email TEXT UNIQUE,
+        phone TEXT UNIQUE,
+        company TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER,
+        direction TEXT,
+        message TEXT,
+        timestamp TEXT,
+        FOREIGN KEY(client_id) REFERENCES clients(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meetings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        outlook_event_id TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        client_id INTEGER,
+        status TEXT,
+        last_client_reply TEXT,
+        salesperson_phone TEXT,
+        summary TEXT,
+        read_ai_url TEXT,
+        location TEXT,
+        attendees TEXT,
+        aux_meeting_id INTEGER,
+        aux_meeting_token TEXT,
+        title TEXT,
+        survey_status TEXT DEFAULT 'pending',
+        FOREIGN KEY(client_id) REFERENCES clients(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        email TEXT PRIMARY KEY,
+        name TEXT,
+        phone TEXT,
+        hubspot_contact_id TEXT,
+        timezone TEXT DEFAULT 'UTC'
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meeting_transcripts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        meeting_id INTEGER,
+        speaker TEXT,
+        timestamp TEXT,
+        text TEXT,
+        source TEXT DEFAULT 'read_ai',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(meeting_id) REFERENCES meetings(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meeting_coaching (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT UNIQUE NOT NULL,
+        title TEXT,
+        transcript TEXT NOT NULL,
+        source TEXT,
+        coaching TEXT,
+        summary TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS synced_surveys (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        survey_id INTEGER UNIQUE NOT NULL,
+        participant_email TEXT,
+        synced_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+]
+
+# Columns added to databases created by older releases. (table, column, type)
+LEGACY_COLUMNS = [
+    ("clients", "hubspot_contact_id", "TEXT"),
+    ("users", "hubspot_contact_id", "TEXT"),
+    ("users", "timezone", "TEXT DEFAULT 'UTC'"),
+    ("meetings", "last_client_reply", "TEXT"),
+    ("meetings", "salesperson_phone", "TEXT"),
+    ("meetings", "summary", "TEXT"),
+    ("meetings", "read_ai_url", "TEXT"),
+    ("meetings", "location", "TEXT"),
+    ("meetings", "attendees", "TEXT"),
+    ("meetings", "aux_meeting_id", "INTEGER"),
+    ("meetings", "aux_meeting_token", "TEXT"),
+    ("meetings", "title", "TEXT"),
+    ("meetings", "survey_status", "TEXT DEFAULT 'pending'"),
+    ("meeting_transcripts", "source", "TEXT DEFAULT 'read_ai'"),
+    ("meeting_coaching", "summary", "TEXT"),
+]
+
+
+def add_column(db, table, column, type_sql):
+    """ALTER TABLE ... ADD COLUMN, skipping it if the column already exists (both backends)."""
+    if db.is_postgres:
+        db.execute_query(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {type_sql}")
+        return
+    cols = [row['name'] for row in db.execute_query(f"PRAGMA table_info({table})", fetch_all=True)]
+    if column not in cols:
+        db.execute_query(f"ALTER TABLE {table} ADD COLUMN {column} {type_sql}")
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+def _baseline_schema(db):
+    for ddl in (POSTGRES_TABLES if db.is_postgres else SQLITE_TABLES):
+        db.execute_query(ddl)
+    for table, column, type_sql in LEGACY_COLUMNS:
+        add_column(db, table, column, type_sql)
+    if not db.is_postgres:
+        # SQLite has no non-constant column defaults on ALTER, so this one stays SQLite-only (as before)
+        cols = [row['name'] for row in db.execute_query("PRAGMA table_info(meeting_transcripts)", fetch_all=True)]
+        if 'created_at' not in cols:
+            db.execute_query("ALTER TABLE meeting_transcripts ADD COLUMN created_at TEXT")
+
+
+def _phone_e164_columns(db):
+    add_column(db, "users", "phone_e164", "TEXT")
+    add_column(db, "meetings", "salesperson_phone_e164", "TEXT")
+
+
+def _typed_meeting_times(db):
+    # TIMESTAMPTZ on Postgres, epoch seconds on SQLite (see db.to_db_timestamp)
+    ts_type = "TIMESTAMPTZ" if db.is_postgres else "INTEGER"
+    add_column(db, "meetings", "start_at", ts_type)
+    add_column(db, "meetings", "end_at", ts_type)
+
+
+def _backfill_phone_e164(db):
+    db.backfill_phone_e164()
+
+
+def _backfill_meeting_times(db):
+    db.backfill_meeting_timestamps()
+
+
+def _retention_archive_tables(db):
+    import retention
+    retention.create_archive_tables()
+
+
+def _spool_applied_table(db):
+    import spool
+    spool.create_applied_table()
+
+
+def _aux_poll_state_columns(db):
+    # Per-meeting Aux polling state (scheduler adaptive backoff)
+    ts_type = "TIMESTAMPTZ" if db.is_postgres else "INTEGER"
+    add_column(db, "meetings", "aux_next_poll_at", ts_type)
+    add_column(db, "meetings", "aux_poll_attempts", "INTEGER DEFAULT 0")
+    add_column(db, "meetings", "aux_last_status", "TEXT")
+    add_column(db, "meetings", "aux_bot_state", "TEXT")
+
+
+def _outbox_jobs_table(db):
+    import outbox
+    outbox.create_table()
+    # Inline survey triggers that failed were retried every minute by the scheduler; they now go
+    # through the outbox (which has its own retries), so give recent ones one more pass there. Older
+    # meetings stay 'failed': a survey for a meeting that ended weeks ago does more harm than good.
+    cutoff = datetime.now(timezone.utc) - timedelta(days=SURVEY_RETRY_WINDOW_DAYS)
+    db.execute_query(
+        "UPDATE meetings SET survey_status = 'pending' WHERE survey_status = 'failed' AND end_at >= ?",
+        (db.to_db_timestamp(cutoff),)
+    )
+
+
+def _hot_lookup_indexes(db):
+    db.create_indexes([
+        ("idx_meetings_outlook_event_id", "meetings", ("outlook_event_id",)),
+        ("idx_meetings_status_survey", "meetings", ("status", "survey_status")),
+        ("idx_meetings_status_end_at", "meetings", ("status", "end_at")),
+        ("idx_meetings_start_at", "meetings", ("start_at",)),
+        ("idx_meetings_salesperson_title", "meetings", ("salesperson_phone", "title")),
+        ("idx_meetings_aux_meeting_token", "meetings", ("aux_meeting_token",)),
+        ("idx_meetings_sp_phone_e164_status", "meetings", ("salesperson_phone_e164", "status")),
+        ("idx_users_phone_e164", "users", ("phone_e164",)),
+        ("idx_meeting_transcripts_meeting_id", "meeting_transcripts", ("meeting_id",)),
+        ("idx_messages_client_direction_ts", "messages", ("client_id", "direction", "timestamp")),
+    ])
+
+
+def _retention_scan_indexes(db):
+    db.create_indexes([
+        ("idx_meeting_transcripts_created_at", "meeting_transcripts", ("created_at",)),
+        ("idx_messages_timestamp", "messages", ("timestamp",)),
+    ])
+
+
+def _open_meetings_partial_index(db):
+    # Predicate spelled out rather than taken from OPEN_MEETING_STATUSES_SQL, so this step keeps
+    # building what it shipped with if that constant changes later.
+    open_statuses = "status IN ('scheduled', 'reminder_sent', 'pending')"
+    db.create_indexes([
+        ("idx_meetings_open", "meetings", ("id",), open_statuses),
+        ("idx_meetings_open_salesperson", "meetings", ("salesperson_phone_e164",), open_statuses),
+    ])
+
+
+def _meetings_due_changed_at(db):
+    # Stamped by the database on every insert and on updates of the columns that decide when (or whether)
+    # a meeting is due, whichever process or script writes them; due_queue refreshes from it each tick.
+    if db.is_postgres:
+        add_column(db, "meetings", "due_changed_at", "TIMESTAMPTZ")
+        db.execute_query("""
+            CREATE OR REPLACE FUNCTION meetings_touch_due_changed_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.due_changed_at := clock_timestamp();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        db.execute_query("DROP TRIGGER IF EXISTS meetings_due_changed_at ON meetings")
+        db.execute_query(
+            "CREATE TRIGGER meetings_due_changed_at BEFORE INSERT OR UPDATE OF end_at, status, survey_status "
+            "ON meetings FOR EACH ROW EXECUTE PROCEDURE meetings_touch_due_changed_at()"
+        )
+        return
+    add_column(db, "meetings", "due_changed_at", "INTEGER")
+    touch = "UPDATE meetings SET due_changed_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id"
+    db.execute_query(f"CREATE TRIGGER IF NOT EXISTS meetings_due_changed_at_insert AFTER INSERT ON meetings BEGIN {touch}; END")
+    db.execute_query(
+        "CREATE TRIGGER IF NOT EXISTS meetings_due_changed_at_update AFTER UPDATE OF end_at, status, survey_status "
+        f"ON meetings BEGIN {touch}; END"
+    )
+
+
+def _due_changed_index(db):
+    db.create_indexes([
+        ("idx_meetings_due_changed_at", "meetings", ("due_changed_at",)),
+    ])
+
+
+# (version, name, fn(db), transactional)
+# Non-transactional steps commit on their own (bounded backfill batches, CREATE INDEX CONCURRENTLY)
+# and must be idempotent, since a crash can leave them half done.
+MIGRATIONS = [
+    (1, "baseline_schema", _baseline_schema, True),
+    (2, "phone_e164_columns", _phone_e164_columns, True),
+    (3, "typed_meeting_times", _typed_meeting_times, True),
+    (4, "backfill_phone_e164", _backfill_phone_e164, False),
+    (5, "backfill_meeting_times", _backfill_meeting_times, False),
+    (6, "hot_lookup_indexes", _hot_lookup_indexes, False),
+    (7, "retention_archive_tables", _retention_archive_tables, True),
+    (8, "retention_scan_indexes", _retention_scan_indexes, False),
+    (9, "spool_applied_table", _spool_applied_table, True),
+    (10, "open_meetings_partial_index", _open_meetings_partial_index, False),
+    (11, "aux_poll_state_columns", _aux_poll_state_columns, True),
+    (12, "outbox_jobs_table", _outbox_jobs_table, True),
+    (13, "meetings_due_changed_at", _meetings_due_changed_at, True),
+    (14, "due_changed_index", _due_changed_index, False),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _schema_version_ddl(db):
+    if db.is_postgres:
+        return """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+            );
+        """
+    return """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+    """
+
+
+def current_version(db):
+    """MAX(version) from schema_version, or 0 if the table doesn't exist yet."""
+    try:
+        with db.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT MAX(version) FROM schema_version")
+            row = cur.fetchone()
+            return (row[0] if row else None) or 0
+    except Exception:
+        return 0
+
+
+class _MigrationLock:
+    """Cross-process mutex held while migrations run."""
+
+    def __init__(self, db):
+        self.db = db
+        self._conn = None
+        self._fh = None
+
+    def __enter__(self):
+        if self.db.is_postgres:
+            self._conn = self.db.get_connection()
+            self._conn.autocommit = True
+            self._conn.cursor().execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+        else:
+            db_path = os.getenv("SQLITE_DB_PATH", "coachlink.db")
+            if fcntl and db_path != ":memory:":
+                self._fh = open(f"{db_path}.migrate.lock", "w")
+                fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._conn is not None:
+            try:
+                self._conn.cursor().execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            finally:
+                self._conn.close()
+        if self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+        return False
+
+
+def migrate(db):
+    """Runs pending migrations. Returns the list of versions applied by this call."""
+    if current_version(db) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    with _MigrationLock(db):
+        db.execute_query(_schema_version_ddl(db), commit=True)
+        # Re-check under the lock: another worker may have finished while we waited.
+        version = current_version(db)
+        for number, name, fn, transactional in MIGRATIONS:
+            if number <= version:
+                continue
+            logging.info(f"[MIGRATIONS] Applying {number:03d}_{name}")
+            if transactional:
+                with db.transaction():
+                    fn(db)
+                    db.execute_query("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+            else:
+                fn(db)
+                db.execute_query("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name), commit=True)
+            applied.append(number)
+    if applied:
+        logging.info(f"[MIGRATIONS] Schema now at version {applied[-1]}")
+    return applied
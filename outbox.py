@@ -0,0 +1,344 @@
+"""
+Transactional outbox for external side effects (WhatsApp, HubSpot, Aux bot scheduling, survey webhook).
+
+Callers enqueue the side effect in the same unit of work as the state change it belongs to:
+    with db.transaction():
+        db.execute_query("UPDATE meetings SET status = 'reminder_sent' WHERE id = ?", (mid,), commit=True)
+        outbox.enqueue("whatsapp.send", {"to_number": phone, "body": msg}, key=f"whatsapp.reminder:{mid}")
+so the job exists if and only if the change committed, and a failed call is retried instead of lost.
+
+Drainer threads (worker.py) claim runnable jobs in small batches and run the handler registered for
+the job's kind. Any number of processes can drain at once, leader or not:
+  - Postgres: one UPDATE over a `FOR UPDATE SKIP LOCKED` subselect, so concurrent claimers skip
+    each other's rows instead of queueing on them.
+  - SQLite: the same UPDATE ... RETURNING without the locking clause; a single statement is atomic
+    under the database write lock.
+A claim leases the job for OUTBOX_LEASE_SECONDS (run_after moves to the lease expiry). If the worker
+dies mid-job the lease runs out and the job is claimed again, so delivery is at-least-once and
+handlers must tolerate the occasional repeat.
+
+Failures are retried with the backoff of the destination's RetryPolicy (destination = kind up to the
+first dot) and dead-lettered (status 'dead') after max_attempts, or at once on PermanentError. Dead
+jobs stay in the table for inspection; requeue_dead() puts them back. Done jobs are pruned after
+OUTBOX_DONE_RETENTION_DAYS.
+
+Env: OUTBOX_WORKERS (drainer threads per process, 2; 0 disables), OUTBOX_BATCH_SIZE (10),
+OUTBOX_POLL_SECONDS (2), OUTBOX_LEASE_SECONDS (300), OUTBOX_DONE_RETENTION_DAYS (7),
+OUTBOX_MAX_ATTEMPTS_<DESTINATION> (e.g. OUTBOX_MAX_ATTEMPTS_HUBSPOT=20).
+"""
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from database import db, _env_int, _env_float
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying can't help; the job is dead-lettered right away."""
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts, base_delay_s, max_delay_s):
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+
+    def delay(self, attempts):
+        """Seconds until the next try after `attempts` failed ones: exponential, capped, +/-20% jitter."""
+        step = min(self.base_delay_s * 2 ** min(max(attempts - 1, 0), 20), self.max_delay_s)
+        return step * random.uniform(0.8, 1.2)
+
+
+# Per destination (kind prefix)
+RETRY_POLICIES = {
+    # Twilio errors are mostly short blips; a reminder that arrives hours late is useless
+    "whatsapp": RetryPolicy(6, 30, 1800),
+    # HubSpot rate limits / outages can last a while, and a late note is still worth writing
+    "hubspot": RetryPolicy(10, 60, 3 * 3600),
+    # Bot scheduling only matters before the meeting starts
+    "aux": RetryPolicy(5, 20, 600),
+    # Survey webhook (used to be retried every minute, forever)
+    "survey": RetryPolicy(12, 60, 3600),
+}
+DEFAULT_RETRY_POLICY = RetryPolicy(5, 60, 3600)
+
+RUNNABLE_SQL = "status IN ('pending', 'running')"
+
+
+def create_table():
+    """outbox_jobs and its indexes (applied by migrations.py)."""
+    # Typed timestamps (see db.to_db_timestamp): TIMESTAMPTZ on Postgres, epoch seconds on SQLite
+    ts = "TIMESTAMPTZ" if db.is_postgres else "INTEGER"
+    pk = "SERIAL PRIMARY KEY" if db.is_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    db.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS outbox_jobs (
+            id {pk},
+            destination TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            idempotency_key TEXT UNIQUE,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after {ts} NOT NULL,
+            locked_by TEXT,
+            last_error TEXT,
+            created_at {ts} NOT NULL,
+            updated_at {ts} NOT NULL
+        );
+    """)
+    # Claim scan: only runnable rows are indexed, so done/dead history doesn't slow it down
+    db.execute_query(f"CREATE INDEX IF NOT EXISTS idx_outbox_jobs_runnable ON outbox_jobs (run_after) WHERE {RUNNABLE_SQL}")
+    # Pruning done jobs, listing / requeueing dead ones, stats
+    db.execute_query("CREATE INDEX IF NOT EXISTS idx_outbox_jobs_status_updated ON outbox_jobs (status, updated_at)")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Outbox:
+    def __init__(self):
+        self.workers = _env_int("OUTBOX_WORKERS", 2)
+        self.batch_size = _env_int("OUTBOX_BATCH_SIZE", 10)
+        self.poll_interval_s = _env_float("OUTBOX_POLL_SECONDS", 2.0)
+        self.lease_s = _env_float("OUTBOX_LEASE_SECONDS", 300.0)
+        self._handlers = {}
+        self._on_dead = {}
+        self._wake = threading.Event()
+        self._drainers = []
+        self._last_prune = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "claimed": 0, "delivered": 0, "retried": 0, "dead_lettered": 0, "lost_leases": 0}
+
+    def register_handler(self, kind, fn, on_dead=None):
+        """
+        fn(payload) performs the side effect and raises on failure (PermanentError: don't retry).
+        on_dead(payload, error) runs in the transaction that dead-letters the job.
+        """
+        self._handlers[kind] = fn
+        if on_dead is not None:
+            self._on_dead[kind] = on_dead
+
+    def policy(self, destination):
+        policy = RETRY_POLICIES.get(destination, DEFAULT_RETRY_POLICY)
+        max_attempts = _env_int(f"OUTBOX_MAX_ATTEMPTS_{destination.upper()}", policy.max_attempts)
+        if max_attempts == policy.max_attempts:
+            return policy
+        return RetryPolicy(max_attempts, policy.base_delay_s, policy.max_delay_s)
+
+    def _bump(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    # --- producing ---
+
+    def enqueue(self, kind, payload, key=None, delay_s=0):
+        """
+        Queues one job; joins the caller's db.transaction() when one is open. With a key, a second
+        enqueue of the same key (queued, done or dead) is a no-op. Returns the key.
+        """
+        now = _now()
+        db.execute_query(
+            "INSERT INTO outbox_jobs (destination, kind, payload, idempotency_key, status, attempts, run_after, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'pending', 0, ?, ?, ?) ON CONFLICT (idempotency_key) DO NOTHING",
+            (kind.split(".", 1)[0], kind, json.dumps(payload, default=str), key,
+             db.to_db_timestamp(now + timedelta(seconds=delay_s)), db.to_db_timestamp(now), db.to_db_timestamp(now)),
+            commit=True
+        )
+        self._bump("enqueued")
+        # Same-process drainers pick it up without waiting for the next poll, once the job is visible
+        db.on_commit(self._wake.set)
+        return key
+
+    # --- consuming ---
+
+    def has_runnable(self, now=None):
+        """Cheap read-only check (partial index) so idle polls don't take the write lock."""
+        row = db.execute_query(
+            f"SELECT 1 AS one FROM outbox_jobs WHERE {RUNNABLE_SQL} AND run_after <= ? LIMIT 1",
+            (db.to_db_timestamp(now or _now()),), fetch_one=True, prepare=True
+        )
+        return row is not None
+
+    def claim(self, limit=None):
+        """Leases up to `limit` runnable jobs (oldest run_after first) to the caller."""
+        now = _now()
+        if not self.has_runnable(now):
+            return []
+        token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        skip_locked = " FOR UPDATE SKIP LOCKED" if db.is_postgres else ""
+        rows = db.execute_query(
+            "UPDATE outbox_jobs SET status = 'running', attempts = attempts + 1, run_after = ?, locked_by = ?, updated_at = ? "
+            f"WHERE id IN (SELECT id FROM outbox_jobs WHERE {RUNNABLE_SQL} AND run_after <= ? "
+            f"ORDER BY run_after LIMIT ?{skip_locked}) "
+            "RETURNING id, destination, kind, payload, attempts, locked_by",
+            (db.to_db_timestamp(now + timedelta(seconds=self.lease_s)), token, db.to_db_timestamp(now),
+             db.to_db_timestamp(now), int(limit or self.batch_size)),
+            fetch_all=True, commit=True, prepare=True
+        )
+        jobs = [dict(r) for r in rows or []]
+        if jobs:
+            self._bump("claimed", len(jobs))
+        return jobs
+
+    def _release(self, job, status, run_after, error):
+        """Ends this worker's lease. False if the lease had already expired and the job was claimed again."""
+        row = db.execute_query(
+            "UPDATE outbox_jobs SET status = ?, run_after = ?, last_error = ?, locked_by = NULL, updated_at = ? "
+            "WHERE id = ? AND locked_by = ? RETURNING id",
+            (status, db.to_db_timestamp(run_after), error, db.to_db_timestamp(_now()), job["id"], job["locked_by"]),
+            fetch_one=True, commit=True
+        )
+        if row is None:
+            self._bump("lost_leases")
+            logging.warning(f"[OUTBOX] Lease on job {job['id']} ({job['kind']}) expired before it finished; left to its new owner")
+            return False
+        return True
+
+    def _run(self, job):
+        """Runs one claimed job. Returns True if it was delivered."""
+        kind = job["kind"]
+        try:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                # Not dead-lettered outright: a process with the handler (newer deploy) may claim it next
+                raise LookupError(f"no handler registered for {kind!r} in this process")
+            handler(json.loads(job["payload"]))
+        except Exception as e:
+            self._fail(job, e)
+            return False
+        if self._release(job, "done", _now(), None):
+            self._bump("delivered")
+            logging.info(f"[OUTBOX] Delivered job {job['id']} ({kind}, attempt {job['attempts']})")
+        return True
+
+    def _fail(self, job, exc):
+        kind, attempts = job["kind"], job["attempts"]
+        policy = self.policy(job["destination"])
+        error = f"{type(exc).__name__}: {exc}"[:1000]
+        if not isinstance(exc, PermanentError) and attempts < policy.max_attempts:
+            delay = policy.delay(attempts)
+            if self._release(job, "pending", _now() + timedelta(seconds=delay), error):
+                self._bump("retried")
+                logging.warning(f"[OUTBOX] Job {job['id']} ({kind}) failed (attempt {attempts}/{policy.max_attempts}), "
+                                f"retrying in {delay:.0f}s: {error}")
+            return
+        with db.transaction():
+            if not self._release(job, "dead", _now(), error):
+                return
+            on_dead = self._on_dead.get(kind)
+            if on_dead is not None:
+                try:
+                    with db.transaction():
+                        on_dead(json.loads(job["payload"]), error)
+                except Exception as e:
+                    logging.error(f"[OUTBOX] Dead-letter hook for job {job['id']} ({kind}) failed: {e}")
+        self._bump("dead_lettered")
+        logging.error(f"[OUTBOX] Dead-lettered job {job['id']} ({kind}) after {attempts} attempts: {error}")
+
+    def drain(self, max_jobs=None):
+        """Claims and runs jobs until nothing is runnable (or max_jobs were handled). Returns the number handled."""
+        handled = 0
+        while max_jobs is None or handled < max_jobs:
+            limit = self.batch_size if max_jobs is None else min(self.batch_size, max_jobs - handled)
+            jobs = self.claim(limit)
+            if not jobs:
+                break
+            for job in jobs:
+                self._run(job)
+                handled += 1
+        return handled
+
+    def dead_jobs(self, limit=50):
+        """Most recently dead-lettered jobs, newest first."""
+        rows = db.execute_query(
+            "SELECT id, kind, payload, idempotency_key, attempts, last_error, created_at, updated_at "
+            "FROM outbox_jobs WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?",
+            (int(limit),), fetch_all=True
+        ) or []
+        jobs = []
+        for r in rows:
+            job = dict(r)
+            job["payload"] = json.loads(job["payload"])
+            job["created_at"] = str(db.from_db_timestamp(job["created_at"]))
+            job["updated_at"] = str(db.from_db_timestamp(job["updated_at"]))
+            jobs.append(job)
+        return jobs
+
+    def requeue_dead(self, kind=None):
+        """Puts dead jobs (all, or of one kind) back in the queue with a fresh attempt budget. Returns how many."""
+        now = db.to_db_timestamp(_now())
+        query = "UPDATE outbox_jobs SET status = 'pending', attempts = 0, run_after = ?, updated_at = ? WHERE status = 'dead'"
+        params = (now, now)
+        if kind:
+            query += " AND kind = ?"
+            params += (kind,)
+        rows = db.execute_query(query + " RETURNING id", params, fetch_all=True, commit=True)
+        self._wake.set()
+        return len(rows or [])
+
+    def prune(self, days=None):
+        """Deletes done jobs older than OUTBOX_DONE_RETENTION_DAYS. Dead jobs are kept."""
+        days = _env_int("OUTBOX_DONE_RETENTION_DAYS", 7) if days is None else days
+        cutoff = _now() - timedelta(days=days)
+        db.execute_query("DELETE FROM outbox_jobs WHERE status = 'done' AND updated_at < ?", (db.to_db_timestamp(cutoff),), commit=True)
+
+    def _drain_loop(self, index):
+        while True:
+            try:
+                self.drain()
+                if index == 0 and time.time() - self._last_prune > 86400:
+                    self.prune()
+                    self._last_prune = time.time()
+            except Exception as e:
+                logging.error(f"[OUTBOX] Drainer error: {e}")
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+
+    def start_drainer(self):
+        """Starts OUTBOX_WORKERS drainer threads in this process. Returns whether any are running."""
+        if self.workers <= 0:
+            logging.info("[OUTBOX] Drainer disabled (OUTBOX_WORKERS=0)")
+            return False
+        if any(t.is_alive() for t in self._drainers):
+            return True
+        self._drainers = [
+            threading.Thread(target=self._drain_loop, args=(i,), name=f"outbox-drainer-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._drainers:
+            t.start()
+        logging.info(f"[OUTBOX] Drainer started ({self.workers} threads, batch={self.batch_size}, poll={self.poll_interval_s}s)")
+        return True
+
+    def overdue_s(self):
+        """Seconds the most overdue runnable job has waited past its run_after (0 when none): a stalled-drainer signal."""
+        row = db.execute_query(
+            f"SELECT MIN(run_after) AS oldest FROM outbox_jobs WHERE {RUNNABLE_SQL}", fetch_one=True
+        )
+        oldest = db.from_db_timestamp(row["oldest"]) if row else None
+        if oldest is None:
+            return 0.0
+        return round(max((_now() - oldest).total_seconds(), 0.0), 1)
+
+    def stats(self):
+        rows = db.execute_query(
+            "SELECT status, COUNT(*) AS n, MIN(updated_at) AS oldest FROM outbox_jobs GROUP BY status",
+            fetch_all=True
+        ) or []
+        counts = {r["status"]: r["n"] for r in rows}
+        oldest = next((db.from_db_timestamp(r["oldest"]) for r in rows if r["status"] == "pending"), None)
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return dict(stats, jobs=counts, oldest_pending_age_s=round((_now() - oldest).total_seconds(), 1) if oldest else None,
+                    overdue_s=self.overdue_s(), drainers=sum(1 for t in self._drainers if t.is_alive()))
+
+
+# Singleton shared instance
+outbox = Outbox()
@@ -0,0 +1,235 @@
+"""
+Read-side repository for the hot paths (scheduler ticks, WhatsApp chat, transcript matching).
+
+Each use case selects only the columns it needs (the PROJECTIONS below) and gets back compact
+__slots__ records instead of RealDictRow / sqlite3.Row dicts. Records support attribute access,
+plus .get() and ['key'] so existing service code that takes a meeting row keeps working.
+Columns outside the projection are simply absent: .get() returns the default, ['key'] raises KeyError.
+The per-tick / per-message lookups run as prepared statements on Postgres (prepare=True).
+"""
+from database import db
+from utils import to_e164
+
+
+class Record:
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        if row is None:
+            return None
+        obj = cls.__new__(cls)
+        for key in row.keys():
+            setattr(obj, key, row[key])
+        return obj
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def keys(self):
+        # Subclasses add __slots__ of their own, so walk the whole MRO
+        return [k for cls in reversed(type(self).__mro__) for k in getattr(cls, "__slots__", ()) if hasattr(self, k)]
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.keys()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class Meeting(Record):
+    __slots__ = (
+        "id", "outlook_event_id", "start_time", "end_time", "start_at", "end_at", "client_id", "status",
+        "last_client_reply", "salesperson_phone", "salesperson_phone_e164", "summary", "read_ai_url",
+        "location", "attendees", "aux_meeting_id", "aux_meeting_token", "title", "survey_status",
+        "aux_next_poll_at", "aux_poll_attempts", "aux_last_status", "aux_bot_state", "due_changed_at",
+    )
+
+
+class DueMeeting(Meeting):
+    """A due meeting with the client / salesperson fields the reminder and survey trigger need."""
+    __slots__ = ("client_name", "client_email", "salesperson_email")
+
+
+class Client(Record):
+    __slots__ = ("id", "hubspot_contact_id", "name", "email", "phone", "company")
+
+
+class User(Record):
+    __slots__ = ("email", "name", "phone", "phone_e164", "hubspot_contact_id", "timezone")
+
+
+# Column projections per use case. Keep `summary` / `attendees` (large TEXT/JSON) out of anything
+# that runs per tick or per row.
+PROJECTIONS = {
+    # scheduler: the in-memory due-time index (due_queue.py) only needs the key, the due time and its change stamp
+    "due_index": ("id", "end_at", "due_changed_at"),
+    # scheduler: meetings whose end_at has passed and still need a reminder / survey
+    "scheduler_due_check": ("id", "title", "status", "survey_status", "end_at", "salesperson_phone",
+                            "client_id", "aux_meeting_id", "outlook_event_id", "start_time", "end_time",
+                            "aux_meeting_token"),
+    # scheduler: meetings to poll Aux for (plus their polling state); rows are passed on to process_aux_transcript
+    "aux_poll": ("id", "title", "aux_meeting_token", "aux_meeting_id", "salesperson_phone", "client_id",
+                 "start_time", "location", "start_at", "end_at", "aux_next_poll_at", "aux_poll_attempts",
+                 "aux_last_status", "aux_bot_state"),
+    # transcript processing (process_transcript_data)
+    "transcript": ("id", "title", "salesperson_phone", "client_id", "start_time", "location"),
+    # WhatsApp: which meeting does an incoming message belong to
+    "chat_match": ("id", "client_id", "status", "start_time", "end_time"),
+    # WhatsApp: context handed to the AI chat reply (single row)
+    "chat_context": ("id", "client_id", "start_time", "end_time", "location", "attendees", "summary"),
+}
+
+
+def _select(projection):
+    return ", ".join(PROJECTIONS[projection])
+
+
+def _one(cls, query, params, prepare=False):
+    return cls.from_row(db.execute_query(query, params, fetch_one=True, prepare=prepare))
+
+
+def _all(cls, query, params, prepare=False):
+    return [cls.from_row(r) for r in db.execute_query(query, params, fetch_all=True, prepare=prepare) or []]
+
+
+# --- Meetings ---
+
+def get_meeting(meeting_id, projection):
+    return _one(Meeting, f"SELECT {_select(projection)} FROM meetings WHERE id = ?", (meeting_id,))
+
+
+# survey_status values after which the due check has nothing left to do for a meeting. 'queued' and
+# 'failed' count as done because the survey trigger is owned by the outbox from then on ('queued': it
+# retries the job itself; 'failed': it dead-lettered it); 'skipped': no salesperson phone to remind.
+SURVEY_DONE_STATUSES = ("sent", "queued", "failed", "skipped")
+SURVEY_PENDING_SQL = ("status IN ('scheduled', 'reminder_sent', 'completed') AND COALESCE(survey_status, 'pending') NOT IN ("
+                      + ", ".join(f"'{s}'" for s in SURVEY_DONE_STATUSES) + ")")
+
+
+def find_survey_pending_meetings(changed_since=None):
+    """(id, end_at, due_changed_at) of every meeting still owed a survey; with changed_since, only rows stamped later."""
+    if changed_since is None:
+        return _all(
+            Meeting,
+            f"SELECT {_select('due_index')} FROM meetings WHERE {SURVEY_PENDING_SQL} AND end_at IS NOT NULL",
+            (),
+            prepare=True
+        )
+    return _all(
+        Meeting,
+        f"SELECT {_select('due_index')} FROM meetings WHERE due_changed_at > ? AND {SURVEY_PENDING_SQL} AND end_at IS NOT NULL",
+        (db.to_db_timestamp(changed_since),),
+        prepare=True
+    )
+
+
+def find_due_candidates(meeting_ids):
+    """
+    Rows for the meeting ids the due index says are due, re-checked against the survey-pending filter,
+    with the client's name / email and the salesperson's email attached (DueMeeting): one round trip
+    per tick instead of a client and a user lookup per meeting.
+    """
+    cols = ", ".join(f"m.{c}" for c in PROJECTIONS["scheduler_due_check"])
+    rows = []
+    # Chunked to stay under SQLite's bound-parameter limit after a long outage
+    for i in range(0, len(meeting_ids), 500):
+        chunk = tuple(meeting_ids[i:i + 500])
+        placeholders = ", ".join("?" for _ in chunk)
+        rows.extend(_all(
+            DueMeeting,
+            f"SELECT {cols}, c.name AS client_name, c.email AS client_email, "
+            # users.phone_e164 isn't unique: a scalar subquery keeps it to one row per meeting
+            "(SELECT u.email FROM users u WHERE u.phone_e164 = m.salesperson_phone_e164 LIMIT 1) AS salesperson_email "
+            f"FROM meetings m LEFT JOIN clients c ON c.id = m.client_id "
+            f"WHERE m.id IN ({placeholders}) AND {SURVEY_PENDING_SQL}",
+            chunk
+        ))
+    return rows
+
+
+def find_aux_poll_meetings(starts_before, now, limit):
+    """
+    Up to `limit` meetings with an Aux token that aren't processed yet, start before `starts_before` and
+    are due for a poll (aux_next_poll_at unset or <= now), most overdue first (never polled before
+    anything else), so a backlog after an outage is worked off oldest first over several ticks.
+    """
+    return _all(
+        Meeting,
+        f"SELECT {_select('aux_poll')} FROM meetings "
+        "WHERE aux_meeting_token IS NOT NULL AND status IN ('scheduled', 'reminder_sent', 'pending') "
+        "AND (start_at IS NULL OR start_at <= ?) AND (aux_next_poll_at IS NULL OR aux_next_poll_at <= ?) "
+        # Portable NULLS FIRST (Postgres sorts NULLs last by default, SQLite first)
+        "ORDER BY aux_next_poll_at IS NOT NULL, aux_next_poll_at, id LIMIT ?",
+        (db.to_db_timestamp(starts_before), db.to_db_timestamp(now), int(limit)),
+        prepare=True
+    )
+
+
+def save_aux_poll_state(meeting_id, next_poll_at, attempts, last_status, bot_state):
+    db.execute_query(
+        "UPDATE meetings SET aux_next_poll_at = ?, aux_poll_attempts = ?, aux_last_status = ?, aux_bot_state = ? WHERE id = ?",
+        (db.to_db_timestamp(next_poll_at), attempts, last_status, bot_state, meeting_id),
+        commit=True
+    )
+
+
+def find_meeting_starting_between(start, end, projection="transcript"):
+    return _one(
+        Meeting,
+        f"SELECT {_select(projection)} FROM meetings WHERE start_at BETWEEN ? AND ? ORDER BY id DESC LIMIT 1",
+        (db.to_db_timestamp(start), db.to_db_timestamp(end))
+    )
+
+
+def find_active_meeting_for_salesperson(phone_e164):
+    return _one(
+        Meeting,
+        f"SELECT {_select('chat_match')} FROM meetings "
+        "WHERE salesperson_phone_e164 = ? AND status IN ('scheduled', 'reminder_sent', 'pending') ORDER BY id DESC LIMIT 1",
+        (phone_e164,),
+        prepare=True
+    )
+
+
+def find_completed_meetings_for_salesperson(phone_e164, limit=10):
+    return _all(
+        Meeting,
+        f"SELECT {_select('chat_match')} FROM meetings "
+        "WHERE salesperson_phone_e164 = ? AND status = 'completed' ORDER BY id DESC LIMIT ?",
+        (phone_e164, limit),
+        prepare=True
+    )
+
+
+# --- Clients / Users ---
+
+def get_client(client_id, columns=("name", "email", "company")):
+    return _one(Client, f"SELECT {', '.join(columns)} FROM clients WHERE id = ?", (client_id,))
+
+
+def get_user_by_phone(phone_e164, columns=("email", "timezone")):
+    return _one(User, f"SELECT {', '.join(columns)} FROM users WHERE phone_e164 = ? LIMIT 1", (phone_e164,))
+
+
+def save_user(email, name, phone, timezone=None, hubspot_contact_id=None):
+    """
+    Inserts or updates a user. Every user write goes through here so that phone_e164 is always
+    derived from phone; a user written without it is invisible to get_user_by_phone and
+    find_due_candidates. timezone / hubspot_contact_id are left alone when not given.
+    """
+    values = {"email": email, "name": name, "phone": phone, "phone_e164": to_e164(phone)}
+    if timezone is not None:
+        values["timezone"] = timezone
+    if hubspot_contact_id is not None:
+        values["hubspot_contact_id"] = hubspot_contact_id
+    db.upsert("users", "email", values)
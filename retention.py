@@ -0,0 +1,308 @@
+"""
+Retention engine for the two unbounded tables, meeting_transcripts and messages.
+
+Cold rows are moved (in bounded batches, one transaction per batch) into compressed archive
+tables and deleted from the hot table, so hot-path queries only ever scan recent data:
+  - meeting_transcripts -> meeting_transcripts_archive: one zlib'd JSON blob per meeting,
+    once every line of that meeting is older than TRANSCRIPT_RETENTION_DAYS.
+  - messages -> messages_archive: one blob per (client, month) older than MESSAGE_RETENTION_DAYS.
+
+On Postgres the archive tables are range-partitioned by month (period_start); monthly
+partitions are created on demand and old months can be detached/dropped wholesale.
+Archived data can be read back (archived_transcript_lines) or restored into the hot tables
+(restore_meeting_transcripts / restore_messages).
+
+Runs daily from the scheduler, or manually:
+    python retention.py archive
+    python retention.py restore-transcripts <meeting_id>
+    python retention.py restore-messages <client_id>
+
+Env: TRANSCRIPT_RETENTION_DAYS / MESSAGE_RETENTION_DAYS (default 180, 0 disables),
+RETENTION_BATCH_SIZE (default 50 groups per batch), RETENTION_MAX_BATCHES (default 20 per run).
+"""
+import sys
+import json
+import zlib
+import logging
+from datetime import datetime, timedelta, date
+
+from database import db, _env_int
+
+TRANSCRIPT_COLUMNS = ("id", "meeting_id", "speaker", "timestamp", "text", "source", "created_at")
+MESSAGE_COLUMNS = ("id", "client_id", "direction", "message", "timestamp")
+
+
+# ---------------------------------------------------------------------------
+# Schema (applied by migrations.py)
+# ---------------------------------------------------------------------------
+
+def create_archive_tables():
+    """Archive tables; partitioned by month on Postgres, plain tables on SQLite."""
+    for table, owner_col in (("meeting_transcripts_archive", "meeting_id"), ("messages_archive", "client_id")):
+        if db.is_postgres:
+            db.execute_query(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id BIGSERIAL,
+                    period_start DATE NOT NULL,
+                    {owner_col} INTEGER,
+                    row_count INTEGER NOT NULL,
+                    first_id INTEGER,
+                    last_id INTEGER,
+                    payload BYTEA NOT NULL,
+                    archived_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (id, period_start)
+                ) PARTITION BY RANGE (period_start);
+            """)
+            db.execute_query(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+        else:
+            db.execute_query(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    period_start TEXT NOT NULL,
+                    {owner_col} INTEGER,
+                    row_count INTEGER NOT NULL,
+                    first_id INTEGER,
+                    last_id INTEGER,
+                    payload BLOB NOT NULL,
+                    archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+        # Small tables (one row per meeting / client-month); plain CREATE INDEX is fine here.
+        db.execute_query(f"CREATE INDEX IF NOT EXISTS idx_{table}_{owner_col} ON {table} ({owner_col})")
+
+
+def _ensure_month_partition(table, period_start):
+    if not db.is_postgres:
+        return
+    start = period_start.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    name = f"{table}_y{start.year}m{start.month:02d}"
+    try:
+        with db.transaction():  # savepoint: a clash with rows already in DEFAULT must not abort the batch
+            db.execute_query(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+    except Exception as e:
+        logging.warning(f"[RETENTION] Could not create partition {name}, rows go to {table}_default: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _pack(rows, columns):
+    return zlib.compress(json.dumps([[r[c] for c in columns] for r in rows], default=str).encode("utf-8"), 6)
+
+
+def _unpack(payload, columns):
+    data = json.loads(zlib.decompress(bytes(payload)).decode("utf-8"))
+    return [dict(zip(columns, values)) for values in data]
+
+
+def _month_start(value):
+    if isinstance(value, datetime):
+        return value.date().replace(day=1)
+    if isinstance(value, date):
+        return value.replace(day=1)
+    text = str(value)
+    return date(int(text[0:4]), int(text[5:7]), 1)
+
+
+def _db_date(d):
+    return d if db.is_postgres else d.isoformat()
+
+
+def _owner_clause(column, value):
+    return (f"{column} IS NULL", ()) if value is None else (f"{column} = ?", (value,))
+
+
+# ---------------------------------------------------------------------------
+# Archive
+# ---------------------------------------------------------------------------
+
+def _transcript_cutoff(days):
+    # created_at is CURRENT_TIMESTAMP (UTC): TIMESTAMP on Postgres, 'YYYY-MM-DD HH:MM:SS' text on SQLite
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return cutoff if db.is_postgres else cutoff.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def archive_transcripts(days=None, batch_size=None, max_batches=None):
+    """Archives transcripts of meetings whose lines are all older than `days`. Returns meetings archived."""
+    days = _env_int("TRANSCRIPT_RETENTION_DAYS", 180) if days is None else days
+    batch_size = batch_size or _env_int("RETENTION_BATCH_SIZE", 50)
+    max_batches = max_batches or _env_int("RETENTION_MAX_BATCHES", 20)
+    if days <= 0:
+        return 0
+
+    cutoff = _transcript_cutoff(days)
+    archived = 0
+    for _ in range(max_batches):
+        candidates = db.execute_query(
+            "SELECT DISTINCT t.meeting_id FROM meeting_transcripts t WHERE t.created_at < ? "
+            "AND NOT EXISTS (SELECT 1 FROM meeting_transcripts h WHERE h.meeting_id = t.meeting_id AND h.created_at >= ?) "
+            "LIMIT ?",
+            (cutoff, cutoff, batch_size),
+            fetch_all=True
+        ) or []
+        if not candidates:
+            break
+        with db.transaction():
+            for c in candidates:
+                meeting_id = c['meeting_id']
+                where, params = _owner_clause("meeting_id", meeting_id)
+                rows = db.execute_query(
+                    f"SELECT {', '.join(TRANSCRIPT_COLUMNS)} FROM meeting_transcripts WHERE {where} ORDER BY id",
+                    params, fetch_all=True
+                )
+                if not rows:
+                    continue
+                created = [r['created_at'] for r in rows if r['created_at'] is not None]
+                period = _month_start(max(created)) if created else date.today().replace(day=1)
+                _ensure_month_partition("meeting_transcripts_archive", period)
+                db.execute_query(
+                    "INSERT INTO meeting_transcripts_archive (period_start, meeting_id, row_count, first_id, last_id, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (_db_date(period), meeting_id, len(rows), rows[0]['id'], rows[-1]['id'], _pack(rows, TRANSCRIPT_COLUMNS)),
+                    commit=True
+                )
+                db.execute_query(f"DELETE FROM meeting_transcripts WHERE {where} AND id <= ?", (*params, rows[-1]['id']), commit=True)
+                archived += 1
+    if archived:
+        logging.info(f"[RETENTION] Archived transcripts of {archived} meetings older than {days} days")
+    return archived
+
+
+def archive_messages(days=None, batch_size=None, max_batches=None):
+    """Archives messages older than `days`, one blob per (client, month). Returns groups archived."""
+    days = _env_int("MESSAGE_RETENTION_DAYS", 180) if days is None else days
+    batch_size = batch_size or _env_int("RETENTION_BATCH_SIZE", 50)
+    max_batches = max_batches or _env_int("RETENTION_MAX_BATCHES", 20)
+    if days <= 0:
+        return 0
+
+    # messages.timestamp is naive local ISO text (datetime.now().isoformat()); ISO strings sort chronologically
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    archived = 0
+    for _ in range(max_batches):
+        groups = db.execute_query(
+            "SELECT client_id, SUBSTR(timestamp, 1, 7) AS month FROM messages WHERE timestamp < ? AND timestamp LIKE '____-__-%' "
+            "GROUP BY client_id, SUBSTR(timestamp, 1, 7) LIMIT ?",
+            (cutoff, batch_size),
+            fetch_all=True
+        ) or []
+        if not groups:
+            break
+        with db.transaction():
+            for g in groups:
+                client_id, month = g['client_id'], g['month']
+                where, params = _owner_clause("client_id", client_id)
+                month_start = _month_start(month)
+                month_end = (month_start + timedelta(days=32)).replace(day=1)
+                # Month bounds as text, capped at the cutoff, so the delete matches exactly what was packed
+                upper = min(month_end.isoformat(), cutoff)
+                bounds = (month_start.isoformat(), upper)
+                rows = db.execute_query(
+                    f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages WHERE {where} AND timestamp >= ? AND timestamp < ? ORDER BY id",
+                    (*params, *bounds), fetch_all=True
+                )
+                if not rows:
+                    continue
+                _ensure_month_partition("messages_archive", month_start)
+                db.execute_query(
+                    "INSERT INTO messages_archive (period_start, client_id, row_count, first_id, last_id, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (_db_date(month_start), client_id, len(rows), rows[0]['id'], rows[-1]['id'], _pack(rows, MESSAGE_COLUMNS)),
+                    commit=True
+                )
+                db.execute_query(
+                    f"DELETE FROM messages WHERE {where} AND timestamp >= ? AND timestamp < ?",
+                    (*params, *bounds), commit=True
+                )
+                archived += 1
+    if archived:
+        logging.info(f"[RETENTION] Archived {archived} client-months of messages older than {days} days")
+    return archived
+
+
+def run_retention():
+    """Daily job: archive cold transcripts and messages. Each table is bounded by RETENTION_MAX_BATCHES."""
+    results = {}
+    for name, fn in (("transcripts", archive_transcripts), ("messages", archive_messages)):
+        try:
+            results[name] = fn()
+        except Exception as e:
+            logging.error(f"[RETENTION] {name} archival failed: {e}")
+            results[name] = None
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Read back / restore
+# ---------------------------------------------------------------------------
+
+def archived_transcript_lines(meeting_id):
+    """Archived transcript rows for a meeting (oldest first) without restoring them."""
+    blobs = db.execute_query(
+        "SELECT payload FROM meeting_transcripts_archive WHERE meeting_id = ? ORDER BY first_id",
+        (meeting_id,), fetch_all=True
+    ) or []
+    lines = []
+    for b in blobs:
+        lines.extend(_unpack(b['payload'], TRANSCRIPT_COLUMNS))
+    return lines
+
+
+def restore_meeting_transcripts(meeting_id):
+    """Moves a meeting's archived transcript back into meeting_transcripts. Returns rows restored."""
+    restored = 0
+    with db.transaction():
+        lines = archived_transcript_lines(meeting_id)
+        if lines:
+            db.executemany(
+                f"INSERT INTO meeting_transcripts ({', '.join(TRANSCRIPT_COLUMNS)}) VALUES ({', '.join('?' for _ in TRANSCRIPT_COLUMNS)})",
+                [tuple(l[c] for c in TRANSCRIPT_COLUMNS) for l in lines],
+                commit=True
+            )
+            db.execute_query("DELETE FROM meeting_transcripts_archive WHERE meeting_id = ?", (meeting_id,), commit=True)
+            restored = len(lines)
+    logging.info(f"[RETENTION] Restored {restored} transcript lines for meeting {meeting_id}")
+    return restored
+
+
+def restore_messages(client_id):
+    """Moves a client's archived messages back into messages. Returns rows restored."""
+    where, params = _owner_clause("client_id", client_id)
+    restored = 0
+    with db.transaction():
+        blobs = db.execute_query(
+            f"SELECT payload FROM messages_archive WHERE {where} ORDER BY first_id", params, fetch_all=True
+        ) or []
+        rows = []
+        for b in blobs:
+            rows.extend(_unpack(b['payload'], MESSAGE_COLUMNS))
+        if rows:
+            db.executemany(
+                f"INSERT INTO messages ({', '.join(MESSAGE_COLUMNS)}) VALUES ({', '.join('?' for _ in MESSAGE_COLUMNS)})",
+                [tuple(r[c] for c in MESSAGE_COLUMNS) for r in rows],
+                commit=True
+            )
+            db.execute_query(f"DELETE FROM messages_archive WHERE {where}", params, commit=True)
+            restored = len(rows)
+    logging.info(f"[RETENTION] Restored {restored} messages for client {client_id}")
+    return restored
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "archive"
+    if cmd == "archive":
+        print(run_retention())
+    elif cmd == "restore-transcripts" and len(sys.argv) > 2:
+        print(restore_meeting_transcripts(int(sys.argv[2])))
+    elif cmd == "restore-messages" and len(sys.argv) > 2:
+        print(restore_messages(int(sys.argv[2])))
+    else:
+        print(__doc__)
+        sys.exit(1)
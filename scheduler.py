@@ -1,245 +1,379 @@
 import os
 import atexit
 import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from database import db
-from utils import parse_iso_datetime, normalize_phone
+from database import db, _env_int, _env_float
+import repositories
+import retention
+import backup
+from db_metrics import metrics as db_metrics
+from due_queue import due_queue
+from leader import leader
+from outbox import outbox
 from services import whatsapp_service, aux_service, meeting_service
 
+# Meetings that could not be processed (or that have no salesperson phone) are re-checked this often
+DUE_RETRY_SECONDS = _env_float("DUE_RETRY_SECONDS", 60.0)
+# Serialises the due-check job with manual check_pending_meetings() calls
+_due_lock = threading.Lock()
+# Leadership term the due index was last loaded under; a new term forces a resync
+_due_term = None
+# The running BackgroundScheduler (start_scheduler() is idempotent)
+_scheduler = None
+
+# Aux polling fans out over a shared pool (per-host limits live in aux_service). Fetches still
+# running at the tick deadline are left to finish in the background and are not resubmitted.
+AUX_POLL_WORKERS = _env_int("AUX_POLL_WORKERS", 8)
+AUX_POLL_DEADLINE_SECONDS = _env_float("AUX_POLL_DEADLINE_SECONDS", 45.0)
+# Most meetings polled per tick (most overdue first); the rest stay due for the next ticks
+AUX_POLL_BATCH_SIZE = _env_int("AUX_POLL_BATCH_SIZE", 200)
+_aux_pool = None
+_aux_in_flight = set()
+
+# Per-meeting adaptive polling (aux_next_poll_at / aux_poll_attempts on the meeting row): exponential
+# backoff from AUX_POLL_MIN_SECONDS while nothing changes, capped at AUX_READY_POLL_MAX_SECONDS in the
+# window after the end of a meeting the bot attended (transcript expected) and at AUX_POLL_MAX_SECONDS
+# otherwise. Bot states that mean "not in the call" come from
+# AUX_IDLE_BOT_STATES (comma-separated, lower-case).
+AUX_POLL_MIN_SECONDS = _env_float("AUX_POLL_MIN_SECONDS", 60.0)
+AUX_POLL_MAX_SECONDS = _env_float("AUX_POLL_MAX_SECONDS", 1800.0)
+AUX_READY_WINDOW_MINUTES = _env_float("AUX_READY_WINDOW_MINUTES", 30.0)
+AUX_READY_POLL_MAX_SECONDS = _env_float("AUX_READY_POLL_MAX_SECONDS", 180.0)
+AUX_IDLE_BOT_STATES = {
+    s.strip().lower() for s in os.getenv("AUX_IDLE_BOT_STATES", "idle,ready,scheduled,waiting,not_started").split(",") if s.strip()
+}
+
 def _is_truthy(val):
     return str(val).strip().lower() in {"1", "true", "yes", "on"}
 
-def _row_get(row, key, default=None):
-    if row is None:
-        return default
-    if isinstance(row, dict):
-        return row.get(key, default)
+def _process_due_meeting(m, now_utc):
+    """Sends the post-meeting reminder / survey trigger for one meeting once it has ended."""
+    meeting_id = m.id
+    logging.info(f"[SCHEDULER] Processing meeting {meeting_id}: {m.title}")
+    logging.info(f"[SCHEDULER] Meeting data: outlook_id={m.outlook_event_id}, start={m.start_time}, end={m.end_time}, aux_token={m.aux_meeting_token}")
+    
+    # Typed end time (start + 30min fallback is applied when the row is written/backfilled)
+    end_dt = db.from_db_timestamp(m.end_at)
+    if end_dt is None:
+        logging.warning(f"[SCHEDULER] Meeting {meeting_id} has no end_at, skipping")
+        return
+    
+    # Logic: 1 minute buffer (Both are UTC aware)
+    time_diff = now_utc - end_dt
+    logging.info(f"[SCHEDULER] Meeting {meeting_id} time check: now={now_utc}, end={end_dt}, diff={time_diff}")
+    
+    if now_utc >= (end_dt + timedelta(minutes=1)):
+        logging.info(f"[SCHEDULER] Meeting {meeting_id} has finished (past end time + 1min buffer)")
+        target_phone = m.salesperson_phone
+        current_status = (m.status or "").strip().lower()
+        survey_status = (m.survey_status or "pending").strip().lower()
+        
+        # Check if we should message (Registered Users Only)
+        if not target_phone:
+            logging.warning(f"[SCHEDULER] Meeting {meeting_id} has no salesperson_phone, marking as reminder_sent / survey skipped silently")
+            # Mark processed silently so we don't loop forever: 'skipped' takes it out of SURVEY_PENDING_SQL,
+            # so the due queue drops it instead of re-checking it every DUE_RETRY_SECONDS
+            db.execute_query("UPDATE meetings SET status = 'reminder_sent', survey_status = 'skipped' WHERE id = ?", (meeting_id,), commit=True)
+            return
+
+        # Client / salesperson contact info (joined in by find_due_candidates)
+        cname = m.client_name or "the client"
+        client_email = m.client_email
+        logging.info(f"[SCHEDULER] Meeting {meeting_id} client: {cname} ({client_email})")
+        sp_email = m.salesperson_email
+        logging.info(f"[SCHEDULER] Meeting {meeting_id} salesperson: {sp_email}")
+        
+        # Survey webhook: queued in the outbox with the status change, which retries it until it is sent
+        if survey_status not in repositories.SURVEY_DONE_STATUSES:
+            participant_email = client_email or sp_email
+            webhook_payload = {
+                "meeting_id": meeting_id,
+                "meetingId": meeting_id,
+                "aux_meeting_id": m.aux_meeting_id,
+                "auxMeetingId": m.aux_meeting_id,
+                "title": m.title,
+                "meeting_title": m.title,
+                "organizer_email": sp_email,
+                "organizerEmail": sp_email,
+                "client_email": client_email,
+                "clientEmail": client_email,
+                "participant_email": participant_email,
+                "participant_name": cname,
+                "session_id": str(m.aux_meeting_id or meeting_id),
+                "client_name": cname,
+                "status": "finished"
+            }
+            logging.info(f"[SCHEDULER] Queueing survey webhook for meeting {meeting_id}")
+            outbox.enqueue("survey.webhook", webhook_payload, key=f"survey.webhook:{meeting_id}")
+            db.execute_query("UPDATE meetings SET survey_status = 'queued' WHERE id = ?", (meeting_id,), commit=True)
+
+        # Send WhatsApp reminder only once (when transitioning from scheduled)
+        if current_status == "scheduled":
+            msg = f"Meeting with {cname} finished. How did it go? (Reply 'Done' to log to HubSpot)"
+            logging.info(f"[SCHEDULER] Queueing WhatsApp reminder to {target_phone}")
+            whatsapp_service.queue_whatsapp_message(target_phone, msg, key=f"whatsapp.reminder:{meeting_id}")
+            
+            # Update Status
+            db.execute_query("UPDATE meetings SET status = 'reminder_sent' WHERE id = ?", (meeting_id,), commit=True)
+            logging.info(f"[SCHEDULER] Meeting {meeting_id} marked as 'reminder_sent'")
+    else:
+        logging.info(f"[SCHEDULER] Meeting {meeting_id} still in progress or upcoming")
+
+def _deliver_survey_webhook(payload):
+    """Outbox handler for survey.webhook: posts the survey trigger and records it as sent."""
+    meeting_id = payload["meeting_id"]
+    survey_result = aux_service.trigger_survey_webhook(payload)
+    survey_ok = False
+    if isinstance(survey_result, dict):
+        survey_ok = bool(survey_result.get("success")) or str(survey_result.get("status", "")).strip().lower() in {
+            "success", "sent", "queued", "accepted", "ok"
+        }
+    elif survey_result is True:
+        survey_ok = True
+    if not survey_ok:
+        raise RuntimeError(f"survey webhook trigger unsuccessful for meeting {meeting_id}. Response: {survey_result}")
+    db.execute_query("UPDATE meetings SET survey_status = 'sent' WHERE id = ?", (meeting_id,), commit=True)
+    logging.info(f"[SCHEDULER] Survey webhook triggered for meeting {meeting_id}")
+
+def _survey_webhook_dead(payload, error):
+    db.execute_query("UPDATE meetings SET survey_status = 'failed' WHERE id = ?", (payload["meeting_id"],), commit=True)
+
+outbox.register_handler("survey.webhook", _deliver_survey_webhook, on_dead=_survey_webhook_dead)
+
+def _fetch_aux_payload(am):
+    """Worker thread: Aux status + transcript for one meeting (HTTP only, no database access)."""
+    meeting_id = am.id
+    token = am.aux_meeting_token
     try:
-        return row[key]
-    except Exception:
-        return default
+        logging.info(f"[SCHEDULER] Polling AUX status for meeting {meeting_id}, token: {token[:20]}...")
+
+        status_data = aux_service.get_meeting_status(token)
+        payload_for_processing = status_data if isinstance(status_data, dict) else {}
+
+        # New transcript API support:
+        # https://coachlink360.aux-rolplay.com/api/meetings/{meeting_no}/transcript
+        aux_meeting_id = am.aux_meeting_id
+        if aux_meeting_id:
+            transcript_obj = aux_service.get_meeting_transcript(aux_meeting_id)
+            if transcript_obj:
+                payload_for_processing["transcript"] = transcript_obj
+        return payload_for_processing
+    except Exception as e:
+        logging.error(f"[SCHEDULER] ERROR polling Aux status for meeting {meeting_id}: {e}")
+        import traceback
+        logging.error(f"[SCHEDULER] Traceback: {traceback.format_exc()}")
+        return None
+
+def _next_aux_poll(am, now_utc, api_status, bot_state):
+    """(next_poll_at, attempts) for a meeting whose poll did not complete it."""
+    unchanged = (api_status, bot_state) == (am.get("aux_last_status"), am.get("aux_bot_state"))
+    attempts = (am.get("aux_poll_attempts") or 0) + 1 if unchanged else 0
+    step = AUX_POLL_MIN_SECONDS * 2 ** min(attempts, 16)
+    backoff = timedelta(seconds=min(step, AUX_POLL_MAX_SECONDS))
+    start_dt = db.from_db_timestamp(am.get("start_at"))
+    end_dt = db.from_db_timestamp(am.get("end_at"))
+    idle = not bot_state or str(bot_state).strip().lower() in AUX_IDLE_BOT_STATES
+
+    if start_dt and now_utc < start_dt:
+        # Nothing to fetch before the bot is due to join
+        next_poll = start_dt
+    elif end_dt and now_utc < end_dt:
+        # In the call: no transcript before the end, just keep an eye on the bot
+        next_poll = min(end_dt, now_utc + backoff)
+    elif end_dt and now_utc < end_dt + timedelta(minutes=AUX_READY_WINDOW_MINUTES) and not idle:
+        # Bot attended and the meeting just ended: transcript expected within minutes
+        next_poll = now_utc + timedelta(seconds=min(step, AUX_READY_POLL_MAX_SECONDS))
+    else:
+        next_poll = now_utc + backoff
+    next_poll = min(max(next_poll, now_utc + timedelta(seconds=AUX_POLL_MIN_SECONDS)),
+                    now_utc + timedelta(seconds=AUX_POLL_MAX_SECONDS))
+    return next_poll, attempts
+
+def _save_aux_poll_state(am, now_utc, payload):
+    payload = payload or {}
+    api_status = payload.get("status")
+    bot_state = payload.get("attendee_bot_state")
+    api_status = str(api_status)[:64] if api_status is not None else None
+    bot_state = str(bot_state)[:64] if bot_state is not None else None
+    next_poll, attempts = _next_aux_poll(am, now_utc, api_status, bot_state)
+    repositories.save_aux_poll_state(am.id, next_poll, attempts, api_status, bot_state)
+    logging.info(f"[SCHEDULER] Meeting {am.id} next Aux poll at {next_poll} (attempt {attempts})")
+
+def _process_aux_payload(am, payload_for_processing):
+    """Scheduler thread: processes a fetched Aux payload once the meeting is done. True if it was completed."""
+    meeting_id = am.id
+    if payload_for_processing:
+        api_status = payload_for_processing.get("status")
+        bot_state = payload_for_processing.get("attendee_bot_state")
+        logging.info(f"[SCHEDULER] Meeting {meeting_id} AUX status: {api_status}, bot_state: {bot_state}")
+
+        transcript_preview = meeting_service.extract_aux_transcript_content(payload_for_processing)
+        terminal_statuses = {"completed", "complete", "done", "processed", "transcribed"}
+        should_process = (str(api_status).lower() in terminal_statuses) or bool(transcript_preview)
+
+        if should_process:
+            logging.info(f"[SCHEDULER] Meeting {meeting_id} is completed. Processing transcript...")
+            success = meeting_service.process_aux_transcript(am, payload_for_processing)
+
+            if success:
+                db.execute_query("UPDATE meetings SET status = 'completed' WHERE id = ?", (meeting_id,), commit=True)
+                logging.info(f"[SCHEDULER] Meeting {meeting_id} fully processed and marked completed.")
+                return True
+            else:
+                logging.warning(f"[SCHEDULER] Meeting {meeting_id} transcript processing returned False")
+        else:
+            logging.info(f"[SCHEDULER] Meeting {meeting_id} not yet completed (status: {api_status})")
+    else:
+        logging.warning(f"[SCHEDULER] No AUX status/transcript data yet for meeting {meeting_id}")
+    return False
+
+def _aux_executor():
+    global _aux_pool
+    if _aux_pool is None:
+        _aux_pool = ThreadPoolExecutor(max_workers=AUX_POLL_WORKERS, thread_name_prefix="aux-poll")
+    return _aux_pool
 
 def check_pending_meetings():
+    """Full pass (due meetings after a resync, then Aux polling); kept for scripts and manual runs."""
+    with db_metrics.scope("scheduler.check_pending_meetings"):
+        _process_due_meetings(resync=True)
+        _poll_aux_transcripts()
+
+def process_due_meetings():
+    """Due-check job (every DUE_CHECK_SECONDS): fires reminders / survey triggers from the in-memory due index."""
+    global _due_term
+    if not leader.is_leader():
+        return
+    # Whatever this process indexed before (or while another process led) may be stale
+    resync = leader.term != _due_term
+    _due_term = leader.term
+    with db_metrics.scope("scheduler.process_due_meetings"):
+        _process_due_meetings(resync=resync)
+
+def poll_aux_transcripts():
+    """Minute job: Aux transcript polling plus the survey poll / housekeeping that runs every 10 minutes."""
+    if not leader.is_leader():
+        return
+    with db_metrics.scope("scheduler.poll_aux_transcripts"):
+        _poll_aux_transcripts()
+
+def _process_due_meetings(resync=False):
     """
-    Periodic job to check for finished meetings that need reminders
-    and poll for new survey responses.
+    Sends the post-meeting reminder / survey trigger for meetings that ended more than 1 minute ago.
     Rules:
-    - Status is 'scheduled'.
+    - Status is 'scheduled', 'reminder_sent' or 'completed' and the survey isn't sent yet.
     - Now > EndTime + 1 minute.
     """
+    from utils import get_current_utc_time
+
+    with _due_lock:
+        due_queue.sync(force_resync=resync)
+        now_utc = get_current_utc_time()
+        due_ids = due_queue.pop_due(now_utc.timestamp())
+        if not due_ids:
+            return
+
+        logging.info("=" * 60)
+        logging.info(f"[SCHEDULER] {len(due_ids)} meetings due for reminder / survey at {now_utc}")
+        try:
+            meetings = repositories.find_due_candidates(due_ids)
+        except Exception:
+            # Put them back so a database blip doesn't drop them until the next resync
+            for meeting_id in due_ids:
+                due_queue.schedule(meeting_id, now_utc.timestamp() + DUE_RETRY_SECONDS)
+            raise
+        for m in meetings:
+            end_dt = db.from_db_timestamp(m.end_at)
+            if end_dt is None:
+                logging.warning(f"[SCHEDULER] Meeting {m.id} has no end_at, skipping")
+                continue
+            if now_utc < end_dt + timedelta(minutes=1):
+                # Rescheduled since it was indexed
+                due_queue.schedule(m.id, due_queue.due_ts_for(end_dt))
+                continue
+            try:
+                # One unit of work (one commit) per meeting, so a failure only affects that meeting.
+                with db.transaction():
+                    _process_due_meeting(m, now_utc)
+            except Exception as e:
+                logging.error(f"[SCHEDULER] ERROR processing meeting {m.id}: {e}")
+                import traceback
+                logging.error(f"[SCHEDULER] Traceback: {traceback.format_exc()}")
+            # Re-checked after the retry delay; dropped then once the survey is queued
+            due_queue.schedule(m.id, now_utc.timestamp() + DUE_RETRY_SECONDS)
+
+def _poll_aux_transcripts():
+    """Polls Aux for transcripts of meetings with a bot token, then the 10-minute survey poll / housekeeping."""
     from services import survey_service
     from utils import get_current_utc_time
-    
+
     now_utc = get_current_utc_time()
-    logging.info("=" * 60)
-    logging.info(f"[SCHEDULER] check_pending_meetings() started at {now_utc}")
-    
-    meetings = db.execute_query(
-        "SELECT * FROM meetings WHERE status IN ('scheduled', 'reminder_sent', 'completed') AND COALESCE(survey_status, 'pending') != 'sent'",
-        fetch_all=True
-    ) or []
-    logging.info(f"[SCHEDULER] Found {len(meetings)} meetings pending survey with status in ('scheduled','reminder_sent','completed')")
-    
-    for m in meetings:
-        try:
-            meeting_id = m['id']
-            logging.info(f"[SCHEDULER] Processing meeting {meeting_id}: {_row_get(m, 'title', 'Untitled')}")
-            logging.info(f"[SCHEDULER] Meeting data: outlook_id={_row_get(m, 'outlook_event_id')}, start={_row_get(m, 'start_time')}, end={_row_get(m, 'end_time')}, aux_token={_row_get(m, 'aux_meeting_token')}")
-            
-            # End Time Parsing
-            if m['end_time']:
-                end_dt = parse_iso_datetime(m['end_time'])
-                logging.info(f"[SCHEDULER] Meeting {meeting_id} end_time parsed: {end_dt}")
-            else:
-                # Fallback if null (shouldn't happen with new logic)
-                start_dt = parse_iso_datetime(m['start_time'])
-                end_dt = start_dt + timedelta(minutes=30)
-                logging.warning(f"[SCHEDULER] Meeting {meeting_id} has no end_time, using fallback: {end_dt}")
-            
-            # Logic: 1 minute buffer (Both are UTC aware)
-            time_diff = now_utc - end_dt
-            logging.info(f"[SCHEDULER] Meeting {meeting_id} time check: now={now_utc}, end={end_dt}, diff={time_diff}")
-            
-            if now_utc >= (end_dt + timedelta(minutes=1)):
-                logging.info(f"[SCHEDULER] Meeting {meeting_id} has finished (past end time + 1min buffer)")
-                target_phone = m['salesperson_phone']
-                current_status = (str(_row_get(m, "status", "")) or "").strip().lower()
-                survey_status = (str(_row_get(m, "survey_status", "pending")) or "pending").strip().lower()
-                
-                # Check if we should message (Registered Users Only)
-                if not target_phone:
-                    logging.warning(f"[SCHEDULER] Meeting {meeting_id} has no salesperson_phone, marking as reminder_sent silently")
-                    # Mark processed silently so we don't loop forever
-                    db.execute_query("UPDATE meetings SET status = 'reminder_sent' WHERE id = ?", (meeting_id,), commit=True)
-                    continue
-
-                # Get Client Contact Info
-                crow = db.execute_query("SELECT name, email FROM clients WHERE id = ?", (m['client_id'],), fetch_one=True)
-                cname = crow['name'] if crow else "the client"
-                client_email = crow['email'] if crow else None
-                logging.info(f"[SCHEDULER] Meeting {meeting_id} client: {cname} ({client_email})")
-
-                # Get Salesperson Email
-                normalized_target = normalize_phone(target_phone)
-                user = db.execute_query(
-                    "SELECT email FROM users WHERE phone = ? OR phone = ? OR REPLACE(phone, 'whatsapp:', '') = REPLACE(?, 'whatsapp:', '') LIMIT 1",
-                    (target_phone, normalized_target, target_phone),
-                    fetch_one=True
-                )
-                sp_email = user['email'] if user else None
-                logging.info(f"[SCHEDULER] Meeting {meeting_id} salesperson: {sp_email}")
-                
-                # Trigger Survey Webhook (retryable until sent)
-                if survey_status != "sent":
-                    try:
-                        participant_email = client_email or sp_email
-                        webhook_payload = {
-                            "meeting_id": meeting_id,
-                            "meetingId": meeting_id,
-                            "aux_meeting_id": m['aux_meeting_id'],
-                            "auxMeetingId": m['aux_meeting_id'],
-                            "title": _row_get(m, 'title', 'Sales Meeting'),
-                            "meeting_title": _row_get(m, 'title', 'Sales Meeting'),
-                            "organizer_email": sp_email,
-                            "organizerEmail": sp_email,
-                            "client_email": client_email,
-                            "clientEmail": client_email,
-                            "participant_email": participant_email,
-                            "participant_name": cname,
-                            "session_id": str(_row_get(m, 'aux_meeting_id') or meeting_id),
-                            "client_name": cname,
-                            "status": "finished"
-                        }
-                        logging.info(f"[SCHEDULER] Triggering survey webhook for meeting {meeting_id}")
-                        survey_result = aux_service.trigger_survey_webhook(webhook_payload)
-                        survey_ok = False
-                        if isinstance(survey_result, dict):
-                            survey_ok = bool(survey_result.get("success")) or str(survey_result.get("status", "")).strip().lower() in {
-                                "success", "sent", "queued", "accepted", "ok"
-                            }
-                        elif survey_result is True:
-                            survey_ok = True
-
-                        if survey_ok:
-                            db.execute_query(
-                                "UPDATE meetings SET survey_status = 'sent' WHERE id = ?",
-                                (meeting_id,),
-                                commit=True
-                            )
-                            logging.info(f"[SCHEDULER] Survey webhook triggered for meeting {meeting_id}")
-                        else:
-                            db.execute_query(
-                                "UPDATE meetings SET survey_status = 'failed' WHERE id = ?",
-                                (meeting_id,),
-                                commit=True
-                            )
-                            logging.warning(f"[SCHEDULER] Survey webhook trigger unsuccessful for meeting {meeting_id}. Response: {survey_result}")
-                    except Exception as e:
-                        db.execute_query(
-                            "UPDATE meetings SET survey_status = 'failed' WHERE id = ?",
-                            (meeting_id,),
-                            commit=True
-                        )
-                        logging.error(f"[SCHEDULER] Failed to trigger survey webhook for meeting {meeting_id}: {e}")
-
-                # Send WhatsApp reminder only once (when transitioning from scheduled)
-                if current_status == "scheduled":
-                    msg = f"Meeting with {cname} finished. How did it go? (Reply 'Done' to log to HubSpot)"
-                    logging.info(f"[SCHEDULER] Sending WhatsApp reminder to {target_phone}")
-                    whatsapp_service.send_whatsapp_message(target_phone, msg)
-                    
-                    # Update Status
-                    db.execute_query("UPDATE meetings SET status = 'reminder_sent' WHERE id = ?", (meeting_id,), commit=True)
-                    logging.info(f"[SCHEDULER] Meeting {meeting_id} marked as 'reminder_sent'")
-            else:
-                logging.info(f"[SCHEDULER] Meeting {meeting_id} still in progress or upcoming")
-                
-        except Exception as e:
-            logging.error(f"[SCHEDULER] ERROR processing meeting {_row_get(m, 'id')}: {e}")
-            import traceback
-            logging.error(f"[SCHEDULER] Traceback: {traceback.format_exc()}")
-    
-    # 2. POLL AUX API FOR TRANSCRIPTS
+
+    # POLL AUX API FOR TRANSCRIPTS
     # Find meetings that have an Aux token but aren't fully processed yet.
     # Optimization: Only poll meetings that are 'active' (e.g., within 24 hours of start time)
     logging.info("=" * 60)
     logging.info("[SCHEDULER] Starting AUX API transcript polling...")
     
-    # We poll meetings with a token and status 'scheduled' or 'reminder_sent'
-    aux_meetings = db.execute_query(
-        "SELECT * FROM meetings WHERE aux_meeting_token IS NOT NULL AND status IN ('scheduled', 'reminder_sent', 'pending') ORDER BY id DESC LIMIT 25",
-        fetch_all=True
-    ) or []
+    # If a meeting started > 24 hours ago and still not completed, mark as failed to stop polling
+    db.execute_query(
+        "UPDATE meetings SET status = 'failed' WHERE aux_meeting_token IS NOT NULL AND status IN ('scheduled', 'reminder_sent', 'pending') AND start_at < ?",
+        (db.to_db_timestamp(now_utc - timedelta(hours=24)),),
+        commit=True
+    )
+
+    # We poll meetings with a token and status 'scheduled' or 'reminder_sent' whose aux_next_poll_at
+    # has passed, skipping ones that start more than 1 hour from now
+    aux_meetings = repositories.find_aux_poll_meetings(now_utc + timedelta(hours=1), now_utc, AUX_POLL_BATCH_SIZE)
     
     logging.info(f"[SCHEDULER] Found {len(aux_meetings)} total meetings with aux_meeting_token ready for polling")
-    
+    if len(aux_meetings) >= AUX_POLL_BATCH_SIZE:
+        logging.warning(f"[SCHEDULER] Aux poll backlog: batch of {AUX_POLL_BATCH_SIZE} full, the rest are polled on the next ticks")
+
+    deadline = time.monotonic() + AUX_POLL_DEADLINE_SECONDS
+    futures = {}
+    # Already most overdue first
     for am in aux_meetings:
-        meeting_id = am['id']
-        token = am['aux_meeting_token']
-        start_time_str = _row_get(am, 'start_time')
-        
-        # Deduplication/Efficiency: Skip polling if meeting is too old (e.g. > 24 hours) or too far in future
-        if start_time_str:
+        if am.id in _aux_in_flight:
+            logging.info(f"[SCHEDULER] Meeting {am.id} Aux fetch from the previous tick still running, skipping")
+            continue
+        _aux_in_flight.add(am.id)
+        future = _aux_executor().submit(_fetch_aux_payload, am)
+        future.add_done_callback(lambda _f, mid=am.id: _aux_in_flight.discard(mid))
+        futures[future] = am
+
+    processed = 0
+    try:
+        for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0.0)):
+            am = futures[future]
+            payload = future.result()
             try:
-                start_dt = parse_iso_datetime(start_time_str)
-                # If meeting started > 24 hours ago and still not completed, mark as failed/skipped to stop polling
-                if now_utc > (start_dt + timedelta(hours=24)):
-                    logging.warning(f"[SCHEDULER] Meeting {meeting_id} is > 24h old and still pending. Marking as 'failed' to stop polling.")
-                    db.execute_query("UPDATE meetings SET status = 'failed' WHERE id = ?", (meeting_id,), commit=True)
-                    continue
-                
-                # If meeting is > 1 hour in the future, don't poll yet (optional optimization)
-                if now_utc < (start_dt - timedelta(hours=1)):
-                    # logging.info(f"[SCHEDULER] Meeting {meeting_id} is too far in the future, skipping poll.")
-                    continue
+                # Transcript rows, the queued analysis job, the 'completed' status and the polling state are
+                # committed together. Nothing in here calls out over HTTP: the Aux fetch ran in the pool, and
+                # the Gemini analysis runs from the outbox after the commit.
+                with db.transaction():
+                    if not _process_aux_payload(am, payload):
+                        _save_aux_poll_state(am, now_utc, payload)
             except Exception as e:
-                logging.error(f"[SCHEDULER] Error parsing start_time for meeting {meeting_id}: {e}")
+                logging.error(f"[SCHEDULER] ERROR committing Aux poll for meeting {am.id}: {e}")
+                try:
+                    _save_aux_poll_state(am, now_utc, payload)
+                except Exception as e2:
+                    logging.error(f"[SCHEDULER] ERROR saving Aux poll state for meeting {am.id}: {e2}")
+            processed += 1
+    except FuturesTimeout:
+        cancelled = sum(1 for f in futures if f.cancel())
+        logging.warning(
+            f"[SCHEDULER] Aux polling hit the {AUX_POLL_DEADLINE_SECONDS}s tick deadline: "
+            f"{processed}/{len(futures)} processed, {cancelled} not started (still due, polled first next tick)"
+        )
 
-        try:
-            logging.info(f"[SCHEDULER] Polling AUX status for meeting {meeting_id}, token: {token[:20]}...")
-
-            status_data = aux_service.get_meeting_status(token)
-            payload_for_processing = status_data if isinstance(status_data, dict) else {}
-
-            # New transcript API support:
-            # https://coachlink360.aux-rolplay.com/api/meetings/{meeting_no}/transcript
-            aux_meeting_id = _row_get(am, "aux_meeting_id")
-            if aux_meeting_id:
-                transcript_obj = aux_service.get_meeting_transcript(aux_meeting_id)
-                if transcript_obj:
-                    payload_for_processing["transcript"] = transcript_obj
-
-            if payload_for_processing:
-                api_status = payload_for_processing.get("status")
-                bot_state = payload_for_processing.get("attendee_bot_state")
-                logging.info(f"[SCHEDULER] Meeting {meeting_id} AUX status: {api_status}, bot_state: {bot_state}")
-
-                transcript_preview = meeting_service.extract_aux_transcript_content(payload_for_processing)
-                terminal_statuses = {"completed", "complete", "done", "processed", "transcribed"}
-                should_process = (str(api_status).lower() in terminal_statuses) or bool(transcript_preview)
-
-                if should_process:
-                    logging.info(f"[SCHEDULER] Meeting {meeting_id} is completed. Processing transcript...")
-                    success = meeting_service.process_aux_transcript(am, payload_for_processing)
-
-                    if success:
-                        db.execute_query("UPDATE meetings SET status = 'completed' WHERE id = ?", (meeting_id,), commit=True)
-                        logging.info(f"[SCHEDULER] Meeting {meeting_id} fully processed and marked completed.")
-                    else:
-                        logging.warning(f"[SCHEDULER] Meeting {meeting_id} transcript processing returned False")
-                else:
-                    logging.info(f"[SCHEDULER] Meeting {meeting_id} not yet completed (status: {api_status})")
-            else:
-                logging.warning(f"[SCHEDULER] No AUX status/transcript data yet for meeting {meeting_id}")
-
-        except Exception as e:
-            logging.error(f"[SCHEDULER] ERROR polling Aux status for meeting {meeting_id}: {e}")
-            import traceback
-            logging.error(f"[SCHEDULER] Traceback: {traceback.format_exc()}")
-
-    logging.info("[SCHEDULER] AUX API polling completed")
+    logging.info(f"[SCHEDULER] AUX API polling completed ({processed}/{len(futures)} meetings)")
     logging.info("=" * 60)
 
     # Poll surveys every 10 minutes (scheduler runs every minute)
@@ -252,35 +386,65 @@ def check_pending_meetings():
             # Cleanup old records once daily at midnight
             if datetime.now().hour == 0:
                 survey_service.cleanup_old_sync_records()
+                retention.run_retention()
         except Exception as e:
             logging.error(f"Survey polling error: {e}")
 
+        try:
+            backup.run_scheduled_snapshot()
+        except Exception as e:
+            logging.error(f"[BACKUP] Scheduled snapshot failed: {e}")
+
 def start_scheduler():
-    """Starts the background scheduler unless explicitly disabled."""
+    """
+    Starts the background scheduler unless explicitly disabled; returns whether it is running.
+    Called by worker.py, and by the web process unless RUN_SCHEDULER_IN_WEB=false. Every process
+    that starts it joins the leader election (leader.py); only the elected one runs the jobs.
+    """
+    global _scheduler
+    if _scheduler is not None:
+        return True
     render_env = os.environ.get("RENDER")
     logging.info(f"[SCHEDULER] start_scheduler() called")
     logging.info(f"[SCHEDULER] RENDER env var: {render_env}")
 
     if not _is_truthy(os.getenv("ENABLE_SCHEDULER", "true")):
         logging.info("[SCHEDULER] Scheduler disabled via ENABLE_SCHEDULER")
-        return
+        return False
 
     if not _is_truthy(os.getenv("SCHEDULER_LEADER", "true")):
         logging.info("[SCHEDULER] Scheduler not started on this instance (SCHEDULER_LEADER=false)")
-        return
+        return False
+
+    leader.start()
+    # Registered first so it runs last: leadership is only released once the jobs have stopped
+    atexit.register(leader.stop)
+    logging.info(f"[SCHEDULER] Leader election started (leader now: {leader.is_leader()})")
 
-    logging.info("[SCHEDULER] Starting BackgroundScheduler with 60s interval")
+    due_check_seconds = _env_float("DUE_CHECK_SECONDS", 5.0)
+    logging.info(f"[SCHEDULER] Starting BackgroundScheduler (due check every {due_check_seconds}s, Aux polling every 60s)")
     scheduler = BackgroundScheduler()
     scheduler.add_job(
-        func=check_pending_meetings,
+        func=process_due_meetings,
+        trigger="interval",
+        seconds=due_check_seconds,
+        id="process_due_meetings",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        func=poll_aux_transcripts,
         trigger="interval",
         seconds=60,
-        id="check_pending_meetings",
+        id="poll_aux_transcripts",
         replace_existing=True,
         max_instances=1,
         coalesce=True
     )
     scheduler.start()
     atexit.register(lambda: scheduler.shutdown())
+    _scheduler = scheduler
     logging.info("[SCHEDULER] Scheduler started successfully")
+    return True
 
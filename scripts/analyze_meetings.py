@@ -1,13 +1,20 @@
 from database import db
 import re
+import sys
 
-def analyze_meetings():
-    res = db.execute_query("SELECT id, title, location, summary, aux_meeting_id FROM meetings ORDER BY id DESC LIMIT 20", fetch_all=True)
-    
+def _meetings(full_history):
+    with db.replica_reads():
+        if full_history:
+            # Streamed in id order (server-side cursor / keyset pages), never fully in memory
+            yield from db.iter_query("SELECT id, title, location, summary, aux_meeting_id FROM meetings", batch_size=500)
+        else:
+            yield from db.execute_query("SELECT id, title, location, summary, aux_meeting_id FROM meetings ORDER BY id DESC LIMIT 20", fetch_all=True)
+
+def analyze_meetings(full_history=False):
     link_pattern = r"(https?://(?:[a-zA-Z0-9-]+\.)?(?:zoom\.us|meet\.google\.com|teams\.(?:live|microsoft)\.com|teams\.microsoft\.com/l/meetup-join)/[^\s\"<>]+)"
     
-    print(f"Analyzing last 20 meetings:\n")
-    for r in res:
+    print(f"Analyzing {'all' if full_history else 'last 20'} meetings:\n")
+    for r in _meetings(full_history):
         mid = r['id']
         title = r['title']
         loc = r['location'] or ""
@@ -34,4 +41,4 @@ def analyze_meetings():
         print("-" * 30)
 
 if __name__ == "__main__":
-    analyze_meetings()
+    analyze_meetings(full_history="--all" in sys.argv)
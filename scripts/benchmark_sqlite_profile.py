@@ -0,0 +1,175 @@
+"""
+Benchmarks the SQLite profiles (SQLITE_PROFILE=default vs performance) under the app's
+concurrency pattern: several Flask request threads handling webhooks while the scheduler thread
+scans for due meetings and updates them, plus chat-style readers.
+
+Each profile runs in its own subprocess against a fresh temp database (DBHandler reads the env at
+import time). No external services are called; the workload issues the same statements as
+meeting_service.process_outlook_webhook, scheduler.check_pending_meetings and
+meeting_service.handle_incoming_message.
+
+Usage:
+    python scripts/benchmark_sqlite_profile.py [--seconds 10] [--webhook-threads 4] [--reader-threads 2]
+    python scripts/benchmark_sqlite_profile.py | tee bench_output.txt
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_workload(seconds, webhook_threads, reader_threads):
+    sys.path.append(ROOT)
+    import logging
+    logging.disable(logging.CRITICAL)
+    from database import db
+    import repositories
+
+    db.init_db()
+    for i in range(20):
+        repositories.save_user(f"sp{i}@example.com", f"SP {i}", f"whatsapp:+4477009{i:05d}", timezone="UTC")
+
+    counts = {"webhooks": 0, "scheduler_updates": 0, "scheduler_ticks": 0, "reads": 0}
+    errors = {"locked": 0, "other": 0}
+    latencies = {"webhook": [], "read": []}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def record_error(e):
+        with lock:
+            errors["locked" if "locked" in str(e) else "other"] += 1
+
+    def webhook_worker(n):
+        rnd = random.Random(n)
+        i = 0
+        while time.monotonic() < stop:
+            i += 1
+            sp = rnd.randrange(20)
+            now = datetime.now(timezone.utc)
+            start = now - timedelta(minutes=rnd.randrange(-120, 120))
+            t0 = time.perf_counter()
+            try:
+                with db.transaction():
+                    db.execute_query("SELECT email, phone, timezone FROM users WHERE email = ?", (f"sp{sp}@example.com",), fetch_one=True)
+                    res = db.upsert("clients", "email", {"email": f"c{n}_{i % 50}@example.com", "name": "Client", "phone": None, "company": "Acme"},
+                                    coalesce_cols=("name", "phone", "company"), returning="id")
+                    db.execute_query(
+                        "INSERT INTO meetings (outlook_event_id, start_time, end_time, start_at, end_at, client_id, status, "
+                        "salesperson_phone, salesperson_phone_e164, title) VALUES (?, ?, ?, ?, ?, ?, 'scheduled', ?, ?, ?)",
+                        (f"evt-{n}-{i}", start.isoformat(), (start + timedelta(minutes=30)).isoformat(),
+                         db.to_db_timestamp(start), db.to_db_timestamp(start + timedelta(minutes=30)), res["id"],
+                         f"whatsapp:+4477009{sp:05d}", f"+4477009{sp:05d}", "Demo"),
+                        commit=True)
+                db.execute_query("INSERT INTO messages (client_id, direction, message, timestamp) VALUES (?, 'outgoing', ?, ?)",
+                                 (res["id"], "coaching plan", now.isoformat()), commit=True)
+                with lock:
+                    counts["webhooks"] += 1
+                    latencies["webhook"].append(time.perf_counter() - t0)
+            except Exception as e:
+                record_error(e)
+
+    def scheduler_worker():
+        while time.monotonic() < stop:
+            now = datetime.now(timezone.utc)
+            try:
+                due = db.execute_query(
+                    "SELECT id FROM meetings WHERE status IN ('scheduled', 'reminder_sent') AND end_at <= ? LIMIT 200",
+                    (db.to_db_timestamp(now - timedelta(minutes=1)),), fetch_all=True)
+                for row in due:
+                    with db.transaction():
+                        db.execute_query("UPDATE meetings SET status = 'completed', survey_status = 'sent' WHERE id = ?", (row["id"],), commit=True)
+                    with lock:
+                        counts["scheduler_updates"] += 1
+                with lock:
+                    counts["scheduler_ticks"] += 1
+            except Exception as e:
+                record_error(e)
+            time.sleep(0.05)
+
+    def reader_worker(n):
+        rnd = random.Random(1000 + n)
+        while time.monotonic() < stop:
+            sp = rnd.randrange(20)
+            t0 = time.perf_counter()
+            try:
+                db.execute_query(
+                    "SELECT * FROM meetings WHERE salesperson_phone_e164 = ? AND status IN ('scheduled', 'reminder_sent') ORDER BY id DESC LIMIT 1",
+                    (f"+4477009{sp:05d}",), fetch_one=True)
+                db.execute_query("SELECT timezone FROM users WHERE phone_e164 = ?", (f"+4477009{sp:05d}",), fetch_one=True)
+                with lock:
+                    counts["reads"] += 1
+                    latencies["read"].append(time.perf_counter() - t0)
+            except Exception as e:
+                record_error(e)
+
+    threads = [threading.Thread(target=webhook_worker, args=(n,)) for n in range(webhook_threads)]
+    threads.append(threading.Thread(target=scheduler_worker))
+    threads += [threading.Thread(target=reader_worker, args=(n,)) for n in range(reader_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    def pct(values, p):
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+    return {
+        "profile": db.sqlite_profile,
+        "webhooks_per_s": round(counts["webhooks"] / seconds, 1),
+        "webhook_p50_ms": pct(latencies["webhook"], 0.50),
+        "webhook_p99_ms": pct(latencies["webhook"], 0.99),
+        "scheduler_updates_per_s": round(counts["scheduler_updates"] / seconds, 1),
+        "scheduler_ticks": counts["scheduler_ticks"],
+        "reads_per_s": round(counts["reads"] / seconds, 1),
+        "read_p99_ms": pct(latencies["read"], 0.99),
+        "locked_errors": errors["locked"],
+        "other_errors": errors["other"],
+        "db_pool": db.pool_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--webhook-threads", type=int, default=4)
+    parser.add_argument("--reader-threads", type=int, default=2)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_run_workload(args.seconds, args.webhook_threads, args.reader_threads)))
+        return
+
+    results = []
+    for profile in ("default", "performance"):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SQLITE_PROFILE=profile, SQLITE_DB_PATH=os.path.join(tmp, "bench.db"))
+            env.pop("DATABASE_URL", None)
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", "--seconds", str(args.seconds),
+                 "--webhook-threads", str(args.webhook_threads), "--reader-threads", str(args.reader_threads)],
+                env=env, capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    keys = ["webhooks_per_s", "webhook_p50_ms", "webhook_p99_ms", "scheduler_updates_per_s", "scheduler_ticks",
+            "reads_per_s", "read_p99_ms", "locked_errors", "other_errors"]
+    print(f"SQLite profile benchmark: {args.seconds}s, {args.webhook_threads} webhook threads, "
+          f"1 scheduler thread, {args.reader_threads} reader threads")
+    print(f"{'metric':<26}" + "".join(f"{r['profile']:>14}" for r in results))
+    for k in keys:
+        print(f"{k:<26}" + "".join(f"{r[k]:>14}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
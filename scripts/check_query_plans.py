@@ -0,0 +1,342 @@
+"""
+Query plan regression suite for the hot queries in scheduler.py, meeting_service.py, app.py and outbox.py.
+
+Seeds a throwaway database with a synthetic dataset of realistic size (a year of meetings,
+transcripts and WhatsApp messages), runs EXPLAIN on every query in HOT_QUERIES and fails when a
+plan contains a full table scan or a temp sort. This catches changes that quietly stop a hot
+query from using its index (e.g. wrapping a column in REPLACE(), or ORDER BY id DESC LIMIT n
+over an unindexed filter).
+
+    python scripts/check_query_plans.py              # SQLite: EXPLAIN QUERY PLAN
+    python scripts/check_query_plans.py --postgres   # Postgres mirror: EXPLAIN (FORMAT JSON)
+    python scripts/check_query_plans.py -v           # print every plan
+
+--postgres uses PLAN_DATABASE_URL, which must point at a disposable local database: it is
+migrated, seeded and ANALYZEd. Inline queries are checked verbatim against their source file,
+so rewriting one without updating HOT_QUERIES fails the suite too.
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+# Add root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Dataset size (roughly a year of traffic for a mid-size team)
+N_USERS = 60
+N_CLIENTS = 6000
+N_MEETINGS = 25000
+N_TRANSCRIBED = 4000
+LINES_PER_TRANSCRIPT = 40
+N_MESSAGES = 30000
+N_OUTBOX_DONE = 20000   # a week of delivered side effects (OUTBOX_DONE_RETENTION_DAYS)
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _user_phone(i):
+    return f"+1555{i:07d}"
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+# Inline hot queries: (name, source file, SQL exactly as written there, params, allowed findings).
+# `allowed` lists plan findings accepted for that query, each with the reason it is bounded.
+INLINE_QUERIES = [
+    ("outlook_webhook.dedupe_by_event_id", "services/meeting_service.py",
+     "SELECT id, aux_meeting_token, status FROM meetings WHERE outlook_event_id = ?",
+     lambda: ("evt-123",), {}),
+    ("outlook_webhook.user_by_email", "services/meeting_service.py",
+     "SELECT phone, timezone FROM users WHERE email = ?",
+     lambda: ("sp7@coachlink.test",), {}),
+    ("outlook_webhook.secondary_dedupe", "services/meeting_service.py",
+     "SELECT id, outlook_event_id, aux_meeting_token, status FROM meetings WHERE salesperson_phone = ? AND title = ? AND start_at BETWEEN ? AND ? ORDER BY id DESC LIMIT 1",
+     lambda: (_user_phone(7), "Discovery call", _ts(NOW - timedelta(minutes=5)), _ts(NOW + timedelta(minutes=5))), {}),
+    ("read_ai_webhook.match_by_start", "services/meeting_service.py",
+     "SELECT id, client_id, salesperson_phone FROM meetings WHERE start_at BETWEEN ? AND ? ORDER BY id DESC LIMIT 1",
+     lambda: (_ts(NOW - timedelta(minutes=10)), _ts(NOW + timedelta(minutes=10))),
+     {"temp_sort": "sorts only the meetings inside the +-10 min start_at window"}),
+    ("whatsapp.chat_transcript", "services/meeting_service.py",
+     "SELECT speaker, text FROM meeting_transcripts WHERE meeting_id = ? ORDER BY id ASC",
+     lambda: (123,), {}),
+    ("scheduler.fail_stale_aux", "scheduler.py",
+     "UPDATE meetings SET status = 'failed' WHERE aux_meeting_token IS NOT NULL AND status IN ('scheduled', 'reminder_sent', 'pending') AND start_at < ?",
+     lambda: (_ts(NOW - timedelta(hours=24)),), {}),
+    ("scheduler.mark_status", "scheduler.py",
+     "UPDATE meetings SET status = 'reminder_sent' WHERE id = ?",
+     lambda: (123,), {}),
+    ("ingest.owner_by_email", "app.py",
+     "SELECT phone FROM users WHERE email = ?",
+     lambda: ("sp7@coachlink.test",), {}),
+    ("ingest.recent_open_meeting", "app.py",
+     "SELECT id, salesperson_phone FROM meetings WHERE status IN ('scheduled', 'reminder_sent', 'pending') ORDER BY id DESC LIMIT 1",
+     lambda: (), {}),
+    ("chat_context.archived_transcript", "retention.py",
+     "SELECT payload FROM meeting_transcripts_archive WHERE meeting_id = ? ORDER BY first_id",
+     lambda: (123,), {"temp_sort": "orders the handful of archive blobs of one meeting"}),
+]
+
+# Hot queries built by repositories.py (projection f-strings): the SQL is captured by calling the
+# real function, so these can't drift. (name, fn, allowed findings)
+REPOSITORY_QUERIES = [
+    ("due_queue.resync", lambda r: r.find_survey_pending_meetings(), {}),
+    ("due_queue.refresh", lambda r: r.find_survey_pending_meetings(changed_since=NOW - timedelta(minutes=2)), {}),
+    ("scheduler.find_due_candidates", lambda r: r.find_due_candidates([11, 12, 13]), {}),
+    ("scheduler.find_aux_poll_meetings", lambda r: r.find_aux_poll_meetings(NOW + timedelta(hours=1), NOW, 200),
+     {"temp_sort": "sorts only the due open meetings with an Aux token; anything open past 24h is marked failed"}),
+    ("chat_context.get_client", lambda r: r.get_client(42, columns=("name", "company")), {}),
+    ("chat_context.user_timezone", lambda r: r.get_user_by_phone(_user_phone(7), columns=("timezone",)), {}),
+    ("whatsapp.active_meeting_for_salesperson", lambda r: r.find_active_meeting_for_salesperson(_user_phone(7)), {}),
+    ("whatsapp.completed_meetings_for_salesperson", lambda r: r.find_completed_meetings_for_salesperson(_user_phone(7)), {}),
+    ("whatsapp.chat_context_meeting", lambda r: r.get_meeting(123, "chat_context"), {}),
+    ("transcript_webhook.match_by_start", lambda r: r.find_meeting_starting_between(NOW - timedelta(minutes=30), NOW + timedelta(minutes=30)),
+     {"temp_sort": "sorts only the meetings inside the +-30 min start_at window"}),
+]
+
+def _claim_update(o):
+    # claim() runs the has_runnable() probe first; skip it to capture the UPDATE itself
+    with patch.object(o, "has_runnable", return_value=True):
+        return o.claim(10)
+
+
+# Outbox statements (outbox.py builds them per backend), captured the same way. (name, fn, allowed findings)
+OUTBOX_QUERIES = [
+    ("outbox.has_runnable", lambda o: o.has_runnable(), {}),
+    ("outbox.claim", _claim_update, {}),
+    ("outbox.prune", lambda o: o.prune(), {}),
+    ("outbox.dead_jobs", lambda o: o.dead_jobs(), {}),
+    ("outbox.overdue_s", lambda o: o.overdue_s(), {}),
+    ("outbox.stats", lambda o: o.stats(),
+     {"full_index_scan": "covering index scan over at most a week of jobs (done jobs are pruned)"}),
+]
+
+
+def _ts(dt):
+    from database import db
+    return db.to_db_timestamp(dt)
+
+
+# ---------------------------------------------------------------------------
+# Seeding
+# ---------------------------------------------------------------------------
+
+def seed(db):
+    rng = random.Random(17)
+    titles = ["Discovery call", "Demo", "Pricing review", "QBR", "Kickoff", "Follow-up"]
+
+    db.executemany(
+        "INSERT INTO users (email, name, phone, phone_e164, timezone) VALUES (?, ?, ?, ?, ?)",
+        [(f"sp{i}@coachlink.test", f"Rep {i}", _user_phone(i), _user_phone(i), "UTC") for i in range(N_USERS)],
+        commit=True
+    )
+    db.executemany(
+        "INSERT INTO clients (name, email, phone, company) VALUES (?, ?, ?, ?)",
+        [(f"Client {i}", f"client{i}@example.test", f"+4420{i:08d}", f"Company {i % 900}") for i in range(N_CLIENTS)],
+        commit=True
+    )
+
+    meetings = []
+    for i in range(N_MEETINGS):
+        # Spread over the past year, with the last ~1% scheduled or in progress
+        start = NOW - timedelta(minutes=int(525600 * (1 - i / N_MEETINGS))) + timedelta(hours=rng.randint(-2, 48) if i > N_MEETINGS * 0.99 else 0)
+        end = start + timedelta(minutes=rng.choice((30, 45, 60)))
+        recent = start > NOW - timedelta(days=2)
+        status = rng.choice(("scheduled", "reminder_sent", "pending")) if recent else rng.choices(
+            ("completed", "failed", "reminder_sent"), weights=(90, 7, 3))[0]
+        survey = "sent" if status == "completed" and rng.random() < 0.95 else "pending"
+        sp = rng.randrange(N_USERS)
+        token = f"tok{i:010d}" if rng.random() < 0.7 else None
+        next_poll = _ts(start + timedelta(minutes=rng.randint(-60, 120))) if token and recent else None
+        meetings.append((
+            f"evt-{i}", start.isoformat(), end.isoformat(), _ts(start), _ts(end), rng.randint(1, N_CLIENTS), status,
+            _user_phone(sp), _user_phone(sp), rng.choice(titles), survey, token, i if token else None, "Teams", next_poll,
+        ))
+    db.executemany(
+        "INSERT INTO meetings (outlook_event_id, start_time, end_time, start_at, end_at, client_id, status, "
+        "salesperson_phone, salesperson_phone_e164, title, survey_status, aux_meeting_token, aux_meeting_id, location, "
+        "aux_next_poll_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        meetings, commit=True, prepare=True
+    )
+
+    transcribed = rng.sample(range(1, N_MEETINGS + 1), N_TRANSCRIBED)
+    db.executemany(
+        "INSERT INTO meeting_transcripts (meeting_id, speaker, timestamp, text, source) VALUES (?, ?, ?, ?, ?)",
+        [(m, rng.choice(("Rep", "Client")), f"00:{n // 60:02d}:{n % 60:02d}", "lorem ipsum " * rng.randint(2, 12), "aux")
+         for m in transcribed for n in range(LINES_PER_TRANSCRIPT)],
+        commit=True, prepare=True
+    )
+    db.executemany(
+        "INSERT INTO messages (client_id, direction, message, timestamp) VALUES (?, ?, ?, ?)",
+        [(rng.randint(1, N_CLIENTS), rng.choice(("incoming", "outgoing")), "ok",
+          (NOW - timedelta(minutes=rng.randint(0, 525600))).isoformat()) for _ in range(N_MESSAGES)],
+        commit=True, prepare=True
+    )
+    outbox_jobs = []
+    for i in range(N_OUTBOX_DONE + 120):
+        created = NOW - timedelta(seconds=rng.randint(0, 7 * 86400))
+        status = "done" if i < N_OUTBOX_DONE else ("pending" if i < N_OUTBOX_DONE + 100 else "dead")
+        outbox_jobs.append((rng.choice(("whatsapp", "hubspot", "aux", "survey")), "x.y", "{}", status, 1,
+                            _ts(created + timedelta(minutes=rng.randint(-5, 30))), _ts(created), _ts(created)))
+    db.executemany(
+        "INSERT INTO outbox_jobs (destination, kind, payload, status, attempts, run_after, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        outbox_jobs, commit=True
+    )
+    db.execute_query("ANALYZE", commit=True)
+
+
+# ---------------------------------------------------------------------------
+# Plan inspection
+# ---------------------------------------------------------------------------
+
+def _sqlite_partial_indexes(db):
+    rows = db.execute_query("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL", fetch_all=True)
+    return {r["name"] for r in rows if " WHERE " in r["sql"].upper()}
+
+
+def sqlite_findings(db, sql, params):
+    """(plan lines, findings) for SQLite's EXPLAIN QUERY PLAN."""
+    rows = db.execute_query(f"EXPLAIN QUERY PLAN {sql}", params, fetch_all=True)
+    lines = [r["detail"] for r in rows]
+    partial = _sqlite_partial_indexes(db)
+    findings = {}
+    for detail in lines:
+        # "SCAN t" = full table scan; "SCAN t USING [COVERING] INDEX i" = full index scan, which is
+        # fine for a partial index (it only holds the rows the query is about)
+        if detail.startswith("SCAN "):
+            index = detail.split(" INDEX ", 1)[1].split()[0] if " INDEX " in detail else None
+            if index is None:
+                findings.setdefault("full_scan", []).append(detail)
+            elif index not in partial:
+                findings.setdefault("full_index_scan", []).append(detail)
+        if "TEMP B-TREE" in detail:
+            findings.setdefault("temp_sort", []).append(detail)
+    return lines, findings
+
+
+def postgres_findings(db, sql, params):
+    """(plan lines, findings) for Postgres' EXPLAIN (FORMAT JSON)."""
+    row = db.execute_query(f"EXPLAIN (FORMAT JSON) {sql}", params, fetch_one=True)
+    plan = row["QUERY PLAN"][0]["Plan"]
+    lines, findings = [], {}
+
+    def walk(node, depth=0):
+        label = node["Node Type"] + (f" on {node['Relation Name']}" if node.get("Relation Name") else "") + \
+            (f" using {node['Index Name']}" if node.get("Index Name") else "")
+        lines.append("  " * depth + label)
+        if node["Node Type"] == "Seq Scan":
+            findings.setdefault("full_scan", []).append(label)
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            findings.setdefault("temp_sort", []).append(label)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan)
+    return lines, findings
+
+
+def collect_queries():
+    """[(name, sql, params, allowed)] for every registered hot query."""
+    from database import db
+    import repositories
+
+    queries = []
+    for name, source, sql, params, allowed in INLINE_QUERIES:
+        with open(os.path.join(ROOT, source)) as f:
+            if sql not in f.read():
+                raise AssertionError(f"{name}: query no longer found verbatim in {source}; update HOT_QUERIES")
+        queries.append((name, sql, params(), allowed))
+
+    from outbox import outbox
+
+    real_execute = db.execute_query
+    for registry, target in ((REPOSITORY_QUERIES, repositories), (OUTBOX_QUERIES, outbox)):
+        for name, fn, allowed in registry:
+            calls = []
+
+            def spy(query, params=(), **kwargs):
+                calls.append((query, params))
+                return real_execute(query, params, **kwargs)
+
+            with patch.object(db, "execute_query", side_effect=spy):
+                fn(target)
+            sql, params = calls[0]
+            queries.append((name, sql, tuple(params), allowed))
+    return queries
+
+
+class QueryPlanTest(unittest.TestCase):
+    postgres = False
+    verbose = False
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = None
+        env = {"SPOOL_ENABLED": "false"}
+        if cls.postgres:
+            env["DATABASE_URL"] = os.environ["PLAN_DATABASE_URL"]
+        else:
+            cls._tmp = tempfile.TemporaryDirectory()
+            env["SQLITE_DB_PATH"] = os.path.join(cls._tmp.name, "plans.db")
+        cls._env = patch.dict(os.environ, env)
+        cls._env.start()
+        if not cls.postgres:
+            os.environ.pop("DATABASE_URL", None)
+
+        import database
+        # Fresh handler bound to the patched environment, shared with repositories via database.db
+        cls._db_patch = patch.object(database, "db", database.DBHandler())
+        cls.db = cls._db_patch.start()
+        import repositories
+        cls._repo_patch = patch.object(repositories, "db", cls.db)
+        cls._repo_patch.start()
+        import outbox
+        cls._outbox_patch = patch.object(outbox, "db", cls.db)
+        cls._outbox_patch.start()
+
+        from migrations import migrate
+        migrate(cls.db)
+        if cls.db.execute_query("SELECT COUNT(*) AS n FROM meetings", fetch_one=True)["n"] < N_MEETINGS:
+            seed(cls.db)
+        cls.queries = collect_queries()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._outbox_patch.stop()
+        cls._repo_patch.stop()
+        cls._db_patch.stop()
+        cls._env.stop()
+        if cls._tmp:
+            cls._tmp.cleanup()
+
+    def test_hot_queries_use_indexes(self):
+        inspect = postgres_findings if self.postgres else sqlite_findings
+        failures = []
+        for name, sql, params, allowed in self.queries:
+            lines, findings = inspect(self.db, sql, params)
+            if self.verbose:
+                print(f"\n{name}\n  " + "\n  ".join(lines))
+            for kind, details in findings.items():
+                if kind not in allowed:
+                    failures.append(f"{name}: {kind}: {'; '.join(details)}\n    {sql}")
+        self.assertFalse(failures, "Hot queries regressed to scans/sorts:\n" + "\n".join(failures))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postgres", action="store_true", help="run against PLAN_DATABASE_URL instead of SQLite")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+    if args.postgres and not os.getenv("PLAN_DATABASE_URL"):
+        parser.error("--postgres needs PLAN_DATABASE_URL (a disposable local database)")
+    QueryPlanTest.postgres = args.postgres
+    QueryPlanTest.verbose = args.verbose
+    unittest.main(argv=[sys.argv[0]], verbosity=2 if args.verbose else 1)
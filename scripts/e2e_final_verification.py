@@ -10,6 +10,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services import meeting_service, ai_service, whatsapp_service, aux_service, hubspot_service
 from database import db
+import repositories
 from utils import get_current_utc_time, parse_iso_datetime
 
 # --- MOCKS ---
@@ -57,8 +58,7 @@ def run_e2e_test():
 
     # 1. Registration
     print("\n[STEP 1] Registration")
-    db.execute_query("INSERT INTO users (email, name, phone) VALUES (?, ?, ?)", 
-                     (user_email, "Test Organizer", user_phone), commit=True)
+    repositories.save_user(user_email, "Test Organizer", user_phone)
     print("  ✅ User registered")
 
     # 2. Outlook Webhook (Timezone Check)
@@ -31,9 +31,10 @@ class FullWorkflowInspection(unittest.TestCase):
         if os.path.exists(test_db):
             os.remove(test_db)
         from database import db
+        import repositories
         db.init_db()
         # Register a test user
-        db.execute_query("INSERT INTO users (email, phone, name, timezone) VALUES ('sales@example.com', 'whatsapp:+1234567890', 'Sales Pro', 'Asia/Kolkata')", commit=True)
+        repositories.save_user("sales@example.com", "Sales Pro", "whatsapp:+1234567890", timezone="Asia/Kolkata")
 
     @patch('services.ai_service.generate_coaching_plan')
     @patch('services.ai_service.generate_post_meeting_analysis')
@@ -1,12 +1,17 @@
 from database import db
 import re
+import sys
 
-def check_missing_aux():
-    res = db.execute_query("SELECT id, title, location, summary, aux_meeting_id FROM meetings WHERE aux_meeting_id IS NULL ORDER BY id DESC LIMIT 20", fetch_all=True)
+def check_missing_aux(full_history=False):
+    if full_history:
+        # Streams every meeting in id order; memory stays flat however large the table is
+        res = db.iter_query("SELECT id, title, location, summary, aux_meeting_id FROM meetings WHERE aux_meeting_id IS NULL", batch_size=500)
+    else:
+        res = db.execute_query("SELECT id, title, location, summary, aux_meeting_id FROM meetings WHERE aux_meeting_id IS NULL ORDER BY id DESC LIMIT 20", fetch_all=True)
     
     link_pattern = r"(https?://(?:[a-zA-Z0-9-]+\.)?(?:zoom\.us|meet\.google\.com|teams\.(?:live|microsoft)\.com|teams\.microsoft\.com/l/meetup-join)/[^\s\"<>]+)"
     
-    print(f"Checking meetings without Aux ID:\n")
+    print(f"Checking meetings without Aux ID{' (full history)' if full_history else ''}:\n")
     for r in res:
         mid = r['id']
         title = r['title']
@@ -27,4 +32,4 @@ def check_missing_aux():
             pass
 
 if __name__ == "__main__":
-    check_missing_aux()
+    check_missing_aux(full_history="--all" in sys.argv)
@@ -16,8 +16,8 @@ def simulate_webhook():
     user = db.execute_query("SELECT email FROM users LIMIT 1", fetch_one=True)
     if not user:
         print("No users found. Creating a test user...")
-        db.execute_query("INSERT INTO users (email, name, phone, timezone) VALUES (?, ?, ?, ?)", 
-                         ("test@example.com", "Test User", "+1234567890", "UTC"), commit=True)
+        import repositories
+        repositories.save_user("test@example.com", "Test User", "+1234567890", timezone="UTC")
         user = {"email": "test@example.com"}
 
     payload = {
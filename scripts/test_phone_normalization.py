@@ -0,0 +1,72 @@
+"""
+Phone normalization test.
+Checks that to_e164 / normalize_phone keep international numbers and reject national-format
+ones (no country code) instead of turning them into a number in some other country.
+"""
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+from utils import to_e164, normalize_phone
+
+print("=" * 65)
+print("PHONE NORMALIZATION TEST")
+print("=" * 65)
+
+os.environ.pop("PHONE_DEFAULT_REGION", None)
+
+test_cases = [
+    # (input, expected to_e164)
+    ("+1 (555) 123-4567",        "+15551234567"),
+    ("whatsapp:+15551234567",    "+15551234567"),
+    ("+91 98765 43210",          "+919876543210"),
+    ("0044 20 7946 0958",        "+442079460958"),   # '00' international prefix
+    ("5551234567",               None),              # US national format: no country code
+    ("(555) 123-4567",           None),
+    ("020 7946 0958",            None),              # UK national format (trunk '0')
+    ("whatsapp:5551234567",      None),
+    ("+0123456789",              None),              # country codes never start with 0
+    ("+1234567",                 None),              # too short
+    ("+1234567890123456",        None),              # longer than E.164 allows
+    ("",                         None),
+    (None,                       None),
+]
+
+all_pass = True
+for raw, expected in test_cases:
+    got = to_e164(raw)
+    ok = got == expected
+    all_pass = all_pass and ok
+    print(f"  [{'PASS' if ok else 'FAIL'}] to_e164({raw!r:<26}) -> {got!r}")
+
+for raw, expected in [("+44 20 7946 0958", "whatsapp:+442079460958"), ("5551234567", None)]:
+    got = normalize_phone(raw)
+    ok = got == expected
+    all_pass = all_pass and ok
+    print(f"  [{'PASS' if ok else 'FAIL'}] normalize_phone({raw!r}) -> {got!r}")
+
+# National numbers are accepted only with a default region, and only with phonenumbers installed
+os.environ["PHONE_DEFAULT_REGION"] = "US"
+if utils.phonenumbers is None:
+    got = to_e164("(202) 555-0143")
+    ok = got is None
+    all_pass = all_pass and ok
+    print(f"  [{'PASS' if ok else 'FAIL'}] PHONE_DEFAULT_REGION=US without phonenumbers: '(202) 555-0143' -> {got!r}")
+    try:
+        utils.check_phone_config()
+        ok = False
+    except RuntimeError:
+        ok = True
+    all_pass = all_pass and ok
+    print(f"  [{'PASS' if ok else 'FAIL'}] check_phone_config() raises for PHONE_DEFAULT_REGION=US without phonenumbers")
+else:
+    for raw, expected in [("(202) 555-0143", "+12025550143"), ("555-0143", None), ("+44 20 7946 0958", "+442079460958")]:
+        got = to_e164(raw)
+        ok = got == expected
+        all_pass = all_pass and ok
+        print(f"  [{'PASS' if ok else 'FAIL'}] PHONE_DEFAULT_REGION=US: {raw!r} -> {got!r}")
+os.environ.pop("PHONE_DEFAULT_REGION", None)
+
+print()
+print("ALL PASS" if all_pass else "SOME FAILED")
+sys.exit(0 if all_pass else 1)
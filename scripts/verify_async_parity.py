@@ -0,0 +1,190 @@
+"""
+Parity check: the sync DBHandler and the asyncio AsyncDBHandler must return identical results.
+
+Always runs against a throwaway SQLite file. Set PARITY_DATABASE_URL to a (local) Postgres
+database to run the same cases there as well; it creates and drops its own table.
+
+    pip install -r requirements-async.txt
+    python scripts/verify_async_parity.py
+    PARITY_DATABASE_URL=postgresql://localhost/coachlink_test python scripts/verify_async_parity.py
+"""
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import DBHandler
+from async_database import AsyncDBHandler, aiosqlite, asyncpg
+
+TABLE = "parity_check"
+
+
+def _plain(rows):
+    if rows is None:
+        return None
+    if isinstance(rows, list):
+        return [dict(r) for r in rows]
+    return dict(rows)
+
+
+class ParityCases:
+    """Mixed into one TestCase per backend; subclasses provide env."""
+    env = {}
+
+    @classmethod
+    def setUpClass(cls):
+        # Both handlers read SQLITE_DB_PATH lazily, so the environment stays patched for the whole class
+        cls._env_patch = patch.dict(os.environ, cls.env)
+        cls._env_patch.start()
+        if "DATABASE_URL" not in cls.env:
+            os.environ.pop("DATABASE_URL", None)
+        cls.sync_db, cls.async_db = DBHandler(), AsyncDBHandler()
+        cls.loop = asyncio.new_event_loop()
+        pk = "SERIAL PRIMARY KEY" if cls.sync_db.is_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+        cls.sync_db.execute_query(f"DROP TABLE IF EXISTS {TABLE}", commit=True)
+        cls.sync_db.execute_query(
+            f"CREATE TABLE {TABLE} (id {pk}, name TEXT NOT NULL, score INTEGER, note TEXT)", commit=True
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sync_db.execute_query(f"DROP TABLE IF EXISTS {TABLE}", commit=True)
+        cls.loop.run_until_complete(cls.async_db.close())
+        cls.loop.close()
+        cls._env_patch.stop()
+
+    def setUp(self):
+        self.sync_db.execute_query(f"DELETE FROM {TABLE}", commit=True)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def both(self, query, params=(), **kwargs):
+        sync_result = _plain(self.sync_db.execute_query(query, params, **kwargs))
+        async_result = self.run_async(self.async_db.execute_query(query, params, **kwargs))
+        return sync_result, async_result
+
+    def test_write_sync_read_async(self):
+        self.sync_db.execute_query(f"INSERT INTO {TABLE} (name, score) VALUES (?, ?)", ("a", 1), commit=True)
+        sync_rows, async_rows = self.both(f"SELECT name, score, note FROM {TABLE} ORDER BY id", fetch_all=True)
+        self.assertEqual(sync_rows, [{"name": "a", "score": 1, "note": None}])
+        self.assertEqual(sync_rows, async_rows)
+
+    def test_write_async_read_sync(self):
+        self.run_async(self.async_db.execute_query(
+            f"INSERT INTO {TABLE} (name, score, note) VALUES (?, ?, ?)", ("b", 2, "x"), commit=True
+        ))
+        sync_row, async_row = self.both(f"SELECT name, score, note FROM {TABLE} WHERE name = ?", ("b",), fetch_one=True)
+        self.assertEqual(sync_row, {"name": "b", "score": 2, "note": "x"})
+        self.assertEqual(sync_row, async_row)
+
+    def test_fetch_one_missing_is_none(self):
+        self.assertEqual(self.both(f"SELECT * FROM {TABLE} WHERE id = ?", (-1,), fetch_one=True), (None, None))
+        self.assertEqual(self.both(f"SELECT * FROM {TABLE} WHERE id = ?", (-1,), fetch_all=True), ([], []))
+
+    def test_executemany(self):
+        rows = [(f"n{i}", i) for i in range(20)]
+        self.run_async(self.async_db.executemany(f"INSERT INTO {TABLE} (name, score) VALUES (?, ?)", rows, commit=True))
+        sync_agg, async_agg = self.both(f"SELECT COUNT(*) AS n, SUM(score) AS total FROM {TABLE}", fetch_one=True)
+        self.assertEqual(sync_agg, {"n": 20, "total": sum(range(20))})
+        self.assertEqual(sync_agg, async_agg)
+
+    def test_returning(self):
+        sync_row = _plain(self.sync_db.execute_query(
+            f"INSERT INTO {TABLE} (name, score) VALUES (?, ?) RETURNING name, score", ("r1", 5), fetch_one=True, commit=True
+        ))
+        async_row = self.run_async(self.async_db.execute_query(
+            f"INSERT INTO {TABLE} (name, score) VALUES (?, ?) RETURNING name, score", ("r1", 5), fetch_one=True, commit=True
+        ))
+        self.assertEqual(sync_row, {"name": "r1", "score": 5})
+        self.assertEqual(sync_row, async_row)
+
+    def test_transaction_rollback_and_savepoint(self):
+        async def work():
+            async with self.async_db.transaction():
+                await self.async_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("outer",), commit=True)
+                try:
+                    async with self.async_db.transaction():
+                        await self.async_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("inner",), commit=True)
+                        raise ValueError("roll back inner")
+                except ValueError:
+                    pass
+            try:
+                async with self.async_db.transaction():
+                    await self.async_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("discarded",), commit=True)
+                    raise ValueError("roll back all")
+            except ValueError:
+                pass
+
+        def sync_work():
+            with self.sync_db.transaction():
+                self.sync_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("outer",), commit=True)
+                try:
+                    with self.sync_db.transaction():
+                        self.sync_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("inner",), commit=True)
+                        raise ValueError("roll back inner")
+                except ValueError:
+                    pass
+            try:
+                with self.sync_db.transaction():
+                    self.sync_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("discarded",), commit=True)
+                    raise ValueError("roll back all")
+            except ValueError:
+                pass
+
+        query = f"SELECT name FROM {TABLE} ORDER BY id"
+        self.run_async(work())
+        async_names = self.run_async(self.async_db.execute_query(query, fetch_all=True))
+        self.sync_db.execute_query(f"DELETE FROM {TABLE}", commit=True)
+        sync_work()
+        sync_names = _plain(self.sync_db.execute_query(query, fetch_all=True))
+        self.assertEqual(async_names, [{"name": "outer"}])
+        self.assertEqual(sync_names, async_names)
+
+    def test_write_without_commit_is_discarded(self):
+        self.run_async(self.async_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("async",)))
+        self.run_async(self.async_db.executemany(f"INSERT INTO {TABLE} (name) VALUES (?)", [("async_many",)]))
+        self.sync_db.execute_query(f"INSERT INTO {TABLE} (name) VALUES (?)", ("sync",))
+        self.sync_db.executemany(f"INSERT INTO {TABLE} (name) VALUES (?)", [("sync_many",)])
+        sync_agg, async_agg = self.both(f"SELECT COUNT(*) AS n FROM {TABLE}", fetch_one=True)
+        self.assertEqual(sync_agg, {"n": 0})
+        self.assertEqual(sync_agg, async_agg)
+
+    def test_concurrent_tasks(self):
+        async def insert_many():
+            await asyncio.gather(*[
+                self.async_db.execute_query(f"INSERT INTO {TABLE} (name, score) VALUES (?, ?)", (f"c{i}", i), commit=True)
+                for i in range(25)
+            ])
+        self.run_async(insert_many())
+        sync_agg, async_agg = self.both(f"SELECT COUNT(*) AS n FROM {TABLE}", fetch_one=True)
+        self.assertEqual(sync_agg, {"n": 25})
+        self.assertEqual(sync_agg, async_agg)
+
+
+@unittest.skipIf(aiosqlite is None, "aiosqlite not installed")
+class SQLiteParity(ParityCases, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.env = {"SQLITE_DB_PATH": os.path.join(cls._tmp.name, "parity.db")}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._tmp.cleanup()
+
+
+@unittest.skipUnless(os.getenv("PARITY_DATABASE_URL") and asyncpg, "PARITY_DATABASE_URL not set / asyncpg not installed")
+class PostgresParity(ParityCases, unittest.TestCase):
+    env = {"DATABASE_URL": os.getenv("PARITY_DATABASE_URL", "")}
+
+
+if __name__ == '__main__':
+    unittest.main()
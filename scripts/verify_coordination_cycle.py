@@ -20,6 +20,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services import meeting_service, whatsapp_service, ai_service, hubspot_service, aux_service
 from database import db
+import repositories
 
 class TestCoordinationCycle(unittest.TestCase):
     
@@ -29,7 +30,7 @@ class TestCoordinationCycle(unittest.TestCase):
         os.environ["DATABASE_URL"] = ":memory:"
         db.init_db()
         # Ensure test user exists
-        db.execute_query("INSERT INTO users (email, phone, name, timezone) VALUES ('test@example.com', '+1234567890', 'Test Sp', 'Asia/Kolkata')", commit=True)
+        repositories.save_user("test@example.com", "Test Sp", "+1234567890", timezone="Asia/Kolkata")
 
     @patch('services.ai_service.generate_coaching_plan')
     @patch('services.whatsapp_service.send_whatsapp_message')
@@ -0,0 +1,128 @@
+"""
+Due queue cross-process test.
+The scheduler's due-time heap lives in the leader / worker process, while Outlook webhooks are handled
+by the web process. This runs each webhook in a separate Python process against a throwaway SQLite
+database and checks that the scheduler process picks up new and rescheduled meetings on its next
+tick (no full resync), including a row whose id is lower than one already seen (ids can commit out
+of order on Postgres).
+
+    python scripts/verify_due_queue_cross_process.py
+"""
+import os, sys, json, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_webhook(payload):
+    """Child process: handles one Outlook webhook, with HubSpot / AI stubbed out."""
+    from unittest.mock import patch
+    from services import meeting_service, hubspot_service, ai_service
+    with patch.object(hubspot_service, "create_or_find_contact", return_value=None), \
+         patch.object(ai_service, "generate_coaching_plan", return_value={"greeting": "hi", "steps": []}):
+        print(json.dumps(meeting_service.process_outlook_webhook(payload)))
+
+
+def run_insert(meeting_id, end_iso):
+    """Child process: inserts a meeting with an explicit (lower) id, like a SERIAL id that commits late."""
+    from database import db
+    from utils import parse_iso_datetime
+    end_dt = parse_iso_datetime(end_iso)
+    db.execute_query(
+        "INSERT INTO meetings (id, outlook_event_id, status, salesperson_phone, title, end_at, survey_status) "
+        "VALUES (?, ?, 'scheduled', '+15550001', 'late commit', ?, 'pending')",
+        (meeting_id, f"evt-{meeting_id}", db.to_db_timestamp(end_dt)), commit=True
+    )
+
+
+def in_child(env, *args):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), *args], env=env, cwd=ROOT,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"child process failed: {result.stderr[-2000:]}")
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="due-queue-")
+    os.environ["SQLITE_DB_PATH"] = os.path.join(tmp, "due.db")
+    os.environ.pop("DATABASE_URL", None)
+    # A full resync would hide a missing refresh: push it out of the test's reach
+    os.environ["DUE_QUEUE_RESYNC_SECONDS"] = "86400"
+    env = dict(os.environ)
+
+    from datetime import timedelta
+    from database import db
+    db.init_db()
+    import repositories
+    from due_queue import DueQueue
+    from utils import get_current_utc_time
+
+    print("=" * 65)
+    print("DUE QUEUE CROSS-PROCESS TEST: webhook and scheduler in different processes")
+    print("=" * 65)
+
+    repositories.save_user("sp@example.com", "SP", "+15550001", timezone="UTC")
+    queue = DueQueue()
+    queue.sync()
+    resynced_at = queue._resynced_at
+    now = get_current_utc_time()
+
+    def webhook(event_id, start, end):
+        in_child(env, "--webhook", json.dumps({
+            "meeting": {"id": event_id, "title": f"Call {event_id}", "organizer": {"address": "sp@example.com"},
+                        "start_time": start.isoformat(), "end_time": end.isoformat()},
+            "client": {"name": "Client", "email": f"{event_id}@example.com"},
+        }))
+
+    def meeting_id(event_id):
+        return db.execute_query("SELECT id FROM meetings WHERE outlook_event_id = ?", (event_id,), fetch_one=True)["id"]
+
+    checks = []
+
+    # 1. New meeting that has already ended: due on the scheduler's next tick
+    webhook("evt-new", now - timedelta(minutes=40), now - timedelta(minutes=5))
+    queue.sync()
+    checks.append(("new meeting from another process is due on the next tick",
+                   meeting_id("evt-new") in queue.pop_due(now.timestamp())))
+
+    # 2. Meeting moved earlier by a second webhook: due without waiting for the old end time
+    webhook("evt-moved", now + timedelta(hours=2), now + timedelta(hours=3))
+    queue.sync()
+    checks.append(("future meeting is not due yet", not queue.pop_due(now.timestamp())))
+    webhook("evt-moved", now - timedelta(minutes=40), now - timedelta(minutes=5))
+    queue.sync()
+    checks.append(("meeting rescheduled earlier in another process is due on the next tick",
+                   meeting_id("evt-moved") in queue.pop_due(now.timestamp())))
+
+    # 3. A lower id committed after a higher one was already read
+    in_child(env, "--insert", "1000", (now - timedelta(minutes=5)).isoformat())
+    queue.sync()
+    checks.append(("high id picked up", 1000 in queue.pop_due(now.timestamp())))
+    in_child(env, "--insert", "500", (now - timedelta(minutes=5)).isoformat())
+    queue.sync()
+    checks.append(("lower id committed later is not skipped", 500 in queue.pop_due(now.timestamp())))
+
+    # 4. Re-reading the overlap window must not undo the scheduler's retry delay
+    queue.schedule(500, now.timestamp() + 60)
+    queue.sync()
+    checks.append(("retry delay kept across refreshes", 500 not in queue.pop_due(now.timestamp())))
+
+    checks.append(("no full resync was needed", queue._resynced_at == resynced_at))
+
+    all_pass = True
+    for name, ok in checks:
+        all_pass = all_pass and ok
+        print(f"  [{'PASS' if ok else 'FAIL'}] {name}")
+
+    print()
+    print("ALL PASS" if all_pass else "SOME FAILED")
+    return 0 if all_pass else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--webhook":
+        run_webhook(json.loads(sys.argv[2]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--insert":
+        run_insert(int(sys.argv[2]), sys.argv[3])
+    else:
+        sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Spool replay test.
+Replays a spooled Outlook webhook against a throwaway SQLite database and checks that no HubSpot,
+AI or Aux call runs inside a database transaction: the replay only writes the meeting, and the
+coaching WhatsApp / HubSpot enrichment follow from the outbox.
+"""
+import os, sys, tempfile
+_tmp = tempfile.mkdtemp(prefix="spool-replay-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "replay.db")
+os.environ["SPOOL_ENABLED"] = "true"
+os.environ["SPOOL_DIR"] = os.path.join(_tmp, "spool")
+os.environ.pop("DATABASE_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import timedelta
+from unittest.mock import patch
+from database import db
+db.init_db()
+from services import meeting_service, whatsapp_service, hubspot_service, ai_service, aux_service
+from spool import spool
+from outbox import outbox
+from utils import get_current_utc_time
+import repositories
+
+print("=" * 65)
+print("SPOOL REPLAY TEST: no external call inside the replay transaction")
+print("=" * 65)
+
+in_tx_calls = []
+
+def _external(name, result):
+    def call(*args, **kwargs):
+        if db._current_tx() is not None:
+            in_tx_calls.append(name)
+        return result
+    return call
+
+sent = []
+now = get_current_utc_time()
+with patch.object(whatsapp_service, "send_whatsapp_message", side_effect=lambda *a, **k: sent.append(a) or "SID"), \
+     patch.object(ai_service, "generate_coaching_plan", side_effect=_external("ai", {"greeting": "hi", "steps": ["a"]})), \
+     patch.object(hubspot_service, "create_or_find_contact", side_effect=_external("hubspot", "HS1")), \
+     patch.object(hubspot_service, "get_contact_details", side_effect=_external("hubspot", {"company": "Acme"})), \
+     patch.object(aux_service, "schedule_meeting", side_effect=_external("aux", {"meetingId": 7, "token": "tok"})):
+    repositories.save_user("sp@example.com", "SP", "+15550001", timezone="UTC")
+    spool.append("outlook_webhook", {
+        "meeting": {"id": "evt-spooled", "title": "Spooled call", "organizer": {"address": "sp@example.com"},
+                    "start_time": (now + timedelta(hours=2)).isoformat(), "online_meeting_url": "https://zoom.us/j/1"},
+        "client": {"name": "Client", "email": "client@example.com"},
+    })
+
+    checks = []
+    checks.append(("replayed once", spool.drain() == 1 and spool.drain() == 0))
+    meeting = db.execute_query("SELECT status, client_id FROM meetings WHERE outlook_event_id = ?", ("evt-spooled",), fetch_one=True)
+    checks.append(("meeting written by the replay", meeting is not None and meeting["status"] == "scheduled"))
+    checks.append(("no WhatsApp before the outbox runs", not sent))
+    outbox.drain()
+    outbox.drain()
+    client = db.execute_query("SELECT hubspot_contact_id, company FROM clients WHERE email = ?", ("client@example.com",), fetch_one=True)
+    checks.append(("HubSpot enrichment saved by the outbox job", client is not None and client["hubspot_contact_id"] == "HS1"))
+    checks.append(("coaching WhatsApp sent once", len(sent) == 1))
+    checks.append((f"no external call inside a transaction {in_tx_calls}", not in_tx_calls))
+
+all_pass = True
+for name, ok in checks:
+    all_pass = all_pass and ok
+    print(f"  [{'PASS' if ok else 'FAIL'}] {name}")
+
+print()
+print("ALL PASS" if all_pass else "SOME FAILED")
+sys.exit(0 if all_pass else 1)
@@ -3,10 +3,28 @@ import logging
 import os
 import traceback
 import json
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 
 AUX_BASE_URL = os.getenv("AUX_BASE_URL", "https://coachlink360.aux-rolplay.com/api")
 AUX_FALLBACK_URL = os.getenv("AUX_FALLBACK_URL")
 
+# The scheduler polls meetings in parallel; cap in-flight requests per host so a tick can't flood Aux
+AUX_MAX_PER_HOST = max(int(os.getenv("AUX_MAX_PER_HOST", "4")), 1)
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+@contextmanager
+def _host_slot(url):
+    host = urlsplit(url).netloc
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(AUX_MAX_PER_HOST)
+    with slot:
+        yield
+
 def schedule_meeting(meeting_link, scheduled_time, title, attendee_name="Rolplay (AI Coach)"):
     """
     Schedules a meeting with the Aux API for transcript capture.
@@ -34,7 +52,8 @@ def schedule_meeting(meeting_link, scheduled_time, title, attendee_name="Rolplay
         logging.info("=" * 60)
         logging.info(f"[AUX API] Attempting schedule at: {url}")
         try:
-            response = requests.post(url, json=payload, timeout=15)
+            with _host_slot(url):
+                response = requests.post(url, json=payload, timeout=15)
             logging.info(f"[AUX API] Response Status: {response.status_code}")
             
             if response.status_code == 200:
@@ -65,7 +84,8 @@ def get_meeting_status(token):
     logging.info(f"[AUX API] URL: {url}")
     
     try:
-        response = requests.get(url, timeout=10)
+        with _host_slot(url):
+            response = requests.get(url, timeout=10)
         logging.info(f"[AUX API] Status check response code: {response.status_code}")
         
         response.raise_for_status()
@@ -111,7 +131,8 @@ def get_meeting_transcript(meeting_no):
     for url in urls:
         try:
             logging.info(f"[AUX API] Fetching transcript from: {url}")
-            response = requests.get(url, timeout=12)
+            with _host_slot(url):
+                response = requests.get(url, timeout=12)
             logging.info(f"[AUX API] Transcript response code: {response.status_code}")
 
             if response.status_code == 404:
@@ -157,7 +178,8 @@ def trigger_survey_webhook(meeting_data):
     logging.info(f"[SURVEY WEBHOOK] Payload: {meeting_data}")
     
     try:
-        response = requests.post(url, json=meeting_data, timeout=10)
+        with _host_slot(url):
+            response = requests.post(url, json=meeting_data, timeout=10)
         logging.info(f"[SURVEY WEBHOOK] Response status: {response.status_code}")
         response.raise_for_status()
         result = response.json()
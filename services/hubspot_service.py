@@ -7,6 +7,7 @@ from hubspot.crm.objects import SimplePublicObjectInputForCreate
 from hubspot.crm.contacts import PublicObjectSearchRequest
 
 from database import db
+from outbox import outbox
 
 ACCESS_TOKEN = os.getenv("HUBSPOT_ACCESS_TOKEN")
 
@@ -229,7 +230,8 @@ def sync_note_to_contact(client_db_id: int, note_body: str):
         # Try Note first
         success = _create_note(hs_id, note_body)
         if not success:
-            _create_ticket(hs_id, subject, note_body, priority="LOW")
+            return _create_ticket(hs_id, subject, note_body, priority="LOW")
+        return True
 
 def sync_meeting_analysis(client_db_id: int, meeting_title: str, analysis: dict, transcript_url: str):
     """
@@ -339,3 +341,31 @@ def sync_meeting_summary(client_db_id: int, meeting_title: str, start_time: str,
             return _create_ticket(hs_id, subject, content, priority="LOW")
         return True
 
+# --- Outbox ---
+# The sync_* functions return True when synced, False when the HubSpot calls failed (retried) and
+# None when there is nothing to sync (client or contact not found).
+SYNC_FUNCTIONS = {
+    fn.__name__: fn
+    for fn in (sync_survey_response_to_contact, sync_note_to_contact, sync_meeting_analysis, sync_meeting_summary)
+}
+
+def queue_sync(fn_name: str, key: str = None, **kwargs):
+    """
+    Queues SYNC_FUNCTIONS[fn_name](**kwargs) in the outbox, in the caller's db.transaction() if one is open.
+    """
+    if fn_name not in SYNC_FUNCTIONS:
+        raise ValueError(f"Unknown HubSpot sync {fn_name!r}")
+    return outbox.enqueue(f"hubspot.{fn_name}", kwargs, key=key)
+
+def _outbox_handler(fn):
+    def handle(payload):
+        if not ACCESS_TOKEN:
+            # Same as the inline calls did: nothing to sync to
+            logging.warning(f"HubSpot not configured, skipping {fn.__name__}")
+            return
+        if fn(**payload) is False:
+            raise RuntimeError(f"HubSpot {fn.__name__} failed")
+    return handle
+
+for _name, _fn in SYNC_FUNCTIONS.items():
+    outbox.register_handler(f"hubspot.{_name}", _outbox_handler(_fn))
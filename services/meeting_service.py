@@ -1,9 +1,15 @@
 import logging
 import os
 import json
+import uuid
 from datetime import datetime, timedelta
 from database import db
-from utils import normalize_phone, parse_iso_datetime, to_local_time, get_current_utc_time
+import repositories
+import retention
+from spool import spool
+from due_queue import due_queue
+from outbox import outbox, PermanentError
+from utils import normalize_phone, to_e164, parse_iso_datetime, to_local_time, get_current_utc_time
 from services import ai_service, whatsapp_service, hubspot_service, transcript_service, aux_service
 
 # Constants
@@ -182,10 +188,74 @@ def extract_aux_transcript_content(aux_data):
 
     return ""
 
-def process_outlook_webhook(data: dict) -> dict:
+def _hubspot_enrichment(c_email, c_name, c_phone):
+    """HubSpot find-or-create plus contact details: (contact_id, phone, company, AI context). Never raises."""
+    hs_contact_id = hs_phone = hs_comp = None
+    hs_context_str = ""
+    try:
+        hs_contact_id = hubspot_service.create_or_find_contact(c_email, c_name, c_phone or "")
+        if hs_contact_id:
+            hs_details = hubspot_service.get_contact_details(hs_contact_id)
+            if hs_details:
+                hs_phone = hs_details.get("mobilephone") or hs_details.get("phone")
+                hs_comp = hs_details.get("company")
+
+                hs_context_str = "\n\n[HubSpot context]\n"
+                for k in ['jobtitle', 'company', 'industry', 'lifecyclestage']:
+                    if hs_details.get(k): hs_context_str += f"{k.capitalize()}: {hs_details.get(k)}\n"
+    except Exception as e:
+        logging.error(f"HubSpot Enrichment Error: {e}")
+    return hs_contact_id, hs_phone, hs_comp, hs_context_str
+
+def _save_hubspot_enrichment(client_id, hs_contact_id, hs_phone, hs_comp):
+    """Writes the HubSpot id back and fills the client's missing phone/company (joins the open transaction)."""
+    if hs_contact_id:
+        db.execute_query("UPDATE clients SET hubspot_contact_id = ? WHERE id = ?", (hs_contact_id, client_id), commit=True)
+    if hs_phone or hs_comp:
+        db.execute_query("UPDATE clients SET phone=COALESCE(phone, ?), company=COALESCE(company, ?) WHERE id=?", (hs_phone, hs_comp, client_id), commit=True)
+
+def _coaching_message(mtg_title, c_name, c_company, display_time, meeting_body, location_str):
+    """AI pre-meeting coaching as (WhatsApp body, template vars), or None if the AI call failed."""
+    try:
+        logging.info(f"[OUTLOOK WEBHOOK] Generating AI coaching for '{mtg_title}'...")
+        coaching = ai_service.generate_coaching_plan(
+            meeting_title=mtg_title,
+            client_name=c_name,
+            client_company=c_company or "Prospect",
+            start_time=display_time,
+            meeting_body=meeting_body,
+            location=location_str
+        )
+        logging.info(f"[OUTLOOK WEBHOOK] AI Coaching Result: {coaching}")
+        
+        msg_body = (
+            f"*New Meeting: {mtg_title}*\n"
+            f"{coaching.get('greeting')}\n\n"
+            f"*Scenario*: {coaching.get('scenario')}\n\n"
+            f"*Prep Steps*:\n" + "\n".join(f"- {s}" for s in coaching.get("steps", [])) + "\n\n"
+            f"*Reply*: {coaching.get('recommended_reply')}"
+        )
+
+        template_vars = {
+            "1": f"*{mtg_title}*",
+            "2": f"{coaching.get('greeting')}\n\nScenario: {coaching.get('scenario')}",
+            "3": f"*Steps*:\n" + "\n".join(f"- {s}" for s in coaching.get("steps", []))[:200],
+            "4": f"Reply: {coaching.get('recommended_reply')}"
+        }
+        
+        return (msg_body, template_vars)
+    except Exception as e:
+        logging.error(f"[OUTLOOK WEBHOOK] AI Coaching failed: {e}")
+        return None
+
+def process_outlook_webhook(data: dict, defer_external: bool = False) -> dict:
     """
     Main entry point for processing webhook data from Make.com.
-    Orchestrates: Parser -> DB -> AI -> WhatsApp -> Background Sync (Aux/Bot).
+    Orchestrates: Parser -> HubSpot/AI -> DB -> WhatsApp -> Background Sync (Aux/Bot).
+    The HubSpot and AI calls run first, outside any transaction; the client row, the meeting row and
+    the outbox jobs for the coaching WhatsApp and the bot scheduling are then committed together.
+    defer_external=True (spool replay) makes no external calls at all: HubSpot enrichment and the
+    coaching WhatsApp go to the outbox as an ai.pre_meeting_coaching job committed with the meeting.
     """
     logging.info("=" * 60)
     logging.info("[OUTLOOK WEBHOOK] Received new webhook")
@@ -200,7 +270,6 @@ def process_outlook_webhook(data: dict) -> dict:
     # 1.5 Extract Meeting ID early for deduplication
     mtg_id = _get_val(meeting_raw, ["meeting_id", "id", "eventId", "outlook_id"])
     if not mtg_id:
-        import uuid
         mtg_id = f"gen_{str(uuid.uuid4())[:8]}"
         logging.warning(f"[OUTLOOK WEBHOOK] No meeting ID found, generated fallback: {mtg_id}")
     else:
@@ -231,7 +300,7 @@ def process_outlook_webhook(data: dict) -> dict:
     logging.info(f"[OUTLOOK WEBHOOK] Extracted Organizer Email: {org_email}")
 
     # 3. Identify Salesperson (User)
-    user = db.execute_query("SELECT phone, timezone FROM users WHERE email = ?", (org_email,), fetch_one=True)
+    user = db.execute_query("SELECT phone, timezone FROM users WHERE email = ?", (org_email,), fetch_one=True, prepare=True)
     if not user:
         registered_users = [r['email'] for r in db.execute_query('SELECT email FROM users', fetch_all=True)]
         logging.warning(f"[OUTLOOK WEBHOOK] Organizer {org_email} not registered. Registered: {registered_users}")
@@ -253,47 +322,18 @@ def process_outlook_webhook(data: dict) -> dict:
     c_phone = _get_val(client_raw, ["phone", "phoneNumber", "mobilePhone"])
     c_company = _get_val(client_raw, ["company", "companyName", "organization"])
     
-    # 5. DB & HubSpot Sync (Pre-Coaching)
-    client_id = None
-    hs_context_str = ""
-    if c_email:
-        c_exist = db.execute_query("SELECT id, phone, company FROM clients WHERE email = ?", (c_email,), fetch_one=True)
-        if c_exist:
-            client_id = c_exist['id']
-            # Only overwrite if we have fresh data
-            update_fields = []
-            update_vals = []
-            if c_name: update_fields.append("name=?"); update_vals.append(c_name)
-            if c_phone: update_fields.append("phone=?"); update_vals.append(c_phone)
-            if c_company: update_fields.append("company=?"); update_vals.append(c_company)
-            if update_fields:
-                db.execute_query(f"UPDATE clients SET {', '.join(update_fields)} WHERE id=?", (*update_vals, client_id), commit=True)
-        else:
-            db.execute_query("INSERT INTO clients (email, name, phone, company) VALUES (?, ?, ?, ?)", (c_email, c_name, c_phone, c_company), commit=True)
-            res = db.execute_query("SELECT id FROM clients WHERE email = ?", (c_email,), fetch_one=True)
-            client_id = res['id']
+    # Only overwrite existing fields if we have fresh data (written in step 8)
+    client_fields = {"email": c_email, "name": c_name or None, "phone": c_phone or None, "company": c_company or None}
 
-        # Reverse Sync from HubSpot if data is still missing
-        try:
-            hubspot_service = __import__('services.hubspot_service', fromlist=['create_or_find_contact', 'get_contact_details'])
-            hs_contact_id = hubspot_service.create_or_find_contact(c_email, c_name, c_phone or "")
-            if hs_contact_id:
-                db.execute_query("UPDATE clients SET hubspot_contact_id = ? WHERE id = ?", (hs_contact_id, client_id), commit=True)
-                hs_details = hubspot_service.get_contact_details(hs_contact_id)
-                if hs_details:
-                    # Sync back missing phone/company to DB
-                    hs_phone = hs_details.get("mobilephone") or hs_details.get("phone")
-                    hs_comp = hs_details.get("company")
-                    if hs_phone or hs_comp:
-                        db.execute_query("UPDATE clients SET phone=COALESCE(phone, ?), company=COALESCE(company, ?) WHERE id=?", (hs_phone, hs_comp, client_id), commit=True)
-                        if hs_phone: c_phone = hs_phone
-                        if hs_comp: c_company = hs_comp
-
-                    hs_context_str = "\n\n[HubSpot context]\n"
-                    for k in ['jobtitle', 'company', 'industry', 'lifecyclestage']:
-                        if hs_details.get(k): hs_context_str += f"{k.capitalize()}: {hs_details.get(k)}\n"
-        except Exception as e:
-            logging.error(f"HubSpot Enrichment Error: {e}")
+    # 5. HubSpot Sync (Pre-Coaching)
+    # Runs before the unit of work opens: no connection or write lock is held while HubSpot answers.
+    hs_contact_id = hs_phone = hs_comp = None
+    hs_context_str = ""
+    if c_email and not defer_external:
+        # Reverse Sync from HubSpot if data is still missing (written back in step 8)
+        hs_contact_id, hs_phone, hs_comp, hs_context_str = _hubspot_enrichment(c_email, c_name, c_phone)
+        if hs_phone: c_phone = hs_phone
+        if hs_comp: c_company = hs_comp
 
     logging.info(f"[OUTLOOK WEBHOOK] Prepared Client: {c_name} | Phone: {c_phone} | Company: {c_company}")
 
@@ -349,29 +389,21 @@ def process_outlook_webhook(data: dict) -> dict:
     # Secondary dedupe for unstable/missing event IDs:
     # treat same salesperson+title+time window as the same meeting.
     if not is_retry:
-        similar_meetings = db.execute_query(
-            "SELECT id, outlook_event_id, aux_meeting_token, status, start_time FROM meetings WHERE salesperson_phone = ? AND title = ? ORDER BY id DESC LIMIT 15",
-            (sp_phone, mtg_title),
-            fetch_all=True
-        ) or []
-        for cand in similar_meetings:
-            cand_start = cand.get("start_time") if isinstance(cand, dict) else None
-            if not cand_start:
-                continue
-            try:
-                cand_dt = parse_iso_datetime(cand_start)
-                if abs(cand_dt - start_dt) <= timedelta(minutes=5):
-                    existing_mtg = cand
-                    is_retry = True
-                    if (not mtg_id or str(mtg_id).startswith("gen_")) and cand.get("outlook_event_id"):
-                        mtg_id = cand.get("outlook_event_id")
-                    logging.info(
-                        f"[OUTLOOK WEBHOOK] Secondary dedupe matched existing meeting {cand.get('id')} "
-                        f"(status: {cand.get('status')}). Treating as retry."
-                    )
-                    break
-            except Exception:
-                continue
+        cand = db.execute_query(
+            "SELECT id, outlook_event_id, aux_meeting_token, status FROM meetings WHERE salesperson_phone = ? AND title = ? AND start_at BETWEEN ? AND ? ORDER BY id DESC LIMIT 1",
+            (sp_phone, mtg_title, db.to_db_timestamp(start_dt - timedelta(minutes=5)), db.to_db_timestamp(start_dt + timedelta(minutes=5))),
+            fetch_one=True
+        )
+        if cand:
+            cand = dict(cand)
+            existing_mtg = cand
+            is_retry = True
+            if (not mtg_id or str(mtg_id).startswith("gen_")) and cand.get("outlook_event_id"):
+                mtg_id = cand.get("outlook_event_id")
+            logging.info(
+                f"[OUTLOOK WEBHOOK] Secondary dedupe matched existing meeting {cand.get('id')} "
+                f"(status: {cand.get('status')}). Treating as retry."
+            )
 
     # 7. SEND COACHING (Priority)
     # Avoid duplicate pre-meeting coaching on duplicate webhooks/retries.
@@ -380,60 +412,15 @@ def process_outlook_webhook(data: dict) -> dict:
     allow_retry_coaching = str(os.getenv("ALLOW_PRE_COACHING_RETRY", "false")).strip().lower() in {"1", "true", "yes", "on"}
     should_send_pre_coaching = (not is_retry) or allow_retry_coaching
 
-    if should_send_pre_coaching:
-        try:
-            logging.info(f"[OUTLOOK WEBHOOK] Generating AI coaching for '{mtg_title}'...")
-            coaching = ai_service.generate_coaching_plan(
-                meeting_title=mtg_title,
-                client_name=c_name,
-                client_company=c_company or "Prospect",
-                start_time=display_time,
-                meeting_body=meeting_body,
-                location=location_str
-            )
-            logging.info(f"[OUTLOOK WEBHOOK] AI Coaching Result: {coaching}")
-            
-            msg_body = (
-                f"*New Meeting: {mtg_title}*\n"
-                f"{coaching.get('greeting')}\n\n"
-                f"*Scenario*: {coaching.get('scenario')}\n\n"
-                f"*Prep Steps*:\n" + "\n".join(f"- {s}" for s in coaching.get("steps", [])) + "\n\n"
-                f"*Reply*: {coaching.get('recommended_reply')}"
-            )
-
-            template_vars = {
-                "1": f"*{mtg_title}*",
-                "2": f"{coaching.get('greeting')}\n\nScenario: {coaching.get('scenario')}",
-                "3": f"*Steps*:\n" + "\n".join(f"- {s}" for s in coaching.get("steps", []))[:200],
-                "4": f"Reply: {coaching.get('recommended_reply')}"
-            }
-            
-            logging.info(f"[OUTLOOK WEBHOOK] Sending WhatsApp to {sp_phone}...")
-            wa_sid = whatsapp_service.send_whatsapp_message(sp_phone, body=msg_body, use_template=True, template_vars=template_vars)
-            logging.info(f"[OUTLOOK WEBHOOK] WhatsApp SID: {wa_sid}")
-        except Exception as e:
-            logging.error(f"[OUTLOOK WEBHOOK] AI Coaching/WhatsApp failed: {e}")
-    else:
+    coaching_msg = None
+    if should_send_pre_coaching and not defer_external:
+        coaching_msg = _coaching_message(mtg_title, c_name, c_company, display_time, meeting_body, location_str)
+    elif not should_send_pre_coaching:
         logging.info(f"[OUTLOOK WEBHOOK] Retry detected for {mtg_id}. Skipping duplicate pre-meeting coaching.")
 
-    # 8. POST-COACHING TASKS (Save & Bot Join)
     end_str = _get_val(meeting_raw, ["end_time", "endDateTime", "end"])
     end_dt = parse_iso_datetime(end_str) if end_str else (start_dt + timedelta(minutes=30))
 
-    if is_retry:
-        logging.info(f"[OUTLOOK WEBHOOK] Updating existing meeting Record ID: {existing_mtg['id']}")
-        db.execute_query(
-            "UPDATE meetings SET start_time=?, end_time=?, client_id=?, location=?, title=?, attendees=?, summary=?, survey_status=COALESCE(survey_status, 'pending') WHERE outlook_event_id=?",
-            (start_dt, end_dt, client_id, location_str, mtg_title, json.dumps(attendee_objects), meeting_body[:4000], mtg_id), commit=True
-        )
-    else:
-        logging.info(f"[OUTLOOK WEBHOOK] Inserting new meeting: {mtg_id}")
-        db.execute_query(
-            "INSERT INTO meetings (outlook_event_id, start_time, end_time, client_id, status, salesperson_phone, location, title, attendees, summary, survey_status) VALUES (?, ?, ?, ?, 'scheduled', ?, ?, ?, ?, ?, 'pending')",
-            (mtg_id, start_dt, end_dt, client_id, sp_phone, location_str, mtg_title, json.dumps(attendee_objects), meeting_body[:4000]), commit=True
-        )
-
-    # 9. Bot Join Scheduling
     meeting_link = _get_val(meeting_raw, ["online_meeting_url", "join_url", "onlineMeetingUrl"])
     if not meeting_link:
         meeting_link = _extract_meeting_link(f"{location_str} {meeting_body}")
@@ -442,35 +429,138 @@ def process_outlook_webhook(data: dict) -> dict:
     allow_bot_reschedule = str(os.getenv("ALLOW_BOT_RESCHEDULE_ON_RETRY", "false")).strip().lower() in {"1", "true", "yes", "on"}
     should_schedule_bot = (not is_retry) or allow_bot_reschedule
 
-    if meeting_link and should_schedule_bot:
-        logging.info(f"[BOT SCHEDULING] Meeting Link found: {meeting_link}")
-        try:
+    # 8. SAVE (Client, Meeting, Coaching WhatsApp & Bot Join jobs)
+    # One short unit of work: every external call above has already returned.
+    with db.transaction():
+        client_id = None
+        if c_email:
+            res = db.upsert("clients", "email", client_fields, coalesce_cols=("name", "phone", "company"), returning="id")
+            client_id = res['id']
+            _save_hubspot_enrichment(client_id, hs_contact_id, hs_phone, hs_comp)
+
+        if defer_external and (c_email or should_send_pre_coaching):
+            logging.info(f"[OUTLOOK WEBHOOK] Deferring HubSpot enrichment / coaching for {mtg_id} to the outbox")
+            outbox.enqueue("ai.pre_meeting_coaching", {
+                "coaching_id": uuid.uuid4().hex,
+                "client_id": client_id,
+                "client_email": c_email,
+                "client_name": c_name,
+                "client_phone": c_phone,
+                "client_company": c_company,
+                "salesperson_phone": sp_phone,
+                "send_coaching": should_send_pre_coaching,
+                "title": mtg_title,
+                "display_time": display_time,
+                "meeting_body": meeting_body,
+                "location": location_str,
+            })
+
+        if coaching_msg:
+            logging.info(f"[OUTLOOK WEBHOOK] Queueing WhatsApp to {sp_phone}...")
+            # Sent by the outbox once this unit of work commits (savepoint: a failure here must not lose the meeting)
+            try:
+                with db.transaction():
+                    whatsapp_service.queue_whatsapp_message(sp_phone, body=coaching_msg[0], use_template=True, template_vars=coaching_msg[1])
+            except Exception as e:
+                logging.error(f"[OUTLOOK WEBHOOK] Coaching WhatsApp queueing failed: {e}")
+
+        if is_retry:
+            logging.info(f"[OUTLOOK WEBHOOK] Updating existing meeting Record ID: {existing_mtg['id']}")
+            db.execute_query(
+                "UPDATE meetings SET start_time=?, end_time=?, start_at=?, end_at=?, client_id=?, location=?, title=?, attendees=?, summary=?, survey_status=COALESCE(survey_status, 'pending') WHERE outlook_event_id=?",
+                (start_dt, end_dt, db.to_db_timestamp(start_dt), db.to_db_timestamp(end_dt), client_id, location_str, mtg_title, json.dumps(attendee_objects), meeting_body[:4000], mtg_id), commit=True
+            )
+        else:
+            logging.info(f"[OUTLOOK WEBHOOK] Inserting new meeting: {mtg_id}")
+            db.execute_query(
+                "INSERT INTO meetings (outlook_event_id, start_time, end_time, start_at, end_at, client_id, status, salesperson_phone, salesperson_phone_e164, location, title, attendees, summary, survey_status) VALUES (?, ?, ?, ?, ?, ?, 'scheduled', ?, ?, ?, ?, ?, ?, 'pending')",
+                (mtg_id, start_dt, end_dt, db.to_db_timestamp(start_dt), db.to_db_timestamp(end_dt), client_id, sp_phone, to_e164(sp_phone), location_str, mtg_title, json.dumps(attendee_objects), meeting_body[:4000]), commit=True
+            )
+
+        # 9. Bot Join Scheduling
+        if meeting_link and should_schedule_bot:
+            logging.info(f"[BOT SCHEDULING] Meeting Link found: {meeting_link}")
             # Standardize on UTC for AUX API to avoid offset confusion
             scheduled_time_utc = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            
-            logging.info(f"[BOT SCHEDULING] Attempting bot join for '{mtg_title}' at {scheduled_time_utc} (UTC)")
-            aux_res = aux_service.schedule_meeting(meeting_link, scheduled_time_utc, mtg_title, attendee_name="Rolplay (AI Coach)")
-            
-            if aux_res:
-                db.execute_query("UPDATE meetings SET aux_meeting_id=?, aux_meeting_token=?, location=? WHERE outlook_event_id=?", 
-                               (aux_res.get("meetingId"), aux_res.get("token"), meeting_link, mtg_id), commit=True)
-                logging.info(f"[BOT SCHEDULING] SUCCESS for {mtg_id}")
-            else:
-                logging.error(f"[BOT SCHEDULING] FAILED for {mtg_id}")
-        except Exception as e:
-            logging.error(f"[BOT SCHEDULING] EXCEPTION: {e}")
-    elif meeting_link and not should_schedule_bot:
-        logging.info(
-            f"[BOT SCHEDULING] Skipped duplicate scheduling for {mtg_id} "
-            f"(retry={is_retry}, existing_token={'yes' if existing_aux_token else 'no'}, allow_reschedule={allow_bot_reschedule})"
-        )
+            logging.info(f"[BOT SCHEDULING] Queueing bot join for '{mtg_title}' at {scheduled_time_utc} (UTC)")
+            # Committed with the meeting row; the outbox calls Aux and writes the token back (_schedule_bot)
+            outbox.enqueue("aux.schedule_meeting", {
+                "outlook_event_id": mtg_id,
+                "meeting_link": meeting_link,
+                "scheduled_time": scheduled_time_utc,
+                "title": mtg_title,
+            })
+        elif meeting_link and not should_schedule_bot:
+            logging.info(
+                f"[BOT SCHEDULING] Skipped duplicate scheduling for {mtg_id} "
+                f"(retry={is_retry}, existing_token={'yes' if existing_aux_token else 'no'}, allow_reschedule={allow_bot_reschedule})"
+            )
+        else:
+            logging.warning(f"[BOT SCHEDULING] SKIPPED - No link for {mtg_id}")
+
+    # After the commit, so the due queue's refresh can see the new row
+    if is_retry:
+        due_queue.notify(existing_mtg['id'], end_dt)
     else:
-        logging.warning(f"[BOT SCHEDULING] SKIPPED - No link for {mtg_id}")
+        due_queue.notify()
 
     logging.info("[OUTLOOK WEBHOOK] Processing completed successfully")
     logging.info("=" * 60)
     return {"status": "success"}
 
+def _replay_outlook_webhook(data):
+    """Spool replay: DB writes only (they share the replay transaction); external calls go to the outbox."""
+    return process_outlook_webhook(data, defer_external=True)
+
+# Replayed by the write spool when the webhook arrived during a database outage
+spool.register_handler("outlook_webhook", _replay_outlook_webhook)
+
+def _pre_meeting_coaching(payload):
+    """Outbox handler for ai.pre_meeting_coaching: the HubSpot / AI half of a replayed Outlook webhook."""
+    c_company = payload.get("client_company")
+    meeting_body = payload.get("meeting_body") or ""
+    hs_contact_id = hs_phone = hs_comp = None
+    if payload.get("client_email"):
+        hs_contact_id, hs_phone, hs_comp, hs_context_str = _hubspot_enrichment(
+            payload["client_email"], payload.get("client_name"), payload.get("client_phone")
+        )
+        c_company = hs_comp or c_company
+        meeting_body += hs_context_str
+
+    coaching_msg = None
+    if payload.get("send_coaching"):
+        coaching_msg = _coaching_message(payload["title"], payload.get("client_name"), c_company,
+                                         payload.get("display_time"), meeting_body, payload.get("location"))
+
+    # The key keeps a retry of this job from queueing the coaching message twice
+    with db.transaction():
+        if payload.get("client_id"):
+            _save_hubspot_enrichment(payload["client_id"], hs_contact_id, hs_phone, hs_comp)
+        if coaching_msg:
+            logging.info(f"[OUTLOOK WEBHOOK] Queueing WhatsApp to {payload['salesperson_phone']}...")
+            whatsapp_service.queue_whatsapp_message(
+                payload["salesperson_phone"], body=coaching_msg[0], use_template=True, template_vars=coaching_msg[1],
+                key=f"whatsapp.pre_meeting:{payload['coaching_id']}"
+            )
+
+outbox.register_handler("ai.pre_meeting_coaching", _pre_meeting_coaching)
+
+def _schedule_bot(payload):
+    """Outbox handler for aux.schedule_meeting: asks Aux for a bot and stores its meeting id / token."""
+    scheduled_dt = parse_iso_datetime(payload["scheduled_time"])
+    if scheduled_dt and get_current_utc_time() > scheduled_dt + timedelta(hours=1):
+        raise PermanentError(f"meeting started at {payload['scheduled_time']}, too late for the bot to join")
+    aux_res = aux_service.schedule_meeting(payload["meeting_link"], payload["scheduled_time"], payload["title"], attendee_name="Rolplay (AI Coach)")
+    if not aux_res:
+        raise RuntimeError(f"Aux scheduling failed for {payload['outlook_event_id']}")
+    with db.transaction():
+        # A new bot token starts with fresh Aux polling state
+        db.execute_query("UPDATE meetings SET aux_meeting_id=?, aux_meeting_token=?, location=?, aux_next_poll_at=NULL, aux_poll_attempts=0, aux_last_status=NULL, aux_bot_state=NULL WHERE outlook_event_id=?", 
+                       (aux_res.get("meetingId"), aux_res.get("token"), payload["meeting_link"], payload["outlook_event_id"]), commit=True)
+    logging.info(f"[BOT SCHEDULING] SUCCESS for {payload['outlook_event_id']}")
+
+outbox.register_handler("aux.schedule_meeting", _schedule_bot)
+
 def process_read_ai_webhook(data: dict):
     """Processes incoming webhook from Read AI."""
     logging.info(f"Processing Read AI Webhook: {data}")
@@ -483,109 +573,43 @@ def process_read_ai_webhook(data: dict):
     if not start_str or not summary_text: return
     webhook_dt = parse_iso_datetime(start_str)
     
-    # Match
-    candidates = db.execute_query("SELECT * FROM meetings WHERE start_time IS NOT NULL ORDER BY id DESC LIMIT 50", fetch_all=True) or []
-    for m in candidates:
-        try:
-            m_dt = parse_iso_datetime(m['start_time'])
-            if abs(m_dt - webhook_dt) <= timedelta(minutes=10):
-                db.execute_query("UPDATE meetings SET summary = ?, read_ai_url = ? WHERE id = ?", (summary_text, report_url, m['id']), commit=True)
-                # Notify
-                user = db.execute_query("SELECT name FROM clients WHERE id = ?", (m['client_id'],), fetch_one=True)
-                cname = user['name'] if user else "Client"
-                msg = f"*Meeting Summary Ready ({cname})*\n\n{summary_text[:500]}...\n\nReport: {report_url}"
-                whatsapp_service.send_whatsapp_message(m['salesperson_phone'], msg)
-                break
-        except Exception:
-            continue
-
-
-def handle_incoming_message(sender: str, message_body: str) -> str:
-    """
-    Handles incoming WhatsApp messages:
-    - Matches sender to active meeting.
-    - Processes commands ("Done").
-    - Triggers AI Chat for everything else.
-    """
-    sender = normalize_phone(sender)
-    lowered_body = (message_body or "").strip().lower()
-
-    def _mget(row, key, default=None):
-        if row is None:
-            return default
-        if isinstance(row, dict):
-            return row.get(key, default)
-        try:
-            val = row[key]
-            return default if val is None else val
-        except Exception:
-            return default
-    
-    # Find active meeting for this sender
+    # Match (time window filtered in SQL on the indexed start_at column)
     m = db.execute_query(
-        "SELECT * FROM meetings WHERE (salesperson_phone = ? OR REPLACE(salesperson_phone, 'whatsapp:', '') = REPLACE(?, 'whatsapp:', '')) AND status IN ('scheduled', 'reminder_sent', 'pending') ORDER BY id DESC LIMIT 1",
-        (sender, sender),
+        "SELECT id, client_id, salesperson_phone FROM meetings WHERE start_at BETWEEN ? AND ? ORDER BY id DESC LIMIT 1",
+        (db.to_db_timestamp(webhook_dt - timedelta(minutes=10)), db.to_db_timestamp(webhook_dt + timedelta(minutes=10))),
         fetch_one=True
     )
+    if m:
+        try:
+            user = db.execute_query("SELECT name FROM clients WHERE id = ?", (m['client_id'],), fetch_one=True)
+            cname = user['name'] if user else "Client"
+            msg = f"*Meeting Summary Ready ({cname})*\n\n{summary_text[:500]}...\n\nReport: {report_url}"
+            with db.transaction():
+                db.execute_query("UPDATE meetings SET summary = ?, read_ai_url = ? WHERE id = ?", (summary_text, report_url, m['id']), commit=True)
+                # Notify
+                whatsapp_service.queue_whatsapp_message(m['salesperson_phone'], msg)
+        except Exception as e:
+            logging.error(f"Read AI summary update failed for meeting {m['id']}: {e}")
 
-    is_done_command = ("done" in lowered_body or "completed" in lowered_body)
-    if not m:
-        # Allow delayed replies after scheduler has already marked the meeting completed.
-        completed_rows = db.execute_query(
-            "SELECT * FROM meetings WHERE (salesperson_phone = ? OR REPLACE(salesperson_phone, 'whatsapp:', '') = REPLACE(?, 'whatsapp:', '')) AND status = 'completed' ORDER BY id DESC LIMIT 10",
-            (sender, sender),
-            fetch_all=True
-        ) or []
-
-        if completed_rows:
-            if is_done_command:
-                m = completed_rows[0]
-            else:
-                now_utc = get_current_utc_time()
-                for row in completed_rows:
-                    ts = _mget(row, "end_time") or _mget(row, "start_time")
-                    if not ts:
-                        continue
-                    try:
-                        row_dt = parse_iso_datetime(ts)
-                        if now_utc - row_dt <= timedelta(hours=48):
-                            m = row
-                            break
-                    except Exception:
-                        continue
-    
-    if not m:
-        return "No active meeting found pending feedback."
-
-    # Log Message
-    db.execute_query(
-        "INSERT INTO messages (client_id, direction, message, timestamp) VALUES (?, 'incoming', ?, ?)",
-        (m['client_id'], message_body, datetime.now().isoformat()), 
-        commit=True
-    )
 
-    # Command: DONE
-    if is_done_command:
-        db.execute_query("UPDATE meetings SET status='completed' WHERE id=?", (m['id'],), commit=True)
-        hubspot_service = __import__('services.hubspot_service', fromlist=['sync_note_to_contact'])
-        hubspot_service.sync_note_to_contact(m['client_id'], f"Feedback: {message_body}")
-        
-        return "Meeting marked as completed. Notes synced to CRM."
-    
-    # Command: Chat (Default)
-    # Get Context
-    client = db.execute_query("SELECT name, company FROM clients WHERE id = ?", (m['client_id'],), fetch_one=True)
-    c_name = client['name'] if client else "the client"
+def _build_chat_context(meeting_id, sender_e164):
+    """AI chat context for one meeting: client, time/location/attendees, then transcript or summary. None if the meeting isn't found."""
+    # Get Context (summary/attendees are only loaded here, for the one matched meeting)
+    m = repositories.get_meeting(meeting_id, "chat_context")
+    if m is None:
+        return None
+    client = repositories.get_client(m.client_id, columns=("name", "company"))
+    c_name = client.name if client else "the client"
     
     # Try to fetch transcript/summary from meets
-    summary_context = _mget(m, 'summary', '')
+    summary_context = m.summary or ''
 
-    context = f"Salesperson is meeting with {c_name} from {client['company'] if client else 'Unknown'}."
+    context = f"Salesperson is meeting with {c_name} from {client.company if client else 'Unknown'}."
     
-    start = _mget(m, 'start_time')
-    end = _mget(m, 'end_time')
-    loc = _mget(m, 'location') or 'Unknown'
-    atts = _mget(m, 'attendees') or 'Unknown'
+    start = m.start_time
+    end = m.end_time
+    loc = m.location or 'Unknown'
+    atts = m.attendees or 'Unknown'
     if isinstance(atts, str) and atts.startswith("["):
         try:
             parsed_atts = json.loads(atts)
@@ -597,13 +621,9 @@ def handle_incoming_message(sender: str, message_body: str) -> str:
     # Look up salesperson's timezone for correct local time display
     sp_tz = None
     try:
-        sp_user = db.execute_query(
-            "SELECT timezone FROM users WHERE phone = ? OR REPLACE(phone, 'whatsapp:', '') = REPLACE(?, 'whatsapp:', '') LIMIT 1",
-            (sender, sender),
-            fetch_one=True
-        )
+        sp_user = repositories.get_user_by_phone(sender_e164, columns=("timezone",))
         if sp_user:
-            sp_tz = sp_user['timezone'] or None
+            sp_tz = sp_user.timezone or None
     except Exception:
         pass
 
@@ -628,10 +648,14 @@ def handle_incoming_message(sender: str, message_body: str) -> str:
     # Check if transcripts exist for this meeting
     t_rows = db.execute_query(
         "SELECT speaker, text FROM meeting_transcripts WHERE meeting_id = ? ORDER BY id ASC", 
-        (m['id'],), 
+        (m.id,), 
         fetch_all=True
     )
     
+    if not t_rows:
+        # Older meetings may have been moved to the archive by the retention job
+        t_rows = retention.archived_transcript_lines(m.id)
+    
     transcript_text = ""
     if t_rows:
         # Reconstruct transcript
@@ -647,6 +671,71 @@ def handle_incoming_message(sender: str, message_body: str) -> str:
         context += f"\n\n[FULL TRANSCRIPT AVAILABLE]\n{transcript_text}"
     elif summary_context:
         context += f"\n\nMeeting Summary/Agenda: {summary_context[:2000]}"
+
+    return context
+
+
+def handle_incoming_message(sender: str, message_body: str) -> str:
+    """
+    Handles incoming WhatsApp messages:
+    - Matches sender to active meeting.
+    - Processes commands ("Done").
+    - Triggers AI Chat for everything else.
+    """
+    sender = normalize_phone(sender)
+    sender_e164 = to_e164(sender)
+    lowered_body = (message_body or "").strip().lower()
+
+    # Find active meeting for this sender
+    m = repositories.find_active_meeting_for_salesperson(sender_e164)
+
+    is_done_command = ("done" in lowered_body or "completed" in lowered_body)
+    if not m:
+        # Allow delayed replies after scheduler has already marked the meeting completed.
+        completed_rows = repositories.find_completed_meetings_for_salesperson(sender_e164, limit=10)
+
+        if completed_rows:
+            if is_done_command:
+                m = completed_rows[0]
+            else:
+                now_utc = get_current_utc_time()
+                for row in completed_rows:
+                    ts = row.end_time or row.start_time
+                    if not ts:
+                        continue
+                    try:
+                        row_dt = parse_iso_datetime(ts)
+                        if now_utc - row_dt <= timedelta(hours=48):
+                            m = row
+                            break
+                    except Exception:
+                        continue
+    
+    if not m:
+        return "No active meeting found pending feedback."
+
+    # Log Message (+ DONE command) as one unit of work
+    with db.transaction():
+        db.execute_query(
+            "INSERT INTO messages (client_id, direction, message, timestamp) VALUES (?, 'incoming', ?, ?)",
+            (m.client_id, message_body, datetime.now().isoformat()), 
+            commit=True
+        )
+
+        # Command: DONE
+        if is_done_command:
+            db.execute_query("UPDATE meetings SET status='completed' WHERE id=?", (m.id,), commit=True)
+            hubspot_service.queue_sync("sync_note_to_contact", client_db_id=m.client_id, note_body=f"Feedback: {message_body}")
+            
+            return "Meeting marked as completed. Notes queued for CRM sync."
+    
+    # Command: Chat (Default)
+    # Pure reads: served from the read replica when one is configured
+    with db.replica_reads():
+        context = _build_chat_context(m.id, sender_e164)
+    if context is None:
+        # Meeting not on the replica yet (replication lag): rebuild from the primary
+        context = _build_chat_context(m.id, sender_e164)
     
     reply = ai_service.generate_chat_reply(context, message_body)
     return reply
@@ -668,20 +757,9 @@ def process_transcript_webhook(data: dict):
 
     # 1. Find Meeting
     webhook_dt = parse_iso_datetime(time_str)
-    candidates = db.execute_query(
-        "SELECT * FROM meetings WHERE start_time IS NOT NULL ORDER BY id DESC LIMIT 50", 
-        fetch_all=True
-    ) or []
-    
-    matched_meeting = None
-    for m in candidates:
-        try:
-            m_dt = parse_iso_datetime(m['start_time'])
-            if abs(m_dt - webhook_dt) <= timedelta(minutes=20):
-                matched_meeting = m
-                break
-        except Exception:
-            continue
+    matched_meeting = repositories.find_meeting_starting_between(
+        webhook_dt - timedelta(minutes=20), webhook_dt + timedelta(minutes=20), projection="transcript"
+    )
             
     if not matched_meeting:
         logging.warning("No matching meeting found for transcript.")
@@ -711,7 +789,7 @@ def process_aux_transcript(meeting_row, aux_data):
     content = extract_aux_transcript_content(aux_data)
     title = aux_data.get("title") if isinstance(aux_data, dict) else None
     if not title:
-        title = meeting_row.get("title", "Aux Meeting") if isinstance(meeting_row, dict) else "Aux Meeting"
+        title = meeting_row.get("title", "Aux Meeting")
 
     transcript_url = None
     if isinstance(aux_data, dict):
@@ -742,6 +820,8 @@ def process_aux_transcript(meeting_row, aux_data):
 def process_transcript_data(meeting_row, transcript_content, title, source, transcript_url=None):
     """
     Core logic to parse, store, analyze and notify regarding a transcript.
+    Stores the transcript and queues the AI analysis (ai.post_meeting_analysis) in one unit of work;
+    the Gemini call and the notifications run from the outbox after the commit (_analyze_transcript).
     """
     meeting_id = meeting_row['id']
     logging.info("=" * 60)
@@ -755,19 +835,51 @@ def process_transcript_data(meeting_row, transcript_content, title, source, tran
     lines = transcript_service.parse_transcript(transcript_content)
     logging.info(f"[TRANSCRIPT DATA] Parsed {len(lines)} lines")
 
-    # 2. Store
-    logging.info("[TRANSCRIPT DATA] Step 2: Storing transcript to DB...")
-    transcript_service.store_transcript(meeting_id, lines, source=source)
-    logging.info(f"[TRANSCRIPT DATA] Stored {len(lines)} lines of transcript for meeting {meeting_id}")
-
-    # 3. Analyze with safe fallback
-    logging.info("[TRANSCRIPT DATA] Step 3: Generating AI analysis...")
     full_text = transcript_service.get_full_transcript_text(lines)
     logging.info(f"[TRANSCRIPT DATA] Full text length for AI: {len(full_text)} chars")
 
+    # Build a short summary snippet for CRM summary logging.
+    summary_excerpt = "\n".join([
+        f"{l.get('speaker', 'Speaker')}: {l.get('text', '')}" for l in lines[:8]
+    ]).strip()
+    if summary_excerpt:
+        summary_excerpt = summary_excerpt[:2000]
+
+    # 2. Store, and 3. queue the analysis (joins the caller's unit of work, e.g. the scheduler's Aux poll)
+    logging.info("[TRANSCRIPT DATA] Step 2: Storing transcript to DB...")
+    with db.transaction():
+        transcript_service.store_transcript(meeting_id, lines, source=source)
+        outbox.enqueue("ai.post_meeting_analysis", {
+            # Keys the notification / CRM jobs, so a re-run of this job doesn't send them twice
+            "analysis_id": uuid.uuid4().hex,
+            "meeting_id": meeting_id,
+            "client_id": meeting_row['client_id'],
+            "salesperson_phone": meeting_row['salesperson_phone'],
+            "start_time": str(meeting_row.get('start_time', '')),
+            "location": str(meeting_row.get('location', '')),
+            "title": title,
+            "transcript_url": transcript_url,
+            "full_text": full_text,
+            "summary_excerpt": summary_excerpt,
+        })
+    logging.info(f"[TRANSCRIPT DATA] Stored {len(lines)} lines of transcript for meeting {meeting_id}, analysis queued")
+    logging.info("=" * 60)
+    return {"status": "processed", "meeting_id": meeting_id}
+
+
+def _analyze_transcript(payload):
+    """Outbox handler for ai.post_meeting_analysis: AI analysis, then the WhatsApp notification and HubSpot sync jobs."""
+    meeting_id = payload["meeting_id"]
+    title = payload["title"]
+    transcript_url = payload.get("transcript_url")
+    summary_excerpt = payload.get("summary_excerpt")
+    analysis_id = payload["analysis_id"]
+
+    # 3. Analyze with safe fallback
+    logging.info(f"[TRANSCRIPT DATA] Step 3: Generating AI analysis for meeting {meeting_id}...")
     analysis = None
     try:
-        analysis = ai_service.generate_post_meeting_analysis(full_text)
+        analysis = ai_service.generate_post_meeting_analysis(payload["full_text"])
         logging.info("[TRANSCRIPT DATA] AI analysis generated successfully")
         logging.info(f"[TRANSCRIPT DATA] Analysis keys: {list(analysis.keys()) if isinstance(analysis, dict) else 'not a dict'}")
     except Exception as e:
@@ -783,19 +895,12 @@ def process_transcript_data(meeting_row, transcript_content, title, source, tran
             "follow_up_actions": ["Review transcript and define next steps with the client."]
         }
 
-    # Build a short summary snippet for CRM summary logging.
-    summary_excerpt = "\n".join([
-        f"{l.get('speaker', 'Speaker')}: {l.get('text', '')}" for l in lines[:8]
-    ]).strip()
-    if summary_excerpt:
-        summary_excerpt = summary_excerpt[:2000]
-
-    # 4. Notify
-    phone = meeting_row['salesperson_phone']
+    # 4. Notify and 5. Log to HubSpot (summary + analysis), queued together.
+    # Errors propagate so the outbox retries the job; the keys keep a retry from queueing twice.
+    phone = payload.get("salesperson_phone")
     logging.info(f"[TRANSCRIPT DATA] Step 4: Notification - salesperson_phone: {phone}")
-
-    if phone:
-        try:
+    with db.transaction():
+        if phone:
             objections = "\n".join([
                 f"- \"{o.get('quote')}\"" for o in analysis.get('objections', [])
                 if isinstance(o, dict) and o.get('quote')
@@ -819,47 +924,38 @@ def process_transcript_data(meeting_row, transcript_content, title, source, tran
             )
 
             use_template = str(os.getenv("TWILIO_USE_POST_MEETING_TEMPLATE", "false")).strip().lower() in {"1", "true", "yes", "on"}
-            logging.info(f"[TRANSCRIPT DATA] Sending WhatsApp notification to {phone} (template={use_template})")
-            whatsapp_service.send_whatsapp_message(
+            logging.info(f"[TRANSCRIPT DATA] Queueing WhatsApp notification to {phone} (template={use_template})")
+            whatsapp_service.queue_whatsapp_message(
                 phone,
                 body=msg_body,
                 use_template=use_template,
-                template_vars=template_vars if use_template else None
+                template_vars=template_vars if use_template else None,
+                key=f"whatsapp.post_meeting:{analysis_id}"
             )
-            logging.info("[TRANSCRIPT DATA] WhatsApp notification sent successfully")
-        except Exception as notify_err:
-            logging.error(f"[TRANSCRIPT DATA] Failed to send post-meeting notification: {notify_err}")
-            import traceback
-            logging.error(f"[TRANSCRIPT DATA] Notification traceback: {traceback.format_exc()}")
-    else:
-        logging.warning("[TRANSCRIPT DATA] No salesperson_phone found, skipping notification")
+        else:
+            logging.warning("[TRANSCRIPT DATA] No salesperson_phone found, skipping notification")
 
-    # 5. Log to HubSpot (summary + analysis)
-    try:
-        hs = __import__('services.hubspot_service', fromlist=['sync_meeting_analysis', 'sync_meeting_summary'])
         if summary_excerpt:
-            hs.sync_meeting_summary(
-                client_db_id=meeting_row['client_id'],
+            hubspot_service.queue_sync(
+                "sync_meeting_summary",
+                key=f"hubspot.sync_meeting_summary:{analysis_id}",
+                client_db_id=payload["client_id"],
                 meeting_title=title,
-                start_time=str(meeting_row.get('start_time', '')) if isinstance(meeting_row, dict) else '',
+                start_time=payload.get("start_time", ""),
                 summary=summary_excerpt,
-                location=str(meeting_row.get('location', '')) if isinstance(meeting_row, dict) else ''
+                location=payload.get("location", "")
             )
 
-        hs.sync_meeting_analysis(
-            client_db_id=meeting_row['client_id'],
+        hubspot_service.queue_sync(
+            "sync_meeting_analysis",
+            key=f"hubspot.sync_meeting_analysis:{analysis_id}",
+            client_db_id=payload["client_id"],
             meeting_title=title,
             analysis=analysis,
             transcript_url=transcript_url or "Stored in database"
         )
-        logging.info("[TRANSCRIPT DATA] HubSpot sync completed")
-    except Exception as e:
-        logging.error(f"[TRANSCRIPT DATA] HubSpot Analysis Sync Failed: {e}")
-        import traceback
-        logging.error(f"[TRANSCRIPT DATA] HubSpot traceback: {traceback.format_exc()}")
+    logging.info(f"[TRANSCRIPT DATA] Analysis complete for meeting {meeting_id}: notification and HubSpot sync queued")
 
-    logging.info(f"[TRANSCRIPT DATA] Processing complete for meeting {meeting_id}")
-    logging.info("=" * 60)
-    return {"status": "processed", "meeting_id": meeting_id}
+outbox.register_handler("ai.post_meeting_analysis", _analyze_transcript)
 
 
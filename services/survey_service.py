@@ -71,25 +71,23 @@ def poll_and_sync_surveys():
                 "submitted_at": survey.get("submitted_at")
             }
             
-            # Sync to HubSpot
-            success = hubspot_service.sync_survey_response_to_contact(
-                participant_email,
-                survey_data
-            )
-            
-            if success:
-                # Mark as synced
+            # Queue the HubSpot sync and mark the survey as handled in one transaction (the outbox retries the sync)
+            with db.transaction():
+                hubspot_service.queue_sync(
+                    "sync_survey_response_to_contact",
+                    key=f"hubspot.survey_response:{survey_id}",
+                    participant_email=participant_email,
+                    survey_data=survey_data
+                )
                 db.execute_query(
                     "INSERT INTO synced_surveys (survey_id, participant_email, synced_at) VALUES (?, ?, ?)",
                     (survey_id, participant_email, datetime.utcnow().isoformat()),
                     commit=True
                 )
-                synced_count += 1
-                logging.info(f"✅ Synced survey {survey_id} for {participant_email}")
-            else:
-                logging.warning(f"⚠️ Failed to sync survey {survey_id} for {participant_email}")
+            synced_count += 1
+            logging.info(f"✅ Queued HubSpot sync of survey {survey_id} for {participant_email}")
         
-        logging.info(f"Survey sync complete: {synced_count} synced, {skipped_count} already processed")
+        logging.info(f"Survey sync complete: {synced_count} queued, {skipped_count} already processed")
         
     except Exception as e:
         logging.error(f"Survey polling error: {e}")
@@ -81,24 +81,14 @@ def store_transcript(meeting_id: int, parsed_lines: list, source: str = "read_ai
         return
 
     # Bulk insert
-    conn = db.get_connection()
-    cur = conn.cursor()
-    
+    query = "INSERT INTO meeting_transcripts (meeting_id, speaker, timestamp, text, source) VALUES (?, ?, ?, ?, ?)"
+    data = [(meeting_id, l['speaker'], l['timestamp'], l['text'], source) for l in parsed_lines]
+
     try:
-        query = "INSERT INTO meeting_transcripts (meeting_id, speaker, timestamp, text, source) VALUES (?, ?, ?, ?, ?)"
-        data = [(meeting_id, l['speaker'], l['timestamp'], l['text'], source) for l in parsed_lines]
-        
-        if db.is_postgres:
-            query = query.replace('?', '%s')
-            
-        cur.executemany(query, data)
-        conn.commit()
+        db.executemany(query, data, commit=True, prepare=True)
     except Exception as e:
         logging.error(f"Failed to store transcript: {e}")
-        conn.rollback()
         raise
-    finally:
-        conn.close()
 
 def get_full_transcript_text(parsed_lines: list) -> str:
     """Reconstructs full text for AI consumption."""
@@ -4,6 +4,8 @@ import logging
 import json
 from twilio.rest import Client
 
+from outbox import outbox, PermanentError
+
 # Configuration
 ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -89,3 +91,24 @@ def send_whatsapp_message(to_number: str, body: str = None, use_template: bool =
     except Exception as e:
         logging.error(f"Twilio Send Error: {e}")
         return None
+
+def queue_whatsapp_message(to_number: str, body: str = None, use_template: bool = False, template_vars: dict = None, key: str = None):
+    """
+    Queues a send_whatsapp_message call in the outbox (same arguments). Joins the caller's
+    db.transaction(), so the message only goes out if the state change it belongs to commits.
+    """
+    return outbox.enqueue("whatsapp.send", {
+        "to_number": to_number, "body": body, "use_template": use_template, "template_vars": template_vars,
+    }, key=key)
+
+def _deliver_outbox_message(payload):
+    """Outbox handler for whatsapp.send."""
+    if not payload.get("to_number"):
+        raise PermanentError("no recipient number")
+    if not payload.get("body") and not payload.get("template_vars"):
+        raise PermanentError("no message body")
+    if not send_whatsapp_message(**payload):
+        # Credentials missing or Twilio rejected/failed the send (details logged above)
+        raise RuntimeError(f"WhatsApp send to {payload['to_number']} failed")
+
+outbox.register_handler("whatsapp.send", _deliver_outbox_message)
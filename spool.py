@@ -0,0 +1,385 @@
+"""
+Local write-ahead spool for writes that hit an unreachable primary database.
+
+When Postgres blips, callers hand the operation to the spool instead of failing it:
+    result, spooled = spool.run_or_spool("outlook_webhook", data, fn=process_outlook_webhook)
+The record (kind, JSON payload, idempotency key) is appended to a segmented log on local disk
+and acknowledged only once it is fsync'd. Appends are group-committed: concurrent writers
+that arrive within SPOOL_FSYNC_MS share one fsync.
+
+A background drainer replays records in order once the database answers again. Each replay
+runs the registered handler and records the idempotency key in `spool_applied` in the same
+transaction, so a record is applied at most once even if the drainer crashes mid-way. Replay
+handlers only write to the database; their external calls are queued in the outbox.
+Records that keep failing for reasons other than connectivity are moved to dead-letter.log
+after SPOOL_MAX_ATTEMPTS tries so they don't block the queue.
+
+Layout (SPOOL_DIR, default ./spool): each process appends to its own `<ns>-<pid>.open`
+segment (flock'd while the process lives) and seals it to `.seg` at SPOOL_SEGMENT_BYTES.
+Only one process drains at a time (drain.lock); drained `.seg` files are deleted, and
+`.open` segments left behind by a dead process are sealed and drained.
+
+Opt-in: SPOOL_ENABLED=true. Other env: SPOOL_DIR, SPOOL_SEGMENT_BYTES (4 MiB), SPOOL_FSYNC_MS (10),
+SPOOL_DRAIN_INTERVAL (5s), SPOOL_MAX_ATTEMPTS (5), SPOOL_APPLIED_RETENTION_DAYS (7).
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single process, no cross-process locking
+    fcntl = None
+
+from database import db, psycopg2, PoolTimeout, _env_int, _env_float
+
+
+def _is_truthy(val):
+    return str(val).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def is_unavailable(exc):
+    """True for errors that mean 'the database can't be reached right now' (worth spooling / retrying)."""
+    if isinstance(exc, PoolTimeout):
+        return True
+    if psycopg2 is not None and isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return True
+    if isinstance(exc, sqlite3.OperationalError):
+        msg = str(exc).lower()
+        return "locked" in msg or "unable to open" in msg or "disk i/o" in msg
+    return False
+
+
+def idempotency_key(kind, payload):
+    body = json.dumps(payload, sort_keys=True, default=str)
+    return f"{kind}:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+
+
+def create_applied_table():
+    """Idempotency ledger of replayed spool records (applied by migrations.py)."""
+    # applied_at is a typed timestamp (see db.to_db_timestamp): TIMESTAMPTZ on Postgres, epoch seconds on SQLite
+    ts = "TIMESTAMPTZ" if db.is_postgres else "INTEGER"
+    db.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS spool_applied (
+            idempotency_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            spooled_at TEXT,
+            applied_at {ts} NOT NULL
+        );
+    """)
+    db.execute_query("CREATE INDEX IF NOT EXISTS idx_spool_applied_applied_at ON spool_applied (applied_at)")
+
+
+def _apply_upsert(payload):
+    db.upsert(
+        payload["table"], payload["key_cols"], payload["values"],
+        update_cols=payload.get("update_cols"), coalesce_cols=payload.get("coalesce_cols") or ()
+    )
+
+
+class SpoolUnavailable(Exception):
+    """Replay stopped because the database is still unreachable."""
+
+
+class WriteSpool:
+    def __init__(self, directory=None):
+        self.enabled = _is_truthy(os.getenv("SPOOL_ENABLED", "false"))
+        self.directory = directory or os.getenv("SPOOL_DIR", "spool")
+        self.segment_bytes = _env_int("SPOOL_SEGMENT_BYTES", 4 * 1024 * 1024)
+        self.fsync_window_s = _env_float("SPOOL_FSYNC_MS", 10.0) / 1000.0
+        self.drain_interval_s = _env_float("SPOOL_DRAIN_INTERVAL", 5.0)
+        self.max_attempts = _env_int("SPOOL_MAX_ATTEMPTS", 5)
+        self._handlers = {"upsert": _apply_upsert}
+
+        # Writer state (guarded by _cond)
+        self._cond = threading.Condition(threading.Lock())
+        self._file = None
+        self._file_pid = None
+        self._appended = 0
+        self._synced = 0
+        self._flusher = None
+
+        # Drainer state
+        self._drain_lock = threading.Lock()
+        self._drainer = None
+        self._attempts = {}
+        self._last_prune = 0.0
+        self._stats = {"spooled": 0, "fsyncs": 0, "replayed": 0, "skipped_duplicates": 0, "dead_lettered": 0}
+
+    def register_handler(self, kind, fn):
+        """
+        fn(payload) replays one spooled record. It runs inside the replay transaction (which also records
+        the idempotency key), so it must only write to the database: external calls belong in the outbox.
+        """
+        self._handlers[kind] = fn
+
+    # --- writing ---
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(f"{time.time_ns()}-{os.getpid()}.open")
+        f = open(path, "ab")
+        if fcntl:
+            # Held for the life of the segment; tells the drainer this writer is still alive
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._file, self._file_pid = f, os.getpid()
+
+    def _seal_segment(self):
+        f, self._file = self._file, None
+        f.flush()
+        os.fsync(f.fileno())
+        path = f.name
+        os.replace(path, path[:-len(".open")] + ".seg")
+        f.close()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while self._synced >= self._appended:
+                    self._cond.wait()
+            # Let concurrent appenders pile into the same fsync
+            time.sleep(self.fsync_window_s)
+            with self._cond:
+                target = self._appended
+                if self._file is not None:
+                    os.fsync(self._file.fileno())
+                    self._stats["fsyncs"] += 1
+                self._synced = target
+                self._cond.notify_all()
+
+    def append(self, kind, payload, key=None):
+        """Appends one record and returns its idempotency key once it is durable on disk."""
+        key = key or idempotency_key(kind, payload)
+        line = json.dumps({
+            "key": key, "kind": kind, "payload": payload,
+            "spooled_at": datetime.now(timezone.utc).isoformat(),
+        }, default=str).encode("utf-8") + b"\n"
+
+        with self._cond:
+            if self._file is not None and self._file_pid != os.getpid():
+                # Forked worker: the inherited segment (and its lock) belongs to the parent
+                self._file = None
+                self._flusher = None
+            if self._file is not None and self._file.tell() >= self.segment_bytes:
+                self._seal_segment()
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            self._appended += 1
+            seq = self._appended
+            self._stats["spooled"] += 1
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="spool-fsync", daemon=True)
+                self._flusher.start()
+            self._cond.notify_all()
+            while self._synced < seq:
+                self._cond.wait()
+        logging.warning(f"[SPOOL] Spooled {kind} ({key})")
+        return key
+
+    def run_or_spool(self, kind, payload, key=None, fn=None):
+        """
+        Runs fn(payload) now (default: the replay handler for `kind`). If the database is unreachable and
+        the spool is enabled, the record is spooled for replay by the `kind` handler instead.
+        Returns (result, spooled).
+        """
+        try:
+            return (fn or self._handlers[kind])(payload), False
+        except Exception as e:
+            if not (self.enabled and is_unavailable(e)):
+                raise
+            logging.error(f"[SPOOL] Database unavailable ({e}); spooling {kind}")
+            self.append(kind, payload, key)
+            return None, True
+
+    # --- draining ---
+
+    def _segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if n.endswith((".seg", ".open")))
+
+    def _seal_orphan(self, name):
+        """Seals an .open segment whose writer process is gone. Returns the new name, or None if it is live."""
+        if not fcntl:
+            return None
+        with self._cond:
+            if self._file is not None and os.path.basename(self._file.name) == name:
+                return None
+        try:
+            with open(self._path(name), "rb") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+                sealed = name[:-len(".open")] + ".seg"
+                os.replace(self._path(name), self._path(sealed))
+                return sealed
+        except FileNotFoundError:
+            return None
+
+    def _load_cursor(self):
+        try:
+            with open(self._path("cursor.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_cursor(self, cursor):
+        tmp = self._path("cursor.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(cursor, f)
+        os.replace(tmp, self._path("cursor.json"))
+
+    def _dead_letter(self, record, error):
+        with open(self._path("dead-letter.log"), "a") as f:
+            f.write(json.dumps({"record": record, "error": error,
+                                "at": datetime.now(timezone.utc).isoformat()}, default=str) + "\n")
+        self._stats["dead_lettered"] += 1
+        logging.error(f"[SPOOL] Dead-lettered {record.get('kind')} ({record.get('key')}): {error}")
+
+    def _apply(self, record):
+        """Replays one record. Returns True when it is done with (applied, duplicate or dead-lettered)."""
+        key, kind = record.get("key"), record.get("kind")
+        handler = self._handlers.get(kind)
+        if handler is None:
+            self._dead_letter(record, f"no handler registered for {kind!r}")
+            return True
+        try:
+            with db.transaction():
+                if db.execute_query("SELECT 1 FROM spool_applied WHERE idempotency_key = ?", (key,), fetch_one=True):
+                    self._stats["skipped_duplicates"] += 1
+                    return True
+                handler(record.get("payload"))
+                db.execute_query(
+                    "INSERT INTO spool_applied (idempotency_key, kind, spooled_at, applied_at) VALUES (?, ?, ?, ?)",
+                    (key, kind, record.get("spooled_at"), db.to_db_timestamp(datetime.now(timezone.utc))),
+                    commit=True
+                )
+        except Exception as e:
+            if is_unavailable(e):
+                raise SpoolUnavailable(str(e)) from e
+            attempts = self._attempts.get(key, 0) + 1
+            self._attempts[key] = attempts
+            logging.error(f"[SPOOL] Replay of {kind} ({key}) failed (attempt {attempts}/{self.max_attempts}): {e}")
+            if attempts < self.max_attempts:
+                return False
+            self._attempts.pop(key, None)
+            self._dead_letter(record, str(e))
+            return True
+        self._attempts.pop(key, None)
+        self._stats["replayed"] += 1
+        logging.info(f"[SPOOL] Replayed {kind} ({key})")
+        return True
+
+    def drain(self):
+        """
+        Replays everything spooled so far, oldest segment first. Stops early (keeping order) when the
+        database is still unreachable or a record needs another attempt. Returns the number of records handled.
+        """
+        if not self._drain_lock.acquire(blocking=False):
+            return 0
+        lock_fh = None
+        handled = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if fcntl:
+                lock_fh = open(self._path("drain.lock"), "w")
+                try:
+                    fcntl.flock(lock_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0  # another process is draining
+            segments = self._segments()
+            # Offsets are keyed by segment stem, so they survive the .open -> .seg rename
+            cursor = {stem: off for stem, off in self._load_cursor().items()
+                      if f"{stem}.seg" in segments or f"{stem}.open" in segments}
+            for name in segments:
+                if name.endswith(".open"):
+                    name = self._seal_orphan(name) or name
+                stem = name.rsplit(".", 1)[0]
+                offset = cursor.get(stem, 0)
+                try:
+                    f = open(self._path(name), "rb")
+                except FileNotFoundError:
+                    continue  # sealed by its writer since listing; picked up next pass
+                with f:
+                    f.seek(offset)
+                    while True:
+                        line = f.readline()
+                        if not line.endswith(b"\n"):
+                            break  # end of segment, or a record still being written
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            logging.error(f"[SPOOL] Skipping corrupt record in {name} at offset {offset}")
+                            record = None
+                        if record is not None and not self._apply(record):
+                            return handled
+                        offset += len(line)
+                        cursor[stem] = offset
+                        self._save_cursor(cursor)
+                        handled += 1
+                if name.endswith(".seg"):
+                    os.remove(self._path(name))
+                    cursor.pop(stem, None)
+                    self._save_cursor(cursor)
+            return handled
+        except SpoolUnavailable as e:
+            logging.warning(f"[SPOOL] Database still unavailable, replay paused: {e}")
+            return handled
+        finally:
+            if lock_fh is not None:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+                lock_fh.close()
+            self._drain_lock.release()
+
+    def prune_applied(self, days=None):
+        """Drops idempotency keys older than SPOOL_APPLIED_RETENTION_DAYS; nothing that old is still spooled."""
+        days = _env_int("SPOOL_APPLIED_RETENTION_DAYS", 7) if days is None else days
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        db.execute_query("DELETE FROM spool_applied WHERE applied_at < ?", (db.to_db_timestamp(cutoff),), commit=True)
+
+    def _drain_loop(self):
+        while True:
+            time.sleep(self.drain_interval_s)
+            try:
+                if self._segments():
+                    self.drain()
+                if time.time() - self._last_prune > 86400:
+                    self.prune_applied()
+                    self._last_prune = time.time()
+            except Exception as e:
+                logging.error(f"[SPOOL] Drainer error: {e}")
+
+    def start_drainer(self):
+        """Starts the background replay thread (no-op unless SPOOL_ENABLED)."""
+        if not self.enabled or (self._drainer is not None and self._drainer.is_alive()):
+            return
+        self._drainer = threading.Thread(target=self._drain_loop, name="spool-drainer", daemon=True)
+        self._drainer.start()
+        logging.info(f"[SPOOL] Drainer started (dir={self.directory}, interval={self.drain_interval_s}s)")
+
+    def stats(self):
+        cursor = self._load_cursor()
+        pending_bytes = 0
+        for name in self._segments():
+            try:
+                pending_bytes += os.path.getsize(self._path(name)) - cursor.get(name.rsplit(".", 1)[0], 0)
+            except OSError:
+                pass
+        return dict(self._stats, enabled=self.enabled, pending_bytes=pending_bytes)
+
+
+# Singleton shared instance
+spool = WriteSpool()
@@ -4,19 +4,90 @@ import pytz
 from dateutil import parser
 from datetime import datetime, timedelta
 
+try:
+    import phonenumbers
+except ImportError:  # listed in requirements.txt; without it only '+<country code>' numbers are accepted
+    phonenumbers = None
+
+# Shortest / longest digit count (country code included) accepted as an international number
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+def check_phone_config():
+    """Raises at startup if PHONE_DEFAULT_REGION is set but `phonenumbers` is missing (it would do nothing)."""
+    region = os.getenv("PHONE_DEFAULT_REGION", "").strip()
+    if region and phonenumbers is None:
+        raise RuntimeError(f"PHONE_DEFAULT_REGION={region} requires the phonenumbers package (pip install -r requirements.txt)")
+
+def to_e164(phone_number: str) -> str:
+    """
+    Canonical E.164 form of a phone number (e.g. '+15551234567'), or None if it isn't a usable one.
+    Strips the 'whatsapp:' prefix and any formatting; a leading '00' is treated as '+'.
+    This is the value stored in the indexed *_e164 columns and used for phone lookups.
+
+    The number must carry its country code. A national-format number ('5551234567') is only
+    accepted when PHONE_DEFAULT_REGION (e.g. 'US') is set and `phonenumbers` is installed;
+    prefixing it with '+' would make a valid-looking number in another country.
+    """
+    if not phone_number:
+        return None
+
+    raw = str(phone_number).strip()
+    if raw.lower().startswith("whatsapp:"):
+        raw = raw[len("whatsapp:"):].strip()
+
+    digits = "".join(ch for ch in raw if ch.isdigit())
+    if not digits:
+        return None
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    else:
+        return _national_to_e164(raw)
+
+    # Country codes never start with 0; E.164 allows at most 15 digits
+    if digits.startswith("0") or not (E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS):
+        logging.warning(f"Rejected phone number {phone_number!r}: not a valid international number")
+        return None
+    if phonenumbers is not None:
+        try:
+            if not _is_possible(phonenumbers.parse(f"+{digits}", None)):
+                logging.warning(f"Rejected phone number {phone_number!r}: not a possible number")
+                return None
+        except phonenumbers.NumberParseException:
+            return None
+    return f"+{digits}"
+
+def _is_possible(parsed) -> bool:
+    # IS_POSSIBLE_LOCAL_ONLY (e.g. a US number without its area code) is not dialable from abroad
+    return phonenumbers.is_possible_number_with_reason(parsed) == phonenumbers.ValidationResult.IS_POSSIBLE
+
+def _national_to_e164(raw: str) -> str:
+    """National-format number -> E.164 in PHONE_DEFAULT_REGION, or None when that can't be done safely."""
+    region = os.getenv("PHONE_DEFAULT_REGION", "").strip().upper()
+    if not region or phonenumbers is None:
+        logging.warning(f"Rejected phone number {raw!r}: no country code (set PHONE_DEFAULT_REGION and install phonenumbers to accept national numbers)")
+        return None
+    try:
+        parsed = phonenumbers.parse(raw, region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not _is_possible(parsed):
+        logging.warning(f"Rejected phone number {raw!r}: not a possible number in {region}")
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
 def normalize_phone(phone_number: str) -> str:
     """
     Normalizes phone numbers to the WhatsApp format.
-    Removes spaces, dashes, parentheses.
-    Ensures 'whatsapp:' prefix is present.
+    Removes spaces, dashes, parentheses and other formatting.
+    Ensures 'whatsapp:' prefix is present on an E.164 number; None if to_e164 rejects it.
     """
-    if not phone_number:
+    e164 = to_e164(phone_number)
+    if not e164:
         return None
-    
-    clean = str(phone_number).replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    if not clean.startswith("whatsapp:"):
-        return f"whatsapp:{clean}"
-    return clean
+    return f"whatsapp:{e164}"
 
 def parse_iso_datetime(date_str: str) -> datetime:
     """
@@ -47,6 +118,19 @@ def parse_iso_datetime(date_str: str) -> datetime:
         logging.warning(f"Date Parse Error ({date_str}): {e}")
         return datetime.now(pytz.utc)
 
+def try_parse_iso_datetime(date_str) -> datetime:
+    """
+    Like parse_iso_datetime, but returns None instead of 'now' when the value is empty or unparseable.
+    Use this when a wrong fallback time would be persisted (e.g. backfills).
+    """
+    if not date_str:
+        return None
+    try:
+        parser.parse(str(date_str))
+    except Exception:
+        return None
+    return parse_iso_datetime(str(date_str))
+
 def get_current_utc_time() -> datetime:
     """Returns the current aware UTC time."""
     return datetime.now(pytz.utc)
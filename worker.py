@@ -0,0 +1,60 @@
+"""
+Background worker entrypoint: owns the scheduler (due reminders / survey triggers, Aux polling with
+transcript analysis and HubSpot sync, survey polling, retention, backups) and drains the outbox
+(WhatsApp, HubSpot, Aux bot scheduling, survey webhook; see outbox.py).
+
+    python worker.py        # Procfile `worker` process / render.yaml background worker
+
+The web process (gunicorn app:app) also runs the scheduler and the outbox drainer unless
+RUN_SCHEDULER_IN_WEB=false, which is meant for deployments with this worker next to it
+(render.yaml sets it). Several workers may run; leader election
+(leader.py) makes sure only one of them runs the jobs. Every worker drains the outbox, leader or not,
+so adding workers adds side-effect throughput; SCHEDULER_LEADER=false makes a worker drain only.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Before the service imports: some of them log at import time, which would install a default handler
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+from database import db
+from outbox import outbox
+from utils import check_phone_config
+import scheduler  # also imports the services, which register their outbox handlers
+
+
+def _handle_sigterm(signum, frame):
+    # sys.exit runs the atexit hooks: scheduler shutdown first, then leadership release
+    logging.info(f"[WORKER] Received signal {signum}, shutting down")
+    sys.exit(0)
+
+
+def main():
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    signal.signal(signal.SIGINT, _handle_sigterm)
+
+    check_phone_config()
+    db.init_db()
+    draining = outbox.start_drainer()
+    if not scheduler.start_scheduler():
+        if not draining:
+            logging.error("[WORKER] Neither the scheduler (ENABLE_SCHEDULER / SCHEDULER_LEADER) nor the outbox drainer (OUTBOX_WORKERS) is enabled; exiting")
+            return 1
+        logging.info("[WORKER] Scheduler not started on this worker; draining the outbox only")
+    logging.info(f"[WORKER] Background worker running (pid {os.getpid()})")
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == "__main__":
+    sys.exit(main())